@@ -0,0 +1,203 @@
+"""Per-conversation fan-out of "new message" events to waiting requests.
+
+`chat.signals` publishes `(conversation_id, message_id)` once a `Message`
+insert commits; stream and long-poll requests (`chat.stream`) subscribe to
+their conversation and sleep until an event arrives instead of querying
+`chat_message` in a loop.
+
+Backends (`settings.CHAT_BUS_BACKEND`, a dotted path):
+
+* `PostgresBus` — `pg_notify` on publish; one `LISTEN` connection per process
+  fans events out to that process's waiters. Works across workers and hosts.
+  The default when the database is PostgreSQL.
+* `InProcessBus` — delivers directly to waiters in the same process. Enough
+  for a single worker, local development and tests; the default otherwise.
+* `CacheBus` — stores each conversation's latest message id in the Django
+  cache and polls it from one thread per process. Crosses processes only
+  with a shared cache (Redis, Memcached, database), not `LocMemCache`.
+
+Events are wake-up hints, not data: a waiter re-reads the database after
+waking, and callers bound every wait, so a lost event only delays delivery.
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One waiting request; woken from any thread via its own event loop."""
+
+    def __init__(self, conversation_id: int):
+        self.conversation_id = conversation_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.cursor = None  # backend-specific position, see CacheBus
+
+    def notify(self) -> None:
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout: float) -> bool:
+        """True if an event arrived within `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class MessageBus:
+    """Registry of local subscriptions; subclasses decide how events travel."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[int, set[Subscription]] = {}
+
+    def publish(self, conversation_id: int, message_id: int) -> None:
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def subscribe(self, conversation_id: int):
+        subscription = Subscription(conversation_id)
+        await self._prepare(subscription)
+        with self._lock:
+            self._subscriptions.setdefault(conversation_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                waiting = self._subscriptions.get(conversation_id)
+                if waiting is not None:
+                    waiting.discard(subscription)
+                    if not waiting:
+                        del self._subscriptions[conversation_id]
+
+    async def _prepare(self, subscription: Subscription) -> None:
+        """Hook run before a subscription is registered."""
+
+    def _subscribed(self) -> dict[int, list[Subscription]]:
+        with self._lock:
+            return {key: list(subs) for key, subs in self._subscriptions.items()}
+
+    def deliver(self, conversation_id: int) -> None:
+        """Wake every local waiter on `conversation_id`."""
+        with self._lock:
+            waiting = list(self._subscriptions.get(conversation_id, ()))
+        for subscription in waiting:
+            subscription.notify()
+
+
+class InProcessBus(MessageBus):
+    def publish(self, conversation_id: int, message_id: int) -> None:
+        self.deliver(conversation_id)
+
+
+class _ListenerThreadBus(MessageBus):
+    """Runs `_listen` in one daemon thread, started by the first subscriber."""
+
+    def __init__(self):
+        super().__init__()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    async def _prepare(self, subscription: Subscription) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name=self.__class__.__name__, daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _listen(self) -> None:
+        raise NotImplementedError
+
+
+class PostgresBus(_ListenerThreadBus):
+    channel = "chat_messages"
+    reconnect_seconds = 5.0
+
+    def publish(self, conversation_id: int, message_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, f"{conversation_id}:{message_id}"])
+
+    def _listen(self) -> None:
+        wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+        while not self._stop.is_set():
+            try:
+                raw = wrapper.get_new_connection(wrapper.get_connection_params())
+                raw.autocommit = True
+                try:
+                    raw.execute(f"LISTEN {self.channel}")
+                    while not self._stop.is_set():
+                        for notice in raw.notifies(timeout=self.reconnect_seconds):
+                            conversation_id, _, _message_id = notice.payload.partition(":")
+                            self.deliver(int(conversation_id))
+                finally:
+                    raw.close()
+            except Exception:
+                # Waiters fall back to their timeouts until we reconnect.
+                logger.exception("Chat LISTEN connection failed; retrying.")
+                self._stop.wait(self.reconnect_seconds)
+
+
+class CacheBus(_ListenerThreadBus):
+    poll_seconds = 0.25
+    timeout = 24 * 60 * 60
+
+    @staticmethod
+    def _key(conversation_id: int) -> str:
+        return f"chat:latest:{conversation_id}"
+
+    def publish(self, conversation_id: int, message_id: int) -> None:
+        cache.set(self._key(conversation_id), message_id, self.timeout)
+
+    async def _prepare(self, subscription: Subscription) -> None:
+        # Anything published after this point differs from the cursor.
+        subscription.cursor = await cache.aget(self._key(subscription.conversation_id))
+        await super()._prepare(subscription)
+
+    def _listen(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            subscribed = self._subscribed()
+            if not subscribed:
+                continue
+            latest = cache.get_many([self._key(pk) for pk in subscribed])
+            for conversation_id, subscriptions in subscribed.items():
+                value = latest.get(self._key(conversation_id))
+                for subscription in subscriptions:
+                    if value is not None and value != subscription.cursor:
+                        subscription.cursor = value
+                        subscription.notify()
+
+
+_bus: MessageBus | None = None
+_bus_lock = threading.Lock()
+
+
+def _backend_path() -> str:
+    configured = getattr(settings, "CHAT_BUS_BACKEND", "")
+    if configured:
+        return configured
+    return "chat.bus.PostgresBus" if connection.vendor == "postgresql" else "chat.bus.InProcessBus"
+
+
+def get_bus() -> MessageBus:
+    """Process-wide bus for `settings.CHAT_BUS_BACKEND`."""
+    global _bus
+    path = _backend_path()
+    with _bus_lock:
+        if _bus is None or _bus.__class__ is not import_string(path):
+            if isinstance(_bus, _ListenerThreadBus):
+                _bus.stop()
+            _bus = import_string(path)()
+        return _bus
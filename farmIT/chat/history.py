@@ -0,0 +1,39 @@
+"""Keyset pagination of a conversation's messages.
+
+The thread page renders only the newest `PAGE_SIZE` messages; "Load older"
+asks `history.json?before=<id>` for the page before the oldest one shown.
+Pages are keyed on `(conversation_id, id)`, which the `message_conv_id_idx`
+index serves directly, so every page costs the same however long the thread
+is. Message ids only grow, so id order is send order.
+"""
+
+from dataclasses import dataclass
+
+from .models import Conversation, Message
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass(frozen=True)
+class Page:
+    messages: list[Message]  # oldest first
+    has_more: bool
+
+    @property
+    def oldest_id(self) -> int | None:
+        return self.messages[0].id if self.messages else None
+
+    @property
+    def newest_id(self) -> int:
+        return self.messages[-1].id if self.messages else 0
+
+
+def messages_before(conversation: Conversation, before_id: int | None = None, limit: int = PAGE_SIZE) -> Page:
+    """Up to `limit` messages older than `before_id` (default: the newest)."""
+    qs = Message.objects.filter(conversation=conversation).select_related("sender")
+    if before_id is not None:
+        qs = qs.filter(id__lt=before_id)
+    # One extra row tells us whether another page exists.
+    rows = list(qs.order_by("-id")[: limit + 1])
+    return Page(messages=rows[:limit][::-1], has_more=len(rows) > limit)
@@ -0,0 +1,118 @@
+"""Denormalized inbox state kept on `Conversation`.
+
+Each conversation stores its last message (id, sender and a short preview),
+a read watermark per participant (`<side>_read_through`, the id of the
+newest message they have seen) and how many of the other participant's
+messages lie above that watermark, so the inbox lists any number of threads
+from one query with no per-row `Message` lookups.
+
+Message ids only grow, so "unread" is just `id > watermark`. `mark_read`
+returns without writing when the watermark would not move, which keeps
+steady-state polling read-only; when it does move, the watermark and the
+counter change together under a row lock. `record_message` runs from
+`chat.signals` inside `Message.save()`'s transaction. Code that bypasses
+them (`bulk_create()`, raw watermark updates) must call `rebuild_inbox()`.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Substr
+
+from .models import Conversation, Message
+
+PREVIEW_LENGTH = 120
+
+
+def preview(body: str) -> str:
+    text = " ".join(body.split())
+    if len(text) <= PREVIEW_LENGTH:
+        return text
+    return text[: PREVIEW_LENGTH - 1].rstrip() + "…"
+
+
+def unread_field(conversation: Conversation, user_id: int) -> str:
+    """The counter holding `user_id`'s unread messages in `conversation`."""
+    return "farmer_unread" if conversation.farmer_id == user_id else "customer_unread"
+
+
+def read_through_field(conversation: Conversation, user_id: int) -> str:
+    """The watermark holding the newest message id `user_id` has seen."""
+    return "farmer_read_through" if conversation.farmer_id == user_id else "customer_read_through"
+
+
+def record_message(message: Message) -> None:
+    """Point the conversation at `message` and count it as unread for the recipient."""
+    conversation = message.conversation
+    recipient_unread = "customer_unread" if message.sender_id == conversation.farmer_id else "farmer_unread"
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message=message,
+        last_sender_id=message.sender_id,
+        last_message_preview=preview(message.body),
+        last_message_at=message.created_at,
+        **{recipient_unread: F(recipient_unread) + 1},
+    )
+
+
+def mark_read(conversation: Conversation, user_id: int, up_to_id: int | None = None) -> int:
+    """Move `user_id`'s watermark up to `up_to_id` (default: the last message).
+
+    Returns how many of the other participant's messages became read.
+    """
+    field = read_through_field(conversation, user_id)
+    if up_to_id is not None and up_to_id <= getattr(conversation, field):
+        return 0
+
+    counter = unread_field(conversation, user_id)
+    with transaction.atomic():
+        current, last_message_id = (
+            Conversation.objects.select_for_update()
+            .values_list(field, "last_message_id")
+            .get(pk=conversation.pk)
+        )
+        if up_to_id is None:
+            up_to_id = last_message_id or 0
+        if up_to_id <= current:
+            # Another request of the same user got there first.
+            setattr(conversation, field, current)
+            return 0
+        marked = (
+            conversation.messages.filter(id__gt=current, id__lte=up_to_id).exclude(sender_id=user_id).count()
+        )
+        Conversation.objects.filter(pk=conversation.pk).update(
+            **{field: up_to_id, counter: Greatest(F(counter) - marked, 0)}
+        )
+    setattr(conversation, field, up_to_id)
+    return marked
+
+
+def with_unread_for(queryset, user):
+    """Annotate each conversation with `unread`, the count for `user`'s side."""
+    return queryset.annotate(
+        unread=Case(When(farmer=user, then=F("farmer_unread")), default=F("customer_unread"))
+    )
+
+
+def rebuild_inbox(conversations=None) -> int:
+    """Recompute the denormalized fields from `Message` rows."""
+    qs = Conversation.objects.all() if conversations is None else conversations
+    latest = Message.objects.filter(conversation=OuterRef("pk")).order_by("-created_at", "-id")
+
+    def unread_from(side: str, watermark: str):
+        counted = (
+            Message.objects.filter(
+                conversation=OuterRef("pk"), sender=OuterRef(side), id__gt=OuterRef(watermark)
+            )
+            .order_by()
+            .values("conversation")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+    return qs.update(
+        last_message=Subquery(latest.values("pk")[:1]),
+        last_sender=Subquery(latest.values("sender")[:1]),
+        last_message_preview=Coalesce(Substr(Subquery(latest.values("body")[:1]), 1, PREVIEW_LENGTH), Value("")),
+        farmer_unread=unread_from("customer", "farmer_read_through"),
+        customer_unread=unread_from("farmer", "customer_read_through"),
+    )
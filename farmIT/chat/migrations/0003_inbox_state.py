@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_inbox(apps, schema_editor):
+    # Same computation as chat.inbox.rebuild_inbox, against the historical models.
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    latest = Message.objects.filter(conversation=models.OuterRef('pk')).order_by('-created_at', '-id')
+
+    def unread_from(side):
+        counted = (
+            Message.objects.filter(conversation=models.OuterRef('pk'), is_read=False, sender=models.OuterRef(side))
+            .order_by()
+            .values('conversation')
+            .annotate(n=models.Count('pk'))
+            .values('n')
+        )
+        return Coalesce(models.Subquery(counted, output_field=models.IntegerField()), 0)
+
+    Conversation.objects.update(
+        last_message=models.Subquery(latest.values('pk')[:1]),
+        last_sender=models.Subquery(latest.values('sender')[:1]),
+        last_message_preview=Coalesce(Substr(models.Subquery(latest.values('body')[:1]), 1, 120), models.Value('')),
+        farmer_unread=unread_from('customer'),
+        customer_unread=unread_from('farmer'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='customer_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='farmer_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:48
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_watermarks(apps, schema_editor):
+    # A participant has read through the newest message of the other side that was
+    # flagged read; recount unread from there so the counters match the watermarks.
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+
+    def newest_read(side):
+        read = (
+            Message.objects.filter(conversation=models.OuterRef('pk'), sender=models.OuterRef(side), is_read=True)
+            .order_by('-id')
+            .values('id')[:1]
+        )
+        return Coalesce(models.Subquery(read), 0)
+
+    def unread_from(side, watermark):
+        counted = (
+            Message.objects.filter(
+                conversation=models.OuterRef('pk'), sender=models.OuterRef(side), id__gt=models.OuterRef(watermark)
+            )
+            .order_by()
+            .values('conversation')
+            .annotate(n=models.Count('pk'))
+            .values('n')
+        )
+        return Coalesce(models.Subquery(counted, output_field=models.IntegerField()), 0)
+
+    Conversation.objects.update(
+        farmer_read_through=newest_read('customer'),
+        customer_read_through=newest_read('farmer'),
+    )
+    Conversation.objects.update(
+        farmer_unread=unread_from('customer', 'farmer_read_through'),
+        customer_unread=unread_from('farmer', 'customer_read_through'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='customer_read_through',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='farmer_read_through',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
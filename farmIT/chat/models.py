@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 
 class Conversation(models.Model):
@@ -24,6 +24,27 @@ class Conversation(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     last_message_at = models.DateTimeField(auto_now_add=True)
+    # Inbox state maintained by `chat.inbox` so the inbox needs no Message queries.
+    last_message = models.ForeignKey(
+        "Message",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    last_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    last_message_preview = models.CharField(max_length=120, blank=True)
+    # Read watermarks: the newest message id each participant has seen.
+    farmer_read_through = models.PositiveBigIntegerField(default=0)
+    customer_read_through = models.PositiveBigIntegerField(default=0)
+    farmer_unread = models.PositiveIntegerField(default=0)
+    customer_unread = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-last_message_at", "-created_at"]
@@ -56,12 +77,21 @@ class Message(models.Model):
     )
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["created_at"], name="message_created_idx"),
+            # Keyset pages of one thread (chat.history).
+            models.Index(fields=["conversation", "id"], name="message_conv_id_idx"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Message<{self.sender} -> {self.conversation_id}>"
 
+    def save(self, *args, **kwargs):
+        # post_save updates the conversation's inbox fields; keep them in the same transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
 
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import inbox, stamps
+from .bus import get_bus
+from .models import Message
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chat_record_message")
+def record_message(sender, instance: Message, created: bool = False, raw: bool = False, **kwargs) -> None:
+    """Update the conversation's last-message preview and unread counter."""
+    if raw or not created:
+        return
+    inbox.record_message(instance)
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chat_publish_message")
+def publish_message(sender, instance: Message, created: bool = False, raw: bool = False, **kwargs) -> None:
+    """Wake requests waiting on this conversation once the message is committed."""
+    if raw or not created:
+        return
+    conversation_id, message_id = instance.conversation_id, instance.pk
+    transaction.on_commit(lambda: get_bus().publish(conversation_id, message_id))
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chat_stamp_message")
+def stamp_message(sender, instance: Message, created: bool = False, raw: bool = False, **kwargs) -> None:
+    """Let polls see the new message once it is committed (see `chat.stamps`)."""
+    if raw or not created:
+        return
+    conversation, message_id = instance.conversation, instance.pk
+    transaction.on_commit(lambda: stamps.advance(conversation, message_id))
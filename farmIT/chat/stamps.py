@@ -0,0 +1,89 @@
+"""Per-conversation stamps that answer "anything new?" cheaply.
+
+A stamp is `(farmer_id, customer_id, last_message_id)`. A poll whose
+`last_id` already matches it is answered without touching `chat_message`.
+
+Stamps are cached under `chat:stamp:<pk>` in `settings.CHAT_STAMP_CACHE`,
+which must name a cache every worker shares (e.g. Redis): a process-local
+cache would keep answering "nothing new" for messages another worker saved.
+When it is empty (the default) each stamp is read from `Conversation`'s
+denormalized `last_message`, one primary-key lookup per poll.
+
+With a cache, `chat.signals` advances the stamp once a new message commits.
+A missing stamp is rebuilt from `Conversation`; the rebuild only `add()`s,
+so it never overwrites a newer stamp written meanwhile. Stamps expire after
+`CACHE_TIMEOUT`, which bounds how long a lost update could hide a message
+from plain polls.
+"""
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Conversation
+
+CACHE_TIMEOUT = 5 * 60
+
+
+@dataclass(frozen=True)
+class Stamp:
+    farmer_id: int
+    customer_id: int
+    last_message_id: int
+
+    def allows(self, user_id: int) -> bool:
+        return user_id in (self.farmer_id, self.customer_id)
+
+
+def etag_for(message_id: int) -> str:
+    """ETag of a poll response that leaves the client holding `message_id`."""
+    return f'"m{message_id}"'
+
+
+def _key(conversation_id: int) -> str:
+    return f"chat:stamp:{conversation_id}"
+
+
+def _cache():
+    alias = getattr(settings, "CHAT_STAMP_CACHE", "")
+    return caches[alias] if alias else None
+
+
+def _load(conversation_id: int):
+    row = (
+        Conversation.objects.filter(pk=conversation_id)
+        .values_list("farmer_id", "customer_id", "last_message_id")
+        .first()
+    )
+    return None if row is None else (row[0], row[1], row[2] or 0)
+
+
+def get_stamp(conversation_id: int) -> Stamp | None:
+    """The conversation's stamp, or `None` if the conversation does not exist."""
+    cache = _cache()
+    if cache is None:
+        row = _load(conversation_id)
+        return None if row is None else Stamp(*row)
+
+    key = _key(conversation_id)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _load(conversation_id)
+        if cached is None:
+            return None
+        cache.add(key, cached, CACHE_TIMEOUT)
+    return Stamp(*cached)
+
+
+def advance(conversation: Conversation, message_id: int) -> None:
+    """Record `message_id` as the newest message, unless a newer one is stamped."""
+    cache = _cache()
+    if cache is None:
+        return
+    key = _key(conversation.pk)
+    cached = cache.get(key)
+    if cached is not None and cached[2] >= message_id:
+        return
+    stamp = (conversation.farmer_id, conversation.customer_id, message_id)
+    cache.set(key, stamp, CACHE_TIMEOUT)
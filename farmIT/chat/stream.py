@@ -0,0 +1,85 @@
+"""Push delivery of new chat messages.
+
+Conversation pages hold one Server-Sent Events connection (`message_stream`)
+instead of polling every two seconds. The stream sends each batch of new
+messages as an event whose `id` is the last message id, so a reconnecting
+`EventSource` resumes from `Last-Event-ID` without gaps or repeats. Streams
+end after `STREAM_SECONDS` (the browser reconnects on its own), and comment
+heartbeats keep idle proxies from closing the connection.
+
+Streaming needs the ASGI server (`farmIT.asgi`). Under WSGI, or with
+`CHAT_STREAMING` off, the stream endpoint answers 204 and the page falls
+back to long-polling `messages.json?wait=N`, which holds the request until a
+message arrives or the wait runs out.
+
+A waiting connection sleeps on the conversation's `chat.bus` subscription
+and touches the database only when it wakes (or once per heartbeat).
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from .bus import get_bus
+from .inbox import mark_read
+from .models import Conversation, Message
+
+HEARTBEAT_SECONDS = 15.0
+STREAM_SECONDS = 120.0
+LONG_POLL_MAX_SECONDS = 25.0
+RETRY_MILLISECONDS = 3000
+
+
+def serialize_message(message: Message, user_id: int) -> dict:
+    return {
+        "id": message.id,
+        "body": message.body,
+        "sender_id": message.sender_id,
+        "sender_username": message.sender.username,
+        "created_at": message.created_at.strftime("%b %d, %H:%M"),
+        "is_own": message.sender_id == user_id,
+    }
+
+
+def fetch_new_messages(conversation: Conversation, user_id: int, after_id: int) -> list[dict]:
+    """Messages after `after_id`, marking the other party's as read."""
+    messages_qs = (
+        Message.objects.filter(conversation=conversation, id__gt=after_id)
+        .select_related("sender")
+        .order_by("created_at", "id")
+    )
+    messages = list(messages_qs)
+    if messages:
+        mark_read(conversation, user_id, messages[-1].id)
+    return [serialize_message(message, user_id) for message in messages]
+
+
+async def wait_for_message(conversation_id: int, after_id: int, timeout: float) -> bool:
+    """Wait up to `timeout` seconds for a message after `after_id`."""
+    async with get_bus().subscribe(conversation_id) as subscription:
+        # Subscribed before checking, so a message committed in between still wakes us.
+        pending = Message.objects.filter(conversation_id=conversation_id, id__gt=after_id)
+        if await pending.aexists():
+            return True
+        return await subscription.wait(timeout)
+
+
+def format_event(messages: list[dict]) -> str:
+    return f"id: {messages[-1]['id']}\nevent: messages\ndata: {json.dumps(messages)}\n\n"
+
+
+async def event_stream(conversation: Conversation, user_id: int, after_id: int):
+    """Yield SSE frames for new messages until `STREAM_SECONDS` have passed."""
+    fetch = sync_to_async(fetch_new_messages)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_SECONDS
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    while (remaining := deadline - loop.time()) > 0:
+        if await wait_for_message(conversation.pk, after_id, min(HEARTBEAT_SECONDS, remaining)):
+            messages = await fetch(conversation, user_id, after_id)
+            if messages:
+                after_id = messages[-1]["id"]
+                yield format_event(messages)
+                continue
+        yield ": keepalive\n\n"
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Product
+
+from .bus import CacheBus, InProcessBus, get_bus
+from .history import PAGE_SIZE
+from .inbox import mark_read, rebuild_inbox
+from .models import Conversation, Message
+from .stream import wait_for_message
+
+
+def make_user(username: str, role: str = "customer"):
+    return get_user_model().objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass12345", role=role
+    )
+
+
+class ChatFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user("fely", "farmer")
+        self.customer = make_user("gino")
+        product = Product.objects.create(farmer=self.farmer, product_name="Kale", price=10, quantity=1)
+        self.conversation = Conversation.objects.create(
+            farmer=self.farmer, customer=self.customer, product=product
+        )
+
+    def say(self, sender, body="Hello"):
+        return Message.objects.create(conversation=self.conversation, sender=sender, body=body)
+
+
+class MessagePushTests(ChatFixtureMixin, TestCase):
+    def test_json_endpoint_returns_new_messages_and_marks_them_read(self):
+        first = self.say(self.farmer, "Hi")
+        second = self.say(self.farmer, "Still there?")
+        self.client.force_login(self.customer)
+
+        url = reverse("chat_messages_json", args=[self.conversation.pk])
+        data = self.client.get(url, {"last_id": first.pk}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], [second.pk])
+        self.assertFalse(data["messages"][0]["is_own"])
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.customer_read_through, second.pk)
+
+    def test_long_poll_times_out_empty_and_rejects_outsiders(self):
+        message = self.say(self.farmer)
+        self.client.force_login(self.customer)
+        url = reverse("chat_messages_json", args=[self.conversation.pk])
+
+        data = self.client.get(url, {"last_id": message.pk, "wait": "0.05"}).json()
+        self.assertEqual(data["messages"], [])
+
+        self.client.force_login(make_user("hugo"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_stream_is_unavailable_without_asgi(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse("chat_message_stream", args=[self.conversation.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_resumes_from_last_event_id(self):
+        first = await Message.objects.acreate(conversation=self.conversation, sender=self.farmer, body="a")
+        second = await Message.objects.acreate(conversation=self.conversation, sender=self.farmer, body="b")
+        await self.async_client.aforce_login(self.customer)
+
+        response = await self.async_client.get(
+            reverse("chat_message_stream", args=[self.conversation.pk]),
+            headers={"Last-Event-ID": str(first.pk)},
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await anext(frames), b"retry: 3000\n\n")
+        event = (await anext(frames)).decode()
+        await frames.aclose()
+
+        self.assertIn(f"id: {second.pk}\n", event)
+        payload = json.loads(event.split("data: ", 1)[1])
+        self.assertEqual([m["body"] for m in payload], ["b"])
+
+    @override_settings(CHAT_STREAMING=False)
+    async def test_stream_can_be_switched_off(self):
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get(reverse("chat_message_stream", args=[self.conversation.pk]))
+        self.assertEqual(response.status_code, 204)
+
+
+class MessageBusTests(ChatFixtureMixin, TestCase):
+    async def assert_wakes(self, bus):
+        async with bus.subscribe(1) as watched, bus.subscribe(2) as other:
+            threading.Timer(0.05, bus.publish, (1, 99)).start()
+            started = time.monotonic()
+            self.assertTrue(await watched.wait(2))
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertFalse(await other.wait(0.3))
+
+    async def test_in_process_bus_wakes_only_that_conversation(self):
+        await self.assert_wakes(InProcessBus())
+
+    async def test_cache_bus_wakes_only_that_conversation(self):
+        bus = CacheBus()
+        try:
+            await self.assert_wakes(bus)
+        finally:
+            bus.stop()
+
+    def test_new_message_is_published_after_commit(self):
+        with mock.patch.object(InProcessBus, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                message = self.say(self.customer)
+                publish.assert_not_called()
+        publish.assert_called_once_with(self.conversation.pk, message.pk)
+
+    async def test_waiter_sleeps_until_published(self):
+        last = await Message.objects.acreate(conversation=self.conversation, sender=self.farmer, body="a")
+        waiter = asyncio.create_task(wait_for_message(self.conversation.pk, last.pk, 5))
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiter.done())
+
+        message = await Message.objects.acreate(conversation=self.conversation, sender=self.farmer, body="b")
+        started = time.monotonic()
+        get_bus().publish(self.conversation.pk, message.pk)
+        self.assertTrue(await waiter)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class InboxStateTests(ChatFixtureMixin, TestCase):
+    def inbox_state(self):
+        return Conversation.objects.values(
+            "last_message", "last_sender", "last_message_preview", "farmer_unread", "customer_unread"
+        ).get(pk=self.conversation.pk)
+
+    def test_sending_updates_preview_and_recipient_counter(self):
+        self.say(self.customer, "Is the kale fresh?")
+        message = self.say(self.customer, "  Picked   today?\n")
+        state = self.inbox_state()
+        self.assertEqual(state["last_message"], message.pk)
+        self.assertEqual(state["last_sender"], self.customer.pk)
+        self.assertEqual(state["last_message_preview"], "Picked today?")
+        self.assertEqual((state["farmer_unread"], state["customer_unread"]), (2, 0))
+
+    def test_reading_resets_only_the_readers_counter(self):
+        self.say(self.customer)
+        self.say(self.customer)
+        self.say(self.farmer)
+        self.assertEqual(mark_read(self.conversation, self.farmer.pk), 2)
+        self.assertEqual(mark_read(self.conversation, self.farmer.pk), 0)
+        state = self.inbox_state()
+        self.assertEqual((state["farmer_unread"], state["customer_unread"]), (0, 1))
+
+        self.client.force_login(self.customer)
+        self.client.get(reverse("chat_conversation_detail", args=[self.conversation.pk]))
+        self.assertEqual(self.inbox_state()["customer_unread"], 0)
+
+    def test_watermark_never_moves_back(self):
+        first = self.say(self.customer)
+        self.say(self.customer)
+        self.assertEqual(mark_read(self.conversation, self.farmer.pk), 2)
+        self.assertEqual(mark_read(self.conversation, self.farmer.pk, first.pk), 0)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.farmer_read_through, self.conversation.last_message_id)
+
+    def test_polling_without_new_messages_does_not_write(self):
+        message = self.say(self.farmer)
+        self.client.force_login(self.customer)
+        url = reverse("chat_messages_json", args=[self.conversation.pk])
+        self.client.get(url)  # reads through `message`
+
+        for last_id in (0, message.pk):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, {"last_id": last_id})
+            writes = [q["sql"] for q in queries if q["sql"].lstrip().upper().startswith(("UPDATE", "INSERT"))]
+            self.assertEqual(writes, [])
+
+    def test_inbox_queries_do_not_grow_with_conversations(self):
+        self.say(self.customer, "First thread")
+        for index in range(5):
+            other = Conversation.objects.create(farmer=self.farmer, customer=make_user(f"buyer{index}"))
+            Message.objects.create(conversation=other, sender=other.customer, body=f"Hi {index}")
+        self.client.force_login(self.farmer)
+
+        with self.assertNumQueries(3):  # session, user, conversations
+            response = self.client.get(reverse("chat_inbox"))
+        self.assertContains(response, "First thread")
+        self.assertContains(response, "Hi 4")
+
+    def test_rebuild_matches_incremental_state(self):
+        self.say(self.customer, "One")
+        self.say(self.farmer, "Two")
+        self.say(self.customer, "Three")
+        mark_read(self.conversation, self.customer.pk)
+        expected = self.inbox_state()
+
+        Conversation.objects.update(
+            last_message=None, last_sender=None, last_message_preview="", farmer_unread=0, customer_unread=0
+        )
+        rebuild_inbox()
+        self.assertEqual(self.inbox_state(), expected)
+
+
+class MessageHistoryTests(ChatFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.farmer, body=f"m{index}")
+            for index in range(PAGE_SIZE + 5)
+        )
+        self.ids = list(self.conversation.messages.order_by("id").values_list("id", flat=True))
+        self.client.force_login(self.customer)
+
+    def test_thread_renders_only_the_newest_page(self):
+        response = self.client.get(reverse("chat_conversation_detail", args=[self.conversation.pk]))
+        rendered = [m.id for m in response.context["messages"]]
+        self.assertEqual(rendered, self.ids[-PAGE_SIZE:])
+        self.assertContains(response, f'data-before="{self.ids[-PAGE_SIZE]}"')
+
+    def test_history_pages_back_to_the_first_message(self):
+        url = reverse("chat_message_history", args=[self.conversation.pk])
+        data = self.client.get(url, {"before": self.ids[-PAGE_SIZE]}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], self.ids[:5])
+        self.assertFalse(data["has_more"])
+
+        data = self.client.get(url, {"before": self.ids[10], "limit": 3}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], self.ids[7:10])
+        self.assertTrue(data["has_more"])
+
+    def test_history_is_private_to_participants(self):
+        self.client.force_login(make_user("hugo"))
+        response = self.client.get(reverse("chat_message_history", args=[self.conversation.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHAT_STAMP_CACHE="default")
+class ConversationStampTests(ChatFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+        self.url = reverse("chat_messages_json", args=[self.conversation.pk])
+
+    def chat_queries(self, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, *args, **kwargs)
+        return response, [q["sql"] for q in queries if "chat_" in q["sql"]]
+
+    def test_current_poll_skips_the_database(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            message = self.say(self.farmer)
+        self.client.get(self.url)  # catches up
+
+        response, queries = self.chat_queries({"last_id": message.pk})
+        self.assertEqual(queries, [])
+        self.assertEqual(response.json(), {"messages": []})
+
+        response, queries = self.chat_queries({"last_id": message.pk}, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, [])
+
+    def test_new_message_advances_the_stamp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.say(self.farmer, "one")
+        self.client.get(self.url, {"last_id": first.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.say(self.farmer, "two")
+
+        data = self.client.get(self.url, {"last_id": first.pk}).json()
+        self.assertEqual([m["body"] for m in data["messages"]], ["two"])
+
+    def test_missing_stamp_is_rebuilt(self):
+        message = self.say(self.farmer)  # on_commit never runs: no stamp update
+        cache.clear()
+        data = self.client.get(self.url, {"last_id": 0}).json()
+        self.assertEqual([m["id"] for m in data["messages"]], [message.pk])
+
+        self.client.force_login(make_user("hugo"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(CHAT_STAMP_CACHE="")
+    def test_without_a_shared_cache_stamps_come_from_the_conversation(self):
+        first = self.say(self.farmer, "one")  # on_commit never runs: nothing cached
+        second = self.say(self.farmer, "two")
+
+        response, queries = self.chat_queries({"last_id": second.pk})
+        self.assertEqual(response.json(), {"messages": []})
+        self.assertEqual(len(queries), 1)
+        self.assertIn("chat_conversation", queries[0])
+
+        data = self.client.get(self.url, {"last_id": first.pk}).json()
+        self.assertEqual([m["body"] for m in data["messages"]], ["two"])
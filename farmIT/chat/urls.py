@@ -7,6 +7,8 @@ urlpatterns = [
     path("", views.inbox, name="chat_inbox"),
     path("conversations/<int:pk>/", views.conversation_detail, name="chat_conversation_detail"),
     path("conversations/<int:pk>/messages.json", views.get_messages_json, name="chat_messages_json"),
+    path("conversations/<int:pk>/history.json", views.message_history, name="chat_message_history"),
+    path("conversations/<int:pk>/stream/", views.message_stream, name="chat_message_stream"),
     path("start/product/<int:product_id>/", views.start_conversation_product, name="chat_start_product"),
     path("start/farm/<slug:slug>/", views.start_conversation_farm, name="chat_start_farm"),
 ]
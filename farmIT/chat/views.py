@@ -1,23 +1,29 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q
-from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
 
 from products.models import Product, Farm
 
-from farmIT.throttling import check_throttle
-
 from .forms import MessageForm
+from .history import MAX_PAGE_SIZE, PAGE_SIZE, messages_before
+from .inbox import mark_read, with_unread_for
 from .models import Conversation, Message
+from .stamps import etag_for, get_stamp
+from .stream import LONG_POLL_MAX_SECONDS, event_stream, fetch_new_messages, serialize_message, wait_for_message
 
 
 @login_required
 def inbox(request: HttpRequest) -> HttpResponse:
     """Simple message center showing all conversations for the current user."""
     conversations = (
-        Conversation.objects.filter(
-            Q(farmer=request.user) | Q(customer=request.user)
+        with_unread_for(
+            Conversation.objects.filter(Q(farmer=request.user) | Q(customer=request.user)),
+            request.user,
         )
         .select_related("farmer", "customer", "product")
         .only(
@@ -29,6 +35,10 @@ def inbox(request: HttpRequest) -> HttpResponse:
             "product__id",
             "product__product_name",
             "last_message_at",
+            "last_message_preview",
+            "last_sender_id",
+            "farmer_unread",
+            "customer_unread",
             "created_at",
         )
         .order_by("-last_message_at", "-created_at")
@@ -52,43 +62,57 @@ def conversation_detail(request: HttpRequest, pk: int) -> HttpResponse:
         pk=pk,
     )
 
-    messages_qs = conversation.messages.select_related("sender").order_by("created_at")
-
-    # Mark messages from the other party as read.
-    messages_qs.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
-
     if request.method == "POST":
-        throttle = check_throttle(f"chat:send:{request.user.id}:{conversation.pk}", limit=60, window_seconds=60)
-        if not throttle.allowed:
-            # Avoid leaking operational details; keep response generic.
-            return HttpResponse("Too many messages, please slow down.", status=429)
-
         form = MessageForm(request.POST)
         if form.is_valid():
             body = form.cleaned_data["body"].strip()
             if body:
+                # chat.signals moves last_message_at and the inbox preview along.
                 Message.objects.create(
                     conversation=conversation,
                     sender=request.user,
                     body=body,
                 )
-                conversation.last_message_at = timezone.now()
-                conversation.save(update_fields=["last_message_at"])
             return redirect("chat_conversation_detail", pk=conversation.pk)
     else:
         form = MessageForm()
 
+    page = messages_before(conversation)
+    # Everything up to the newest message shown is now read.
+    mark_read(conversation, request.user.id, page.newest_id)
+
     return render(
         request,
         "chat/conversation_detail.html",
         {
             "conversation": conversation,
-            "messages": messages_qs,
+            # Only the newest page; older ones load from `message_history`.
+            "messages": page.messages,
+            "page": page,
             "form": form,
         },
     )
 
 
+@login_required
+def message_history(request: HttpRequest, pk: int) -> JsonResponse:
+    """JSON page of messages older than `?before=<id>`, for "Load older"."""
+    conversation = get_object_or_404(_participant_conversations(request.user), pk=pk)
+    before_id = _after_id(request.GET.get("before")) or None
+    try:
+        limit = min(max(int(request.GET.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        limit = PAGE_SIZE
+
+    page = messages_before(conversation, before_id, limit)
+    return JsonResponse(
+        {
+            "messages": [serialize_message(message, request.user.id) for message in page.messages],
+            "has_more": page.has_more,
+        }
+    )
+
+
 @login_required
 def start_conversation_product(request: HttpRequest, product_id: int) -> HttpResponse:
     """Customer-initiated conversation from a product detail page."""
@@ -103,11 +127,6 @@ def start_conversation_product(request: HttpRequest, product_id: int) -> HttpRes
     if product.farmer_id == request.user.id:
         return HttpResponseForbidden("You cannot start a chat with your own listing.")
 
-    # Lightweight per-user throttling on conversation creation.
-    throttle = check_throttle(f"chat:start_product:{request.user.id}", limit=20, window_seconds=60)
-    if not throttle.allowed:
-        return HttpResponse("Too many new conversations, please slow down.", status=429)
-
     conversation, _created = Conversation.objects.get_or_create(
         farmer=product.farmer,
         customer=request.user,
@@ -131,10 +150,6 @@ def start_conversation_farm(request: HttpRequest, slug: str) -> HttpResponse:
     if farm.farmer_id == request.user.id:
         return HttpResponseForbidden("You cannot start a chat with your own farm.")
 
-    throttle = check_throttle(f"chat:start_farm:{request.user.id}", limit=20, window_seconds=60)
-    if not throttle.allowed:
-        return HttpResponse("Too many new conversations, please slow down.", status=429)
-
     conversation, _created = Conversation.objects.get_or_create(
         farmer=farm.farmer,
         customer=request.user,
@@ -144,43 +159,72 @@ def start_conversation_farm(request: HttpRequest, slug: str) -> HttpResponse:
     return redirect("chat_conversation_detail", pk=conversation.pk)
 
 
+def _after_id(value) -> int:
+    try:
+        return max(int(value), 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def _participant_conversations(user):
+    return Conversation.objects.filter(Q(farmer=user) | Q(customer=user))
+
+
 @login_required
-def get_messages_json(request: HttpRequest, pk: int) -> JsonResponse:
-    """JSON endpoint to fetch messages for auto-refresh."""
-    throttle = check_throttle(f"chat:poll:{request.user.id}:{pk}", limit=120, window_seconds=60)
-    if not throttle.allowed:
-        return JsonResponse({"error": "Too many requests, slow down."}, status=429)
+async def get_messages_json(request: HttpRequest, pk: int) -> JsonResponse:
+    """JSON endpoint for new messages; `?wait=N` long-polls for up to N seconds."""
+    user = await request.auser()
 
-    conversation = get_object_or_404(
-        Conversation.objects.filter(
-            Q(farmer=request.user) | Q(customer=request.user)
-        ),
-        pk=pk,
-    )
+    stamp = await sync_to_async(get_stamp)(pk)
+    if stamp is None or not stamp.allows(user.id):
+        raise Http404
 
     # Get last message ID from query param to only fetch new messages
-    last_id = request.GET.get("last_id", 0)
+    last_id = _after_id(request.GET.get("last_id"))
     try:
-        last_id = int(last_id)
-    except (ValueError, TypeError):
-        last_id = 0
+        wait = min(max(float(request.GET.get("wait", 0)), 0.0), LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        wait = 0.0
+
+    # Already current: answer from the stamp alone, or go straight to waiting.
+    up_to_date = last_id >= stamp.last_message_id
+    if up_to_date and not wait:
+        if request.headers.get("If-None-Match") == etag_for(last_id):
+            response = HttpResponse(status=304)
+        else:
+            response = JsonResponse({"messages": []})
+        response["ETag"] = etag_for(last_id)
+        return response
+
+    messages_data = []
+    fetch = sync_to_async(fetch_new_messages)
+    conversation = await Conversation.objects.aget(pk=pk)
+    if not up_to_date:
+        messages_data = await fetch(conversation, user.id, last_id)
+    if not messages_data and wait and await wait_for_message(pk, last_id, wait):
+        messages_data = await fetch(conversation, user.id, last_id)
 
-    messages_qs = conversation.messages.filter(id__gt=last_id).select_related("sender").order_by("created_at")
+    response = JsonResponse({"messages": messages_data})
+    response["ETag"] = etag_for(messages_data[-1]["id"] if messages_data else last_id)
+    return response
 
-    # Mark new messages from the other party as read
-    messages_qs.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
 
-    messages_data = []
-    for msg in messages_qs:
-        messages_data.append({
-            "id": msg.id,
-            "body": msg.body,
-            "sender_id": msg.sender_id,
-            "sender_username": msg.sender.username,
-            "created_at": msg.created_at.strftime("%b %d, %H:%M"),
-            "is_own": msg.sender_id == request.user.id,
-        })
+@login_required
+async def message_stream(request: HttpRequest, pk: int) -> HttpResponse:
+    """Server-Sent Events stream of new messages (see `chat.stream`)."""
+    if not settings.CHAT_STREAMING or not isinstance(request, ASGIRequest):
+        # No streaming here; 204 tells EventSource to stop and the page to long-poll.
+        return HttpResponse(status=204)
 
-    return JsonResponse({"messages": messages_data})
+    user = await request.auser()
 
+    conversation = await aget_object_or_404(_participant_conversations(user), pk=pk)
+    after_id = _after_id(request.headers.get("Last-Event-ID") or request.GET.get("last_id"))
 
+    response = StreamingHttpResponse(
+        event_stream(conversation, user.id, after_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # stop nginx-style proxies buffering events
+    return response
@@ -1,37 +1,185 @@
-import time
 from typing import Callable
 
-from django.core.cache import cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.signals import user_logged_out
+from django.dispatch import receiver
 from django.http import HttpRequest, HttpResponse
 from django.conf import settings
+from django.utils.functional import empty
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from ratelimit.engine import SLIDING_WINDOW, Limit, check, check_many
+
+from .rate_policies import policies
+from .throttling import ThrottleResult
+
+
+async def _read_blocks(file, block_size: int):
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while block := await read(block_size):
+        yield block
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """`WhiteNoiseMiddleware` that also runs natively under ASGI.
+
+    WhiteNoise's own middleware is sync-only, so Django would run the whole
+    chain in a thread and every long-poll or event stream would hold one.
+    Here the lookup stays on the event loop and files are read a block at a
+    time in a thread, instead of being collected whole by Django first.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.serve)(static_file, request)
+        if response.file_to_stream is not None:
+            # The file stays registered for closing with the response.
+            response.streaming_content = _read_blocks(response.file_to_stream, response.block_size)
+        return response
+
+
+@receiver(user_logged_out, dispatch_uid="farmit_rate_limit_signed_out")
+def _mark_signed_out(sender, request, **kwargs):
+    """Have `RateLimitMiddleware` drop its signed-in cookie on this response."""
+    if request is not None:
+        request._rate_limit_signed_out = True
 
 
 class RateLimitMiddleware:
-    """Simple fixed-window rate limiting per IP.
+    """Per-IP rate limiting plus the route policies in `farmIT.rate_policies`.
 
-    Limits anonymous users to `MAX_REQUESTS` per `WINDOW_SECONDS`.
-    Authenticated users have a higher threshold.
+    Every request that is not exempt is first counted against its IP: up to
+    `MAX_REQUESTS_ANON` per `WINDOW_SECONDS`, or `MAX_REQUESTS_AUTH` when it
+    carries a valid `SIGNED_IN_COOKIE`. That cookie is signed, so checking it
+    is an HMAC rather than a session load; it is issued (or dropped) on the
+    way out whenever the view has loaded `request.user` anyway, and always
+    dropped on the response to a logout.
+    Route policies are checked once the view is resolved, and touch
+    `request.user` only if one of them is counted per user.
+
+    Responses carry `RateLimit-*` headers for the tightest limit checked.
+
+    Runs natively under ASGI, so a waiting long-poll or stream does not hold
+    a worker thread; only the backend check is run in a thread.
     """
 
+    sync_capable = True
+    async_capable = True
+
     MAX_REQUESTS_ANON = 60
     MAX_REQUESTS_AUTH = 240
     WINDOW_SECONDS = 60
+    SIGNED_IN_COOKIE = "farmit_rl"
+    SIGNED_IN_SALT = "farmIT.middleware.RateLimitMiddleware"
 
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if policies.is_exempt(request.path_info):
+            return self.get_response(request)
+
+        denied = self._check_ip(request)
+        if denied is not None:
+            return denied
+        return self._add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if policies.is_exempt(request.path_info):
+            return await self.get_response(request)
+
+        denied = await sync_to_async(self._check_ip)(request)
+        if denied is not None:
+            return denied
+        return self._add_headers(request, await self.get_response(request))
+
+    def _check_ip(self, request: HttpRequest) -> HttpResponse | None:
         client_ip = self._get_client_ip(request)
-        key = f"rl:{client_ip}:{int(time.time() // self.WINDOW_SECONDS)}"
-        max_requests = (
-            self.MAX_REQUESTS_AUTH if request.user.is_authenticated else self.MAX_REQUESTS_ANON
+        request._rate_limit_signed_in = self._has_signed_in_cookie(request)
+        max_requests = self.MAX_REQUESTS_AUTH if request._rate_limit_signed_in else self.MAX_REQUESTS_ANON
+        result = ThrottleResult.from_decision(
+            check(Limit(f"rl:{client_ip}", max_requests, self.WINDOW_SECONDS, SLIDING_WINDOW))
         )
+        if not result.allowed:
+            return self._too_many_requests(result)
+        request._rate_limit = result
+        return None
+
+    def _add_headers(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        for header, value in request._rate_limit.headers().items():
+            response.headers.setdefault(header, value)
+        self._sync_signed_in_cookie(request, response)
+        return response
 
-        count = cache.get(key, 0)
-        if count >= max_requests:
-            return HttpResponse('Too many requests, slow down.', status=429)
-        cache.set(key, count + 1, timeout=self.WINDOW_SECONDS)
-        return self.get_response(request)
+    def _has_signed_in_cookie(self, request: HttpRequest) -> bool:
+        value = request.get_signed_cookie(
+            self.SIGNED_IN_COOKIE, default=None, salt=self.SIGNED_IN_SALT, max_age=settings.SESSION_COOKIE_AGE
+        )
+        return value is not None
+
+    def _sync_signed_in_cookie(self, request: HttpRequest, response: HttpResponse) -> None:
+        if getattr(request, "_rate_limit_signed_out", False):
+            response.delete_cookie(self.SIGNED_IN_COOKIE, samesite=settings.SESSION_COOKIE_SAMESITE)
+            return
+        user = getattr(request, "user", None)
+        user = getattr(user, "_wrapped", user)
+        if user is None or user is empty:
+            return  # never load the session just for this
+        if user.is_authenticated and not request._rate_limit_signed_in:
+            response.set_signed_cookie(
+                self.SIGNED_IN_COOKIE,
+                str(user.pk),
+                salt=self.SIGNED_IN_SALT,
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        elif not user.is_authenticated and request._rate_limit_signed_in:
+            response.delete_cookie(self.SIGNED_IN_COOKIE, samesite=settings.SESSION_COOKIE_SAMESITE)
+
+    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs):
+        matched = policies.policies_for(request) if hasattr(request, "_rate_limit") else []
+        if not matched:
+            return None
+
+        client_ip = self._get_client_ip(request)
+        decisions = check_many([policy.limit_for(request, client_ip, view_kwargs) for policy in matched])
+        tightest = ThrottleResult.from_decision(min(decisions, key=lambda d: (d.allowed, d.remaining)))
+        if not tightest.allowed or tightest.remaining < request._rate_limit.remaining:
+            request._rate_limit = tightest
+        if not tightest.allowed:
+            return self._too_many_requests(tightest)
+        return None
+
+    @staticmethod
+    def _too_many_requests(result: ThrottleResult) -> HttpResponse:
+        response = HttpResponse('Too many requests, slow down.', status=429)
+        for header, value in result.headers().items():
+            response[header] = value
+        return response
 
     @staticmethod
     def _get_client_ip(request: HttpRequest) -> str:
@@ -0,0 +1,37 @@
+"""Route-level rate limits, applied by `farmIT.middleware.RateLimitMiddleware`.
+
+Register limits here by URL name (or path prefix) rather than building
+throttle keys inside views. Limits are per user unless `per=IP`; `kwargs`
+gives each object its own counter (e.g. one per conversation).
+"""
+
+from ratelimit.engine import TOKEN_BUCKET
+from ratelimit.policies import IP, Policy, PolicyRegistry
+
+POST = ("POST",)
+
+policies = PolicyRegistry()
+
+# Never counted: static assets and the favicon.
+policies.exempt("/static/", "/media/", "/favicon.ico")
+
+# Chat
+policies.route("chat_conversation_detail", Policy("chat:send", 60, 60, methods=POST, kwargs=("pk",)))
+policies.route("chat_message_history", Policy("chat:history", 60, 60, kwargs=("pk",)))
+policies.route("chat_messages_json", Policy("chat:poll", 120, 60, kwargs=("pk",)))
+policies.route("chat_message_stream", Policy("chat:stream", 30, 60, kwargs=("pk",)))
+policies.route("chat_start_product", Policy("chat:start_product", 20, 60, methods=POST))
+policies.route("chat_start_farm", Policy("chat:start_farm", 20, 60, methods=POST))
+
+# Products, addresses and deliveries
+policies.route("product_import", Policy("products:import", 5, 60, methods=POST))
+policies.route("address_list", Policy("addr:create", 20, 60, methods=POST))
+policies.route("set_default_address", Policy("addr:set_default", 60, 60, methods=POST))
+# Single and cart quotes share one budget.
+policies.route("delivery_quote", Policy("delivery:quote", 30, 60))
+policies.route("delivery_cart_quote", Policy("delivery:quote", 30, 60))
+policies.route("delivery_create", Policy("delivery:create", 10, 60, methods=POST))
+policies.route("delivery_dispatch", Policy("delivery:dispatch", 30, 60))
+
+# Public read API: smooth out scripted bursts without lowering the sustained rate.
+policies.prefix("/api/", Policy("api", 60, 60, per=IP, algorithm=TOKEN_BUCKET, burst=20))
@@ -34,11 +34,13 @@ INSTALLED_APPS = [
     'users',
     'products',
     'chat',
+    'ratelimit',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable so the ASGI stack never drops to a thread.
+    'farmIT.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,7 +81,10 @@ _database_url = os.getenv('DATABASE_URL')
 if _database_url:
     try:
         import dj_database_url  # type: ignore
-        conn_max_age = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+        # Served by ASGI (see Procfile): persistent connections are per thread and
+        # sync_to_async threads outlive requests, so they would pile up. Only set
+        # this above 0 when serving through WSGI.
+        conn_max_age = int(os.getenv('DB_CONN_MAX_AGE', '0'))
         ssl_require = os.getenv('DB_SSL_REQUIRE', 'true').lower() in ('1', 'true', 'yes')
         DATABASES['default'] = dj_database_url.parse(
             _database_url,
@@ -134,5 +139,25 @@ SECURE_REFERRER_POLICY = 'same-origin'
 # Rate limiting configuration
 # In proxy deployments (Vercel), X-Forwarded-For is the reliable source of client IP.
 RATE_LIMIT_TRUST_X_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_X_FORWARDED_FOR", "true").lower() in ("1", "true", "yes")
-
-
+# Where rate-limit counters live (ratelimit.backends): LocMemBackend (per
+# process), DatabaseBackend (shared via the database) or RedisBackend (shared,
+# one round trip per check; needs the redis package and RATE_LIMIT_REDIS_URL).
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "ratelimit.backends.LocMemBackend")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+
+
+
+# Delivery routing: dotted path to a products.routing provider. The default
+# keeps straight-line (haversine) quotes; OpenRouteServiceProvider uses real
+# road distances when OPENROUTESERVICE_API_KEY is set.
+DELIVERY_ROUTING_PROVIDER = os.getenv("DELIVERY_ROUTING_PROVIDER", "products.routing.StraightLineProvider")
+
+# Chat: push new messages over Server-Sent Events when served by ASGI
+# (farmIT.asgi). Turn off on hosts that buffer responses; pages then long-poll.
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "true").lower() in ("1", "true", "yes")
+# How waiting chat requests learn about new messages (chat.bus). Empty picks
+# PostgresBus (LISTEN/NOTIFY) on PostgreSQL and InProcessBus otherwise.
+CHAT_BUS_BACKEND = os.getenv("CHAT_BUS_BACKEND", "")
+# Cache alias for conversation stamps (chat.stamps). Must be shared by every
+# worker, e.g. Redis; empty reads the stamp from the conversation row instead.
+CHAT_STAMP_CACHE = os.getenv("CHAT_STAMP_CACHE", "")
@@ -1,7 +1,7 @@
-import time
+import math
 from dataclasses import dataclass
 
-from django.core.cache import cache
+from ratelimit.engine import SLIDING_WINDOW, Decision, Limit, check
 
 
 @dataclass(frozen=True)
@@ -9,40 +9,42 @@ class ThrottleResult:
     allowed: bool
     remaining: int
     reset_seconds: int
+    limit: int = 0
+    retry_after: int = 0
+
+    @classmethod
+    def from_decision(cls, decision: Decision) -> "ThrottleResult":
+        return cls(
+            allowed=decision.allowed,
+            remaining=decision.remaining,
+            reset_seconds=decision.reset,
+            limit=decision.limit,
+            retry_after=math.ceil(decision.retry_after),
+        )
+
+    def headers(self) -> dict[str, str]:
+        """`RateLimit-*` response headers (plus `Retry-After` when denied)."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset_seconds),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, self.retry_after))
+        return headers
 
 
 def check_throttle(key: str, limit: int, window_seconds: int) -> ThrottleResult:
-    """Fixed-window throttle backed by Django cache.
+    """At most `limit` calls per `key` in any `window_seconds` (sliding window).
 
     Notes:
-    - Uses the configured Django cache backend. In serverless environments, a
-      local-memory cache is best-effort (per-instance), but still reduces abuse.
+    - Runs on the shared rate-limit engine (`ratelimit`), so it is atomic on
+      every backend and has no double burst at window edges.
+    - Routes should declare their limits in `farmIT.rate_policies` instead;
+      this is for limits that are not tied to one URL.
     - Returns a simple result object so callers can respond with 429.
     """
     if limit <= 0 or window_seconds <= 0:
-        return ThrottleResult(allowed=True, remaining=limit, reset_seconds=window_seconds)
-
-    bucket = int(time.time() // window_seconds)
-    cache_key = f"th:{key}:{bucket}"
-
-    # Prefer atomic increment if supported.
-    try:
-        count = cache.incr(cache_key)
-    except Exception:
-        # If key doesn't exist (or backend doesn't support incr), initialize.
-        existing = cache.get(cache_key)
-        if existing is None:
-            cache.add(cache_key, 1, timeout=window_seconds)
-            count = 1
-        else:
-            count = int(existing) + 1
-            cache.set(cache_key, count, timeout=window_seconds)
-
-    allowed = count <= limit
-    remaining = max(0, limit - count)
-    reset_seconds = int(((bucket + 1) * window_seconds) - time.time())
-    if reset_seconds < 0:
-        reset_seconds = 0
-    return ThrottleResult(allowed=allowed, remaining=remaining, reset_seconds=reset_seconds)
-
+        return ThrottleResult(allowed=True, remaining=limit, reset_seconds=window_seconds, limit=limit)
 
+    return ThrottleResult.from_decision(check(Limit(f"th:{key}", limit, window_seconds, SLIDING_WINDOW)))
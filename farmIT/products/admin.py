@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Product, Transaction
+from .models import DeliveryRequest, Product, Transaction
 
 
 @admin.register(Product)
@@ -29,3 +29,11 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ('product__product_name', 'buyer__username')
 
 
+
+
+@admin.register(DeliveryRequest)
+class DeliveryRequestAdmin(admin.ModelAdmin):
+    list_display = ('farm', 'customer', 'distance_km', 'quoted_fee', 'shared_fee', 'status', 'created_at')
+    list_filter = ('status', 'farm', 'created_at')
+    list_select_related = ('farm', 'customer')
+    search_fields = ('farm__name', 'customer__username', 'pickup_address_text')
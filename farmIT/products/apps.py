@@ -6,4 +6,5 @@ class ProductsConfig(AppConfig):
     name = 'products'
     verbose_name = 'Products'
 
-
+    def ready(self):
+        from . import signals  # noqa: F401  # register model signal receivers
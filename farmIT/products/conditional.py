@@ -0,0 +1,113 @@
+"""Conditional GET (ETag / Last-Modified) for product and farm pages.
+
+Each page's freshness comes from one indexed lookup: `Product.updated_at`
+(joined with its farm's `updated_at`) or the farm's own `updated_at` and
+`content_updated_at` rollup. The ETag also encodes who is looking, because
+the pages render differently per user, and a digest of the CSRF cookie,
+because the pages embed a token derived from it that rotates on login.
+Owners and staff see private extras (interest lists, moderation state) and
+pending flash messages are shown on render, so those responses are never
+treated as conditional.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils import timezone
+
+from .models import Farm, Product
+
+_STAMP_ATTR = "_conditional_stamps"
+
+
+def touch_farms(*farm_ids) -> None:
+    """Record that content shown on these farms' pages just changed."""
+    ids = {farm_id for farm_id in farm_ids if farm_id is not None}
+    if ids:
+        Farm.objects.filter(pk__in=ids).update(content_updated_at=timezone.now())
+
+
+def _viewer(request) -> str:
+    return f"u{request.user.pk}" if request.user.is_authenticated else "anon"
+
+
+def _csrf_digest(request) -> str:
+    secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    return hashlib.sha256(secret.encode()).hexdigest()[:12]
+
+
+def _has_pending_messages(request) -> bool:
+    # len() loads the storage without marking the messages as displayed.
+    return bool(len(get_messages(request)))
+
+
+def _memoized(request, key, load):
+    stamps = request.__dict__.setdefault(_STAMP_ATTR, {})
+    if key not in stamps:
+        stamps[key] = load()
+    return stamps[key]
+
+
+def _product_modified(request, pk: int):
+    def load():
+        row = (
+            Product.objects.filter(pk=pk)
+            .values_list("updated_at", "farm__updated_at", "farmer_id", "is_approved")
+            .first()
+        )
+        if row is None:
+            return None
+        updated_at, farm_updated_at, farmer_id, is_approved = row
+        user = request.user
+        is_insider = user.is_authenticated and (user.pk == farmer_id or user.is_staff)
+        if not is_approved or is_insider:
+            return None
+        if _has_pending_messages(request):
+            return None
+        return max(filter(None, (updated_at, farm_updated_at)))
+
+    return _memoized(request, ("product", pk), load)
+
+
+def _farm_modified(request, slug: str):
+    def load():
+        row = (
+            Farm.objects.filter(slug=slug)
+            .values_list("updated_at", "content_updated_at")
+            .first()
+        )
+        if row is None or _has_pending_messages(request):
+            return None
+        return max(filter(None, row))
+
+    return _memoized(request, ("farm", slug), load)
+
+
+def _etag(modified, request) -> str | None:
+    if modified is None:
+        return None
+    stamp = int(modified.timestamp() * 1_000_000)
+    return f"{_viewer(request)}-{_csrf_digest(request)}-{stamp}"
+
+
+def _anonymous_only(modified, request):
+    # Last-Modified cannot say who the page was rendered for; signed-in
+    # viewers revalidate through the per-user ETag instead.
+    return None if request.user.is_authenticated else modified
+
+
+def product_last_modified(request, pk: int):
+    return _anonymous_only(_product_modified(request, pk), request)
+
+
+def product_etag(request, pk: int) -> str | None:
+    return _etag(_product_modified(request, pk), request)
+
+
+def farm_last_modified(request, slug: str):
+    return _anonymous_only(_farm_modified(request, slug), request)
+
+
+def farm_etag(request, slug: str) -> str | None:
+    return _etag(_farm_modified(request, slug), request)
@@ -0,0 +1,207 @@
+"""Fold nearby open delivery requests from one farm into shared runs.
+
+Requests are grouped per farm and per fixed time window, then clustered by
+drop-off proximity: points are bucketed into a grid whose cells are
+`radius_km` wide, and each point is only compared with the points in its own
+and the eight neighbouring cells. Points within `radius_km` of each other are
+joined (union-find), so a cluster is a chain of drop-offs no further than
+`radius_km` apart, DBSCAN-style with a minimum of two members. The work stays
+linear in the number of open requests for realistic densities.
+
+Each cluster becomes a `ConsolidatedRun` ordered by `dispatch.plan_route`; its
+fee is priced on the shared route and split across members in proportion to
+their standalone quotes, never exceeding any member's own quote.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from .dispatch import plan_route
+from .geo import KM_PER_DEGREE_LAT, haversine_km
+from .models import ConsolidatedRun, DeliveryRequest
+from .pricing import price_distances
+
+CONSOLIDATION_STATUSES = (
+    DeliveryRequest.Status.PENDING,
+    DeliveryRequest.Status.QUOTED,
+    DeliveryRequest.Status.ACCEPTED,
+)
+DEFAULT_RADIUS_KM = 2.0
+DEFAULT_WINDOW_HOURS = 24
+DEFAULT_MAX_STOPS = 20
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def cluster_points(lats, lons, radius_km: float, min_size: int = 2) -> list[list[int]]:
+    """Indices of points grouped into proximity clusters of at least `min_size`."""
+    n = len(lats)
+    if n < min_size:
+        return []
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+
+    # Local equirectangular projection; accurate enough at delivery scale.
+    y = lat * KM_PER_DEGREE_LAT
+    x = lon * KM_PER_DEGREE_LAT * np.cos(np.radians(lat.mean()))
+    cols = np.floor(x / radius_km).astype(np.int64)
+    rows = np.floor(y / radius_km).astype(np.int64)
+
+    grid: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for index, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+        grid[cell].append(index)
+
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for (row, col), members in grid.items():
+        for drow in (-1, 0, 1):
+            for dcol in (-1, 0, 1):
+                neighbours = grid.get((row + drow, col + dcol))
+                if not neighbours:
+                    continue
+                for i in members:
+                    for j in neighbours:
+                        if j <= i or find(i) == find(j):
+                            continue
+                        if haversine_km(lat[i], lon[i], lat[j], lon[j]) <= radius_km:
+                            parent[find(i)] = find(j)
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for i in range(n):
+        clusters[find(i)].append(i)
+    return [members for members in clusters.values() if len(members) >= min_size]
+
+
+def _largest_remainder(whole: int, weights: np.ndarray) -> np.ndarray:
+    """Split `whole` into integers proportional to `weights`, summing to `whole`."""
+    exact = whole * weights / weights.sum()
+    shares = np.floor(exact + 1e-9).astype(np.int64)
+    leftover = whole - int(shares.sum())
+    if leftover > 0:
+        shares[np.argsort(shares - exact, kind="stable")[:leftover]] += 1
+    return shares
+
+
+def split_fee(total: Decimal, standalone_fees: list[Decimal]) -> list[Decimal]:
+    """Whole-peso shares of `total` proportional to each standalone fee.
+
+    Largest-remainder rounding: shares are floored, then the pesos that lost
+    go one each to the largest fractions. No share exceeds its own standalone
+    fee; what a capped stop cannot take is split again among the others, so
+    the shares add up to `total` unless every stop ends up at its cap.
+    """
+    weights = np.asarray([float(fee) for fee in standalone_fees], dtype=np.float64)
+    if weights.sum() <= 0:
+        weights = np.ones(len(standalone_fees))
+    caps = np.asarray([int(fee) for fee in standalone_fees], dtype=np.int64)
+    shares = np.zeros(len(standalone_fees), dtype=np.int64)
+    open_ = np.ones(len(standalone_fees), dtype=bool)
+    remaining = int(total.to_integral_value())
+    while remaining > 0 and open_.any():
+        split = _largest_remainder(remaining, weights[open_])
+        over = split > caps[open_]
+        if not over.any():
+            shares[open_] = split
+            break
+        # Pin the stops that hit their cap and split the rest again.
+        capped = np.flatnonzero(open_)[over]
+        shares[capped] = caps[capped]
+        remaining -= int(caps[capped].sum())
+        open_[capped] = False
+    return [Decimal(int(share)) for share in shares.tolist()]
+
+
+def _window_start(created_at: datetime, window: timedelta) -> datetime:
+    return _EPOCH + ((created_at - _EPOCH) // window) * window
+
+
+def open_requests(farms=None):
+    """Unconsolidated, routable requests that can still join a run."""
+    qs = DeliveryRequest.objects.filter(
+        status__in=CONSOLIDATION_STATUSES,
+        consolidated_run__isnull=True,
+        farm__latitude__isnull=False,
+        farm__longitude__isnull=False,
+        dropoff_address__latitude__isnull=False,
+        dropoff_address__longitude__isnull=False,
+    )
+    if farms is not None:
+        qs = qs.filter(farm__in=farms)
+    return qs.select_related("farm", "dropoff_address").order_by("farm_id", "created_at", "id")
+
+
+def _build_run(farm, window_start, window, members) -> tuple[ConsolidatedRun, list[DeliveryRequest]]:
+    route = plan_route(farm, members)
+    ordered = [stop.delivery for stop in route.stops]
+    _distance, _eta, run_fee = price_distances([float(route.total_km)])[0]
+    standalone = [d.quoted_fee for d in ordered]
+    run = ConsolidatedRun(
+        farm=farm,
+        window_start=window_start,
+        window_end=window_start + window,
+        distance_km=route.total_km,
+        eta_minutes=route.total_minutes,
+        total_fee=run_fee,
+        standalone_fee=sum(standalone, Decimal("0")),
+    )
+    for delivery, share in zip(ordered, split_fee(run_fee, standalone)):
+        delivery.shared_fee = share
+    return run, ordered
+
+
+def propose_runs(
+    farms=None,
+    radius_km: float = DEFAULT_RADIUS_KM,
+    window_hours: int = DEFAULT_WINDOW_HOURS,
+    max_stops: int = DEFAULT_MAX_STOPS,
+    commit: bool = True,
+) -> list[ConsolidatedRun]:
+    """Cluster open requests and (unless `commit` is false) save the runs.
+
+    Only runs that are cheaper than their members' standalone quotes are kept.
+    Already consolidated requests are skipped, so the job is safe to re-run.
+    """
+    window = timedelta(hours=window_hours)
+    groups: dict[tuple[int, datetime], list[DeliveryRequest]] = defaultdict(list)
+    for delivery in open_requests(farms).iterator(chunk_size=2000):
+        groups[(delivery.farm_id, _window_start(delivery.created_at, window))].append(delivery)
+
+    proposals = []
+    for (_farm_id, window_start), deliveries in groups.items():
+        clusters = cluster_points(
+            [float(d.dropoff_address.latitude) for d in deliveries],
+            [float(d.dropoff_address.longitude) for d in deliveries],
+            radius_km,
+        )
+        for cluster in clusters:
+            members = [deliveries[i] for i in cluster]
+            chunks = [members]
+            if len(members) > max_stops:
+                # Cut oversized clusters into consecutive stretches of one route.
+                ordered = [stop.delivery for stop in plan_route(members[0].farm, members).stops]
+                chunks = [ordered[i : i + max_stops] for i in range(0, len(ordered), max_stops)]
+            for chunk in chunks:
+                if len(chunk) < 2:
+                    continue
+                run, chunk = _build_run(chunk[0].farm, window_start, window, chunk)
+                if run.total_fee < run.standalone_fee:
+                    proposals.append((run, chunk))
+
+    if commit:
+        with transaction.atomic():
+            for run, members in proposals:
+                run.save()
+                for delivery in members:
+                    delivery.consolidated_run = run
+                DeliveryRequest.objects.bulk_update(members, ["consolidated_run", "shared_fee"])
+    return [run for run, _members in proposals]
@@ -0,0 +1,107 @@
+"""Batch delivery quoting for carts spanning several farms.
+
+A cart is quoted as one trip per farm to a single drop-off address. All farm
+rows come from one query and every distance, ETA and fee is computed in one
+vectorized pass (`geo.haversine_km_many` + `pricing.price_distances`). With a
+road routing provider configured, distances come from its route cache instead.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from .geo import haversine_km_many
+from .models import Address, Farm, Product
+from .pricing import price_distances
+from .routing import get_router
+
+
+@dataclass(frozen=True)
+class DeliveryQuote:
+    farm: Farm
+    distance_km: Decimal
+    eta_minutes: int
+    quoted_fee: Decimal
+
+
+@dataclass
+class CartQuote:
+    quotes: list[DeliveryQuote]
+    products_by_farm: dict[int, list[Product]]
+    unquotable: list[Product]
+
+    @property
+    def lines(self) -> list[tuple[DeliveryQuote, list[Product]]]:
+        return [(q, self.products_by_farm.get(q.farm.pk, [])) for q in self.quotes]
+
+    @property
+    def total_fee(self) -> Decimal:
+        return sum((q.quoted_fee for q in self.quotes), Decimal("0"))
+
+    @property
+    def max_eta_minutes(self) -> int:
+        return max((q.eta_minutes for q in self.quotes), default=0)
+
+
+def quote_farms(
+    address: Address,
+    farms,
+    base_fee: Decimal | None = None,
+    per_km_fee: Decimal | None = None,
+) -> list[DeliveryQuote]:
+    """Quote every farm with coordinates against `address` in one pass."""
+    if address.latitude is None or address.longitude is None:
+        raise ValueError("Address must have latitude and longitude set for delivery estimation.")
+
+    located = [f for f in farms if f.latitude is not None and f.longitude is not None]
+    if not located:
+        return []
+
+    drop_off = (float(address.latitude), float(address.longitude))
+    router = get_router()
+    durations = None
+    if router.straight_line:
+        distances = haversine_km_many(
+            *drop_off,
+            [float(f.latitude) for f in located],
+            [float(f.longitude) for f in located],
+        )
+    else:
+        # Road routes come from the route cache; pricing is still one array pass.
+        routes = [router.route((float(f.latitude), float(f.longitude)), drop_off) for f in located]
+        distances = [r.distance_km for r in routes]
+        durations = [
+            r.duration_minutes if r.duration_minutes is not None else float("nan") for r in routes
+        ]
+    priced = price_distances(
+        distances, base_fee=base_fee, per_km_fee=per_km_fee, durations_minutes=durations
+    )
+    return [
+        DeliveryQuote(farm=farm, distance_km=distance, eta_minutes=eta, quoted_fee=fee)
+        for farm, (distance, eta, fee) in zip(located, priced)
+    ]
+
+
+def quote_products(address: Address, product_ids) -> CartQuote:
+    """Quote a cart of approved products, one delivery per distinct farm."""
+    products = list(
+        Product.objects.filter(pk__in=product_ids, is_approved=True)
+        .select_related("farm", "farmer__farm")
+        .order_by("pk")
+    )
+
+    farms: dict[int, Farm] = {}
+    products_by_farm: dict[int, list[Product]] = {}
+    unquotable = []
+    for product in products:
+        farm = product.farm or getattr(product.farmer, "farm", None)
+        if farm is None or farm.latitude is None or farm.longitude is None:
+            unquotable.append(product)
+            continue
+        farms[farm.pk] = farm
+        products_by_farm.setdefault(farm.pk, []).append(product)
+
+    return CartQuote(
+        quotes=quote_farms(address, farms.values()),
+        products_by_farm=products_by_farm,
+        unquotable=unquotable,
+    )
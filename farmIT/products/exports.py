@@ -0,0 +1,176 @@
+"""Streaming CSV exports of products, transactions and delivery requests.
+
+Rows are read with `values_list(...).iterator(chunk_size=...)` (a server-side
+cursor on PostgreSQL) and written out a chunk at a time, so memory use does
+not grow with the size of the table. Under ASGI the view streams
+`astream_csv`, the async twin of `stream_csv`.
+
+Filters use the same query parameters as the admin changelist `list_filter`s
+(`status__exact=completed`, `created_at__gte=2025-01-01`, ...), so the query
+string of a filtered admin page can be reused for its export.
+"""
+
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+
+from .models import DeliveryRequest, Product, Transaction
+
+CHUNK_SIZE = 2000
+# Spreadsheet apps evaluate cells starting with these as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    model: type[Model]
+    # (CSV header, values_list lookup)
+    columns: tuple[tuple[str, str], ...]
+    # query parameter -> model field path it filters on
+    filters: dict[str, str]
+
+    @property
+    def headers(self) -> list[str]:
+        return [header for header, _ in self.columns]
+
+    @property
+    def lookups(self) -> list[str]:
+        return [lookup for _, lookup in self.columns]
+
+
+def _date_filters(field: str) -> dict[str, str]:
+    # The admin's DateFieldListFilter links use `__gte` / `__lt` bounds.
+    return {f"{field}__gte": field, f"{field}__lt": field}
+
+
+EXPORTS: dict[str, ExportSpec] = {
+    "products": ExportSpec(
+        model=Product,
+        columns=(
+            ("id", "id"),
+            ("product_name", "product_name"),
+            ("farmer", "farmer__username"),
+            ("farm", "farm__name"),
+            ("price", "price"),
+            ("quantity", "quantity"),
+            ("location", "location"),
+            ("mode_of_payment", "mode_of_payment"),
+            ("is_approved", "is_approved"),
+            ("is_reserved", "is_reserved"),
+            ("reserved_by", "reserved_by__username"),
+            ("created_at", "created_at"),
+        ),
+        filters={
+            "mode_of_payment__exact": "mode_of_payment",
+            "is_approved__exact": "is_approved",
+            "is_reserved__exact": "is_reserved",
+        },
+    ),
+    "transactions": ExportSpec(
+        model=Transaction,
+        columns=(
+            ("id", "id"),
+            ("product_id", "product_id"),
+            ("product", "product__product_name"),
+            ("buyer", "buyer__username"),
+            ("status", "status"),
+            ("created_at", "created_at"),
+        ),
+        filters={"status__exact": "status", **_date_filters("created_at")},
+    ),
+    "deliveries": ExportSpec(
+        model=DeliveryRequest,
+        columns=(
+            ("id", "id"),
+            ("customer", "customer__username"),
+            ("farm", "farm__name"),
+            ("pickup_address", "pickup_address_text"),
+            ("dropoff_line1", "dropoff_address__line1"),
+            ("dropoff_city", "dropoff_address__city"),
+            ("distance_km", "distance_km"),
+            ("eta_minutes", "eta_minutes"),
+            ("quoted_fee", "quoted_fee"),
+            ("shared_fee", "shared_fee"),
+            ("consolidated_run_id", "consolidated_run_id"),
+            ("status", "status"),
+            ("created_at", "created_at"),
+        ),
+        filters={
+            "status__exact": "status",
+            "farm__id__exact": "farm",
+            **_date_filters("created_at"),
+        },
+    ),
+}
+
+
+def filtered_queryset(spec: ExportSpec, params) -> QuerySet:
+    """Apply admin-style filter `params` to the spec's model.
+
+    Raises `ValidationError` for unknown parameters or invalid values rather
+    than silently exporting more rows than were asked for.
+    """
+    qs = spec.model._default_manager.all()
+    lookups = {}
+    for param, raw in params.items():
+        if param not in spec.filters:
+            raise ValidationError(
+                f"Unknown filter '{param}'. Allowed: {', '.join(sorted(spec.filters))}."
+            )
+        field = spec.model._meta.get_field(spec.filters[param])
+        if field.is_relation:
+            field = field.target_field
+        try:
+            value = field.to_python(raw)
+            if field.choices:
+                field.validate(value, None)
+        except ValidationError as exc:
+            raise ValidationError(f"Invalid value for '{param}': {' '.join(exc.messages)}") from None
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        lookups[param] = value
+    return qs.filter(**lookups).order_by("pk")
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(spec: ExportSpec, queryset: QuerySet, chunk_size: int = CHUNK_SIZE):
+    """Yield the CSV text for `queryset`, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spec.headers)
+    rows = queryset.values_list(*spec.lookups).iterator(chunk_size=chunk_size)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_cell(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def astream_csv(spec: ExportSpec, queryset: QuerySet, chunk_size: int = CHUNK_SIZE):
+    """`stream_csv` for ASGI.
+
+    Django consumes a sync iterator under ASGI by collecting all of it first;
+    advancing `stream_csv` one chunk per `sync_to_async` call keeps a single
+    chunk in memory, with the cursor on the request's database thread.
+    """
+    chunks = stream_csv(spec, queryset, chunk_size)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
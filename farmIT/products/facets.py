@@ -0,0 +1,111 @@
+"""Facet counts for the marketplace filters, computed in one query.
+
+The filtered product queryset is grouped by `location`, and each group row
+also carries conditional `Count(filter=...)` columns for every price bucket and
+payment method. Summing those rows in Python yields all three facets from a
+single `GROUP BY` scan. Results are cached per normalized filter signature.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, QuerySet
+
+from .models import Product
+from .pagination import filter_signature
+
+FACET_CACHE_TIMEOUT = 60
+MAX_LOCATION_BUCKETS = 10
+
+# (key, label, min_price, max_price); both bounds inclusive like the
+# `min_price`/`max_price` filters, and prices have two decimal places.
+PRICE_BUCKETS = (
+    ("0-50", "Under ₱50", None, Decimal("49.99")),
+    ("50-100", "₱50 – ₱100", Decimal("50"), Decimal("99.99")),
+    ("100-250", "₱100 – ₱250", Decimal("100"), Decimal("249.99")),
+    ("250-500", "₱250 – ₱500", Decimal("250"), Decimal("499.99")),
+    ("500-", "₱500 and up", Decimal("500"), None),
+)
+
+
+@dataclass(frozen=True)
+class FacetBucket:
+    value: str
+    label: str
+    count: int
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+
+
+@dataclass(frozen=True)
+class Facets:
+    location: list[FacetBucket]
+    price: list[FacetBucket]
+    payment: list[FacetBucket]
+
+
+def _price_q(low: Decimal | None, high: Decimal | None) -> Q:
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lte=high)
+    return q
+
+
+def compute_facets(products: QuerySet) -> Facets:
+    """Location, price-range and payment-method counts over `products`."""
+    aggregates = {"n": Count("pk")}
+    for index, (_key, _label, low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f"price_{index}"] = Count("pk", filter=_price_q(low, high))
+    for code, _label in Product.MODE_OF_PAYMENT_CHOICES:
+        aggregates[f"pay_{code}"] = Count("pk", filter=Q(mode_of_payment=code))
+
+    rows = products.order_by().values("location").annotate(**aggregates)
+
+    totals: dict[str, int] = defaultdict(int)
+    locations: dict[str, int] = defaultdict(int)
+    # Most frequent spelling of each case/space-insensitive location.
+    spellings: dict[str, tuple[int, str]] = {}
+    for row in rows:
+        for name, value in row.items():
+            if name != "location":
+                totals[name] += value
+        raw = (row["location"] or "").strip()
+        if not raw:
+            continue
+        key = " ".join(raw.split()).casefold()
+        locations[key] += row["n"]
+        if row["n"] > spellings.get(key, (0, ""))[0]:
+            spellings[key] = (row["n"], raw)
+
+    top_locations = sorted(locations.items(), key=lambda item: (-item[1], item[0]))
+    return Facets(
+        location=[
+            FacetBucket(value=spellings[key][1], label=spellings[key][1], count=count)
+            for key, count in top_locations[:MAX_LOCATION_BUCKETS]
+        ],
+        price=[
+            FacetBucket(value=key, label=label, count=totals[f"price_{index}"], min_price=low, max_price=high)
+            for index, (key, label, low, high) in enumerate(PRICE_BUCKETS)
+            if totals[f"price_{index}"]
+        ],
+        payment=[
+            FacetBucket(value=code, label=label, count=totals[f"pay_{code}"])
+            for code, label in Product.MODE_OF_PAYMENT_CHOICES
+            if totals[f"pay_{code}"]
+        ],
+    )
+
+
+def normalized_signature(*filters) -> str:
+    """Cache signature that ignores case and incidental whitespace."""
+    return filter_signature(*(" ".join(str(f).split()).casefold() for f in filters))
+
+
+def cached_facets(products: QuerySet, *filters) -> Facets:
+    """`compute_facets` cached under the normalized `filters` signature."""
+    key = f"facets:{normalized_signature(*filters)}"
+    return cache.get_or_set(key, lambda: compute_facets(products), FACET_CACHE_TIMEOUT)
@@ -48,6 +48,26 @@ class ProductForm(forms.ModelForm):
         return cleaned
 
 
+class ProductImportForm(ProductForm):
+    """`ProductForm` rules applied to one spreadsheet row (no file upload)."""
+
+    image_file = None
+
+    class Meta(ProductForm.Meta):
+        fields = tuple(name for name in ProductForm.Meta.fields if name != "image_file")
+
+
+class ProductImportUploadForm(forms.Form):
+    file = forms.FileField(
+        label="Spreadsheet",
+        help_text="CSV or Excel (.xlsx) with a header row.",
+    )
+    partial = forms.BooleanField(
+        required=False,
+        label="Import valid rows even if some rows have errors",
+    )
+
+
 class FarmForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
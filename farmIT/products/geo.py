@@ -0,0 +1,132 @@
+"""Pure geometry helpers: great-circle distance, geohashes and bounding boxes.
+
+Farms store a geohash of their coordinates so a radius query can first narrow
+candidates with indexed prefix lookups over a few cells covering the search
+area, and only then compute exact haversine distances for the survivors.
+"""
+
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+GEOHASH_PRECISION = 9  # ~5 m cells; plenty for farm and address pins.
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return great-circle distance between two points in kilometers."""
+
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * asin(sqrt(a))
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_km_many(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Vectorized haversine from one origin to arrays of points (float64 km)."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(lats, lons) -> np.ndarray:
+    """Pairwise haversine distances (km) between all points, as an n x n array."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> tuple[float, float]:
+    """(lat, lon) size in degrees of a geohash cell at `precision`."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle of `radius_km`."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0.
+    dlon = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(lat)), 0.01))
+    return (
+        max(lat - dlat, -90.0),
+        min(lat + dlat, 90.0),
+        max(lon - dlon, -180.0),
+        min(lon + dlon, 180.0),
+    )
+
+
+def _frange(start: float, stop: float, step: float):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(bbox: tuple[float, float, float, float], max_cells: int = 16) -> list[str]:
+    """Geohash prefixes whose cells together cover `bbox`.
+
+    Picks the finest precision that needs at most `max_cells` cells, so the
+    prefix filter stays small while excluding as much area as possible.
+    """
+    min_lat, max_lat, min_lon, max_lon = bbox
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = cell_size_degrees(precision)
+        rows = int((max_lat - min_lat) / lat_step) + 2
+        cols = int((max_lon - min_lon) / lon_step) + 2
+        if rows * cols > max_cells:
+            continue
+        return sorted(
+            {
+                encode_geohash(lat, lon, precision)
+                for lat in _frange(min_lat, max_lat, lat_step)
+                for lon in _frange(min_lon, max_lon, lon_step)
+            }
+        )
+    return [""]
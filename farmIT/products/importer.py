@@ -0,0 +1,216 @@
+"""Bulk product import from CSV or Excel spreadsheets.
+
+Rows are streamed from the file (`csv` reader, or openpyxl in read-only
+mode), validated in batches with `ProductImportForm` (the `ProductForm`
+rules) and written with `bulk_create`, one chunk per batch, inside a single
+transaction. Memory stays bounded by the batch size regardless of file size.
+
+`bulk_create` skips model signals, so after the rows are written the import
+indexes them for search, recounts the farm's stats, touches the farm's
+last-modified rollup and invalidates the catalogue caches itself.
+"""
+
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+
+from . import versions
+from .conditional import touch_farms
+from .forms import ProductImportForm
+from .models import Farm, Product
+from .search import get_search_backend
+from .stats import rebuild_farm_stats
+from .suggest import invalidate_index
+
+try:
+    from openpyxl import load_workbook  # type: ignore
+except Exception:  # pragma: no cover - optional dependency guard
+    load_workbook = None  # type: ignore
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+COLUMNS = ProductImportForm._meta.fields
+REQUIRED_COLUMNS = ("product_name", "price", "quantity")
+HEADER_ALIASES = {
+    "name": "product_name",
+    "product": "product_name",
+    "qty": "quantity",
+    "payment": "mode_of_payment",
+    "image_url": "photo_url",
+    "photo": "photo_url",
+}
+# Spreadsheets say "Cash" or "GCash"; accept labels and values in any case.
+PAYMENT_VALUES = {
+    text.lower(): value
+    for value, label in Product.MODE_OF_PAYMENT_CHOICES
+    for text in (value, label)
+}
+DEFAULT_PAYMENT = Product._meta.get_field("mode_of_payment").default
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be imported (type, header, size)."""
+
+
+@dataclass(frozen=True)
+class RowError:
+    line: int
+    messages: list[str]
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    error_count: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    committed: bool = False
+
+    @property
+    def errors_truncated(self) -> bool:
+        return self.error_count > len(self.errors)
+
+
+def _normalize_header(value) -> str:
+    name = "_".join(str(value or "").strip().lower().split())
+    return HEADER_ALIASES.get(name, name)
+
+
+def _csv_rows(fileobj):
+    raw = getattr(fileobj, "file", fileobj)
+    if isinstance(raw, io.TextIOBase):
+        text = raw
+    else:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    yield from csv.reader(text)
+
+
+def _xlsx_rows(fileobj):
+    if load_workbook is None:
+        raise ImportFormatError("Excel import needs the openpyxl package; upload a CSV file instead.")
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, filename: str):
+    """Yield `(line_number, {column: text})` for every non-blank data row."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".xlsx":
+        rows = _xlsx_rows(fileobj)
+    elif extension in (".csv", ".txt"):
+        rows = _csv_rows(fileobj)
+    else:
+        raise ImportFormatError("Unsupported file type; upload a .csv or .xlsx file.")
+
+    try:
+        header = [_normalize_header(value) for value in next(rows)]
+    except StopIteration:
+        raise ImportFormatError("The file is empty.") from None
+    except UnicodeDecodeError:
+        raise ImportFormatError("CSV files must be UTF-8 encoded.") from None
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ImportFormatError(f"Missing required column(s): {', '.join(missing)}.")
+    positions = [(index, name) for index, name in enumerate(header) if name in COLUMNS]
+
+    try:
+        for line, values in enumerate(rows, start=2):
+            data = {}
+            for index, name in positions:
+                value = values[index] if index < len(values) else None
+                data[name] = "" if value is None else str(value).strip()
+            if any(data.values()):
+                payment = data.get("mode_of_payment", "")
+                data["mode_of_payment"] = PAYMENT_VALUES.get(payment.lower(), payment or DEFAULT_PAYMENT)
+                yield line, data
+    except UnicodeDecodeError:
+        raise ImportFormatError("CSV files must be UTF-8 encoded.") from None
+
+
+def _messages(form: ProductImportForm) -> list[str]:
+    return [
+        f"{name}: {message}" if name != "__all__" else message
+        for name, field_errors in form.errors.items()
+        for message in field_errors
+    ]
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_products(
+    farmer,
+    fileobj,
+    filename: str,
+    partial: bool = False,
+    batch_size: int = BATCH_SIZE,
+    max_rows: int | None = None,
+) -> ImportResult:
+    """Create listings for `farmer` from a spreadsheet.
+
+    By default the import is all-or-nothing: any invalid row rolls back the
+    whole file (every row is still validated so all errors are reported).
+    With `partial=True` valid rows are kept and invalid ones skipped.
+    """
+    farm = Farm.objects.filter(farmer=farmer).first()
+    result = ImportResult()
+    created_ids: list[int] = []
+
+    with transaction.atomic():
+        for batch in _batched(read_rows(fileobj, filename), batch_size):
+            valid = []
+            for line, data in batch:
+                result.rows += 1
+                if max_rows is not None and result.rows > max_rows:
+                    raise ImportFormatError(f"Files are limited to {max_rows} rows.")
+                form = ProductImportForm(data)
+                if form.is_valid():
+                    product = form.save(commit=False)
+                    product.farmer = farmer
+                    product.farm = farm
+                    valid.append(product)
+                    continue
+                result.error_count += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append(RowError(line=line, messages=_messages(form)))
+            # In all-or-nothing mode stop writing after the first bad row,
+            # but keep validating to report every error.
+            if valid and (partial or not result.error_count):
+                created = Product.objects.bulk_create(valid, batch_size=batch_size)
+                created_ids.extend(product.pk for product in created)
+
+        if result.error_count and not partial:
+            transaction.set_rollback(True)
+            return result
+
+        if created_ids:
+            _after_bulk_create(created_ids, farm)
+        result.created = len(created_ids)
+        result.committed = True
+    return result
+
+
+def _after_bulk_create(product_ids: list, farm: Farm | None) -> None:
+    """Do what the per-row signals would have done for `bulk_create`."""
+    backend = get_search_backend()
+    if None in product_ids:
+        # The database did not return primary keys; reindex everything.
+        backend.rebuild()
+    else:
+        for chunk in _batched(product_ids, BATCH_SIZE):
+            backend.index_products(chunk)
+    if farm is not None:
+        rebuild_farm_stats(Farm.objects.filter(pk=farm.pk))
+        touch_farms(farm.pk)
+    versions.bump(versions.PRODUCTS)
+    transaction.on_commit(invalidate_index)
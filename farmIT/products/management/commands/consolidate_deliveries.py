@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from products.consolidation import (
+    DEFAULT_MAX_STOPS,
+    DEFAULT_RADIUS_KM,
+    DEFAULT_WINDOW_HOURS,
+    propose_runs,
+)
+from products.models import Farm
+
+
+class Command(BaseCommand):
+    help = "Group nearby open delivery requests of each farm into shared, cheaper runs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Only consolidate these farms (default: all).")
+        parser.add_argument("--radius-km", type=float, default=DEFAULT_RADIUS_KM)
+        parser.add_argument("--window-hours", type=int, default=DEFAULT_WINDOW_HOURS)
+        parser.add_argument("--max-stops", type=int, default=DEFAULT_MAX_STOPS)
+        parser.add_argument("--dry-run", action="store_true", help="Report runs without saving them.")
+
+    def handle(self, *args, **options):
+        farms = Farm.objects.filter(slug__in=options["slugs"]) if options["slugs"] else None
+        runs = propose_runs(
+            farms=farms,
+            radius_km=options["radius_km"],
+            window_hours=options["window_hours"],
+            max_stops=options["max_stops"],
+            commit=not options["dry_run"],
+        )
+        saved = sum((run.savings for run in runs), 0)
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(runs)} runs saving ₱{saved} in delivery fees."))
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import BATCH_SIZE, ImportFormatError, import_products
+
+
+class Command(BaseCommand):
+    help = "Bulk-create product listings for a farmer from a CSV or .xlsx file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Farmer account that will own the listings.")
+        parser.add_argument("path", help="CSV or .xlsx file with a header row.")
+        parser.add_argument("--partial", action="store_true", help="Keep valid rows when some rows fail.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            farmer = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        if not getattr(farmer, "is_farmer", False):
+            raise CommandError(f"{farmer.username} is not a farmer account.")
+
+        try:
+            with open(options["path"], "rb") as handle:
+                result = import_products(
+                    farmer,
+                    handle,
+                    options["path"],
+                    partial=options["partial"],
+                    batch_size=options["batch_size"],
+                )
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error.line}: {'; '.join(error.messages)}")
+        if result.errors_truncated:
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more errors.")
+        if result.committed:
+            self.stdout.write(self.style.SUCCESS(f"Imported {result.created} of {result.rows} rows."))
+        else:
+            raise CommandError(f"Nothing imported: {result.error_count} of {result.rows} rows had errors.")
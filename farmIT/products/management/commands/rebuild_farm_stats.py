@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import Farm
+from products.stats import rebuild_farm_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized product/review counters stored on each farm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Only rebuild these farms (default: all).")
+
+    def handle(self, *args, **options):
+        farms = Farm.objects.all()
+        if options["slugs"]:
+            farms = farms.filter(slug__in=options["slugs"])
+        with transaction.atomic():
+            count = rebuild_farm_stats(farms)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} farms."))
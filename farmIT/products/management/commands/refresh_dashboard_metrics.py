@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.metrics import refresh_dashboard_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored admin dashboard metrics snapshot (run from cron)."
+
+    def handle(self, *args, **options):
+        snapshot = refresh_dashboard_metrics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Dashboard metrics refreshed: {snapshot['total_products']} products, "
+                f"{snapshot['total_users']} users."
+            )
+        )
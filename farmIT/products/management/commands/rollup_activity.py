@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from products.rollups import CHUNK_DAYS, run_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll marketplace activity up into daily per-farm/per-location counts. "
+        "Incremental from the stored watermark; pass --since to backfill."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Recompute from this day (YYYY-MM-DD).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Stop after this day (default: today).")
+        parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS, help="Days per transaction.")
+
+    def handle(self, *args, **options):
+        result = run_rollup(since=options["since"], until=options["until"], chunk_days=options["chunk_days"])
+        if result is None:
+            self.stdout.write("Nothing to roll up.")
+            return
+        first, last, rows = result
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {first} to {last}: {rows} rows."))
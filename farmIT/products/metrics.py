@@ -0,0 +1,104 @@
+"""Admin dashboard metrics, served from a precomputed snapshot.
+
+`compute_dashboard_metrics` reads each table once: every product counter is a
+conditional aggregate in a single `COUNT(*) FILTER (...)` query (a `CASE`
+expression on SQLite), plus one grouped query for the top locations.
+
+The result is stored as a `MetricsSnapshot` row with its `computed_at` time,
+so the snapshot `refresh_dashboard_metrics` (run it from cron) writes is the
+one every web worker reads. Between runs, a snapshot is also rebuilt on read
+when the product, transaction or user version stamps have moved and it is
+older than `MIN_REFRESH_SECONDS`, or unconditionally once it is older than
+`MAX_AGE_SECONDS`. Only the request that claims the row's `refreshing_until`
+rebuilds; the others keep serving the previous snapshot.
+"""
+
+from datetime import timedelta
+
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import versions
+from .models import MetricsSnapshot, Product, Transaction
+
+SNAPSHOT_NAME = "dashboard"
+LOCK_SECONDS = 60
+MIN_REFRESH_SECONDS = 60
+MAX_AGE_SECONDS = 15 * 60
+TOP_LOCATIONS = 5
+WATCHED_TABLES = (versions.PRODUCTS, versions.TRANSACTIONS, versions.USERS)
+
+
+def compute_dashboard_metrics() -> dict:
+    """Recompute the dashboard counters from the database."""
+    products = Product.objects.aggregate(
+        total_products=Count("pk"),
+        approved_products=Count("pk", filter=Q(is_approved=True)),
+        pending_products=Count("pk", filter=Q(is_approved=False)),
+        reserved_products=Count("pk", filter=Q(is_reserved=True)),
+    )
+    top_locations = list(
+        Product.objects.exclude(location="")
+        .values("location")
+        .annotate(c=Count("id"))
+        .order_by("-c", "location")[:TOP_LOCATIONS]
+    )
+    return {
+        **products,
+        "total_users": get_user_model().objects.count(),
+        "total_interests": Transaction.objects.filter(status="interested").count(),
+        "top_locations": top_locations,
+        "versions": versions.get_versions(*WATCHED_TABLES),
+        "computed_at": timezone.now(),
+    }
+
+
+def refresh_dashboard_metrics() -> dict:
+    snapshot = compute_dashboard_metrics()
+    data = {key: value for key, value in snapshot.items() if key not in ("versions", "computed_at")}
+    MetricsSnapshot.objects.update_or_create(
+        name=SNAPSHOT_NAME,
+        defaults={
+            "data": data,
+            "versions": list(snapshot["versions"]),
+            "computed_at": snapshot["computed_at"],
+            "refreshing_until": None,
+        },
+    )
+    return snapshot
+
+
+def _needs_refresh(snapshot: dict) -> bool:
+    age = (timezone.now() - snapshot["computed_at"]).total_seconds()
+    if age >= MAX_AGE_SECONDS:
+        return True
+    return age >= MIN_REFRESH_SECONDS and snapshot["versions"] != versions.get_versions(*WATCHED_TABLES)
+
+
+def _claim_refresh() -> bool:
+    """Mark the snapshot as being rebuilt, unless another request already has."""
+    now = timezone.now()
+    return bool(
+        MetricsSnapshot.objects.filter(name=SNAPSHOT_NAME)
+        .filter(Q(refreshing_until__isnull=True) | Q(refreshing_until__lt=now))
+        .update(refreshing_until=now + timedelta(seconds=LOCK_SECONDS))
+    )
+
+
+def get_dashboard_metrics() -> dict:
+    """The current snapshot, rebuilding it first if it is missing or stale."""
+    row = MetricsSnapshot.objects.filter(name=SNAPSHOT_NAME).first()
+    if row is None:
+        # Nothing to fall back on, so build it without claiming anything.
+        return refresh_dashboard_metrics()
+    snapshot = {**row.data, "versions": tuple(row.versions), "computed_at": row.computed_at}
+    if not _needs_refresh(snapshot) or not _claim_refresh():
+        # Fresh, or someone else is already rebuilding; the old numbers will do.
+        return snapshot
+    try:
+        return refresh_dashboard_metrics()
+    except Exception:
+        MetricsSnapshot.objects.filter(name=SNAPSHOT_NAME).update(refreshing_until=None)
+        raise
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE products_product ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX products_product_search_vector_gin '
+            'ON products_product USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            "UPDATE products_product SET search_vector = "
+            "setweight(to_tsvector('simple', coalesce(product_name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+        )
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE products_product_fts USING fts5('
+            "product_name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO products_product_fts (rowid, product_name, description) '
+            "SELECT id, product_name, coalesce(description, '') FROM products_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS products_product_search_vector_gin')
+        schema_editor.execute('ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_backfill_farm_slugs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
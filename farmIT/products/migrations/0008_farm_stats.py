@@ -0,0 +1,89 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_farm_stats(apps, schema_editor):
+    Farm = apps.get_model('products', 'Farm')
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    products = dict(
+        Product.objects.filter(farm__isnull=False, is_approved=True)
+        .values('farm_id')
+        .annotate(c=Count('id'))
+        .values_list('farm_id', 'c')
+    )
+    reviews = {
+        row['farm_id']: row
+        for row in Review.objects.values('farm_id').annotate(
+            total=Count('id'),
+            rating_total=Sum('rating'),
+            **{f'stars_{n}': Count('id', filter=Q(rating=n)) for n in range(1, 6)},
+        )
+    }
+    for farm in Farm.objects.all():
+        row = reviews.get(farm.pk, {})
+        Farm.objects.filter(pk=farm.pk).update(
+            active_product_count=products.get(farm.pk, 0),
+            review_count=row.get('total', 0),
+            rating_sum=row.get('rating_total') or 0,
+            **{f'rating_{n}_count': row.get(f'stars_{n}', 0) for n in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['-active_product_count', 'name'], name='farm_active_products_idx'),
+        ),
+        migrations.RunPython(backfill_farm_stats, migrations.RunPython.noop),
+    ]
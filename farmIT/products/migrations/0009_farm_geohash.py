@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+from products.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    Farm = apps.get_model('products', 'Farm')
+    farms = Farm.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for farm in farms.only('pk', 'latitude', 'longitude'):
+        farm.geohash = encode_geohash(float(farm.latitude), float(farm.longitude))
+        farm.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_farm_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_farm_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=64)),
+                ('origin_cell', models.CharField(max_length=32)),
+                ('destination_cell', models.CharField(max_length=32)),
+                ('distance_km', models.FloatField()),
+                ('duration_minutes', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('provider', 'origin_cell', 'destination_cell'), name='unique_route_per_provider_and_cells')],
+            },
+        ),
+    ]
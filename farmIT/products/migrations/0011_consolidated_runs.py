@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_route_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryrequest',
+            name='shared_fee',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.CreateModel(
+            name='ConsolidatedRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('distance_km', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('eta_minutes', models.PositiveIntegerField()),
+                ('total_fee', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('standalone_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('proposed', 'Proposed'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='proposed', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consolidated_runs', to='products.farm')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='deliveryrequest',
+            name='consolidated_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deliveries', to='products.consolidatedrun'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['farm', 'status', 'created_at'], name='delivery_farm_status_idx'),
+        ),
+    ]
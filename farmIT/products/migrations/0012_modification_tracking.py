@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_modification_times(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    Farm = apps.get_model('products', 'Farm')
+
+    Product.objects.update(updated_at=F('created_at'))
+
+    latest_product = Product.objects.filter(farm=OuterRef('pk')).order_by().values('farm').annotate(
+        m=Max('updated_at')
+    ).values('m')
+    latest_review = Review.objects.filter(farm=OuterRef('pk')).order_by().values('farm').annotate(
+        m=Max('created_at')
+    ).values('m')
+    Farm.objects.update(
+        content_updated_at=Greatest(
+            Coalesce(Subquery(latest_product), F('created_at')),
+            Coalesce(Subquery(latest_review), F('created_at')),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_consolidated_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='content_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_modification_times, migrations.RunPython.noop),
+    ]
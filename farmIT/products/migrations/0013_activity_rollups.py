@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_reserved_at(apps, schema_editor):
+    # The reservation time was never recorded; creation time is the best estimate.
+    Transaction = apps.get_model('products', 'Transaction')
+    Transaction.objects.filter(status__in=['reserved', 'completed'], reserved_at__isnull=True).update(
+        reserved_at=models.F('created_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_modification_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('new_listings', models.PositiveIntegerField(default=0)),
+                ('interests', models.PositiveIntegerField(default=0)),
+                ('reservations', models.PositiveIntegerField(default=0)),
+                ('delivery_quotes', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('complete_through', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='reserved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryrequest',
+            index=models.Index(fields=['created_at'], name='delivery_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at'], name='product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at'], name='transaction_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['reserved_at'], name='transaction_reserved_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyactivity',
+            name='farm',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='products.farm'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(fields=['day', 'farm'], name='activity_day_farm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(fields=['farm', 'day'], name='activity_farm_day_idx'),
+        ),
+        migrations.RunPython(backfill_reserved_at, migrations.RunPython.noop),
+    ]
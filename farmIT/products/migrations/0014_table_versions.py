@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:20
+
+from django.db import migrations, models
+
+
+def seed_versions(apps, schema_editor):
+    # Rows exist up front so bump() is a plain UPDATE.
+    TableVersion = apps.get_model('products', 'TableVersion')
+    TableVersion.objects.bulk_create(
+        [TableVersion(table=table) for table in ('product', 'farm', 'review', 'transaction', 'user')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_table_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsSnapshot',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('data', models.JSONField()),
+                ('versions', models.JSONField()),
+                ('computed_at', models.DateTimeField()),
+                ('refreshing_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
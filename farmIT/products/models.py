@@ -1,10 +1,12 @@
 from decimal import Decimal
-from math import asin, cos, radians, sin, sqrt
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.utils.text import slugify
 
+from .geo import encode_geohash
+from .pricing import price_distances
+
 
 class Farm(models.Model):
     """Virtual farm page owned by a single farmer user."""
@@ -39,15 +41,61 @@ class Farm(models.Model):
         blank=True,
         help_text="Longitude in decimal degrees (e.g. 120.984222).",
     )
+    # Derived from latitude/longitude on save; prefix lookups drive radius search.
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Last change to anything shown on the farm page besides the farm row
+    # itself (its products and reviews); maintained by `products.signals`.
+    content_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Denormalized counters maintained by `products.stats` whenever products or
+    # reviews change (rebuild with `manage.py rebuild_farm_stats`).
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    STATS_FIELDS = (
+        "active_product_count",
+        "review_count",
+        "rating_sum",
+        "rating_1_count",
+        "rating_2_count",
+        "rating_3_count",
+        "rating_4_count",
+        "rating_5_count",
+    )
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["-active_product_count", "name"], name="farm_active_products_idx"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return self.name
 
+    @property
+    def avg_rating(self) -> float | None:
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @property
+    def last_modified(self):
+        """Latest change to the farm row, its products or its reviews."""
+        return max(filter(None, (self.updated_at, self.content_updated_at)), default=None)
+
+    @property
+    def rating_histogram(self) -> list[tuple[int, int]]:
+        """(stars, count) pairs from 5 stars down to 1."""
+        return [(stars, getattr(self, f"rating_{stars}_count")) for stars in range(5, 0, -1)]
+
     def save(self, *args, **kwargs):
         # Auto-generate slug from name/username if not provided, ensure uniqueness in a simple way.
         if not self.slug:
@@ -59,6 +107,20 @@ class Farm(models.Model):
                 counter += 1
                 slug = f"{base}-{counter}"
             self.slug = slug
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            # Counters are changed with F() updates; never write back stale in-memory values.
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.STATS_FIELDS and f.name != "content_updated_at"
+            ]
         super().save(*args, **kwargs)
 
 
@@ -92,6 +154,7 @@ class Product(models.Model):
         max_length=20, choices=MODE_OF_PAYMENT_CHOICES, default='cash'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # Moderation & reservation
     is_approved = models.BooleanField(default=True)
@@ -106,10 +169,16 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'], name='product_created_idx')]
 
     def __str__(self) -> str:
         return f"{self.product_name} ({self.quantity})"
 
+    def save(self, *args, **kwargs):
+        # post_save receivers update farm counters; keep them in the same transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
 
 class Transaction(models.Model):
     STATUS_CHOICES = [
@@ -123,10 +192,15 @@ class Transaction(models.Model):
     buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transactions')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='interested')
     created_at = models.DateTimeField(auto_now_add=True)
+    reserved_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['product', 'buyer'])]
+        indexes = [
+            models.Index(fields=['product', 'buyer']),
+            models.Index(fields=['created_at'], name='transaction_created_idx'),
+            models.Index(fields=['reserved_at'], name='transaction_reserved_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.buyer} -> {self.product} [{self.status}]"
@@ -161,6 +235,11 @@ class Review(models.Model):
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Review<{self.customer} -> {self.farm} ({self.rating})>"
 
+    def save(self, *args, **kwargs):
+        # post_save receivers update farm counters; keep them in the same transaction.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
 
 class Address(models.Model):
     """Customer address for delivery planning (with optional coordinates)."""
@@ -261,28 +340,91 @@ class DeliveryRequest(models.Model):
         default=Status.PENDING,
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the request is folded into a shared run; `shared_fee` is this
+    # request's portion of the run fee and never exceeds `quoted_fee`.
+    consolidated_run = models.ForeignKey(
+        "ConsolidatedRun",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="deliveries",
+    )
+    shared_fee = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["farm", "customer"]),
+            models.Index(fields=["farm", "status", "created_at"], name="delivery_farm_status_idx"),
+            models.Index(fields=["created_at"], name="delivery_created_idx"),
         ]
 
     def __str__(self) -> str:  # pragma: no cover - simple representation
         return f"Delivery<{self.customer} -> {self.farm} {self.distance_km}km>"
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Return great-circle distance between two points in kilometers."""
+class ConsolidatedRun(models.Model):
+    """One proposed trip from a farm serving several nearby delivery requests."""
+
+    class Status(models.TextChoices):
+        PROPOSED = "proposed", "Proposed"
+        CONFIRMED = "confirmed", "Confirmed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    farm = models.ForeignKey(
+        Farm,
+        on_delete=models.CASCADE,
+        related_name="consolidated_runs",
+    )
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    distance_km = models.DecimalField(max_digits=8, decimal_places=2)
+    eta_minutes = models.PositiveIntegerField()
+    total_fee = models.DecimalField(max_digits=8, decimal_places=2)
+    standalone_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PROPOSED,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"Run<{self.farm} {self.window_start:%Y-%m-%d %H:%M} {self.distance_km}km>"
+
+    @property
+    def savings(self) -> Decimal:
+        return self.standalone_fee - self.total_fee
+
+
+class RouteCache(models.Model):
+    """Persisted routing results between two ~50 m grid cells.
+
+    Written by `products.routing.CachedRouter`; rows are immutable per
+    provider, so repeated quotes between a farm and the same neighbourhood
+    never recompute a route.
+    """
+
+    provider = models.CharField(max_length=64)
+    origin_cell = models.CharField(max_length=32)
+    destination_cell = models.CharField(max_length=32)
+    distance_km = models.FloatField()
+    duration_minutes = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
-    # Radius of Earth in kilometers.
-    r = 6371.0
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["provider", "origin_cell", "destination_cell"],
+                name="unique_route_per_provider_and_cells",
+            )
+        ]
 
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    return r * c
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"Route<{self.provider} {self.origin_cell} -> {self.destination_cell}>"
 
 
 def estimate_distance_and_fee(
@@ -291,10 +433,10 @@ def estimate_distance_and_fee(
     base_fee: Decimal | None = None,
     per_km_fee: Decimal | None = None,
 ) -> tuple[Decimal, int, Decimal]:
-    """Estimate distance, ETA and delivery fee using local coordinates only.
+    """Estimate distance, ETA and delivery fee between a farm and an address.
 
-    This keeps all computation server-side with no external API calls,
-    respecting the no-mock-data rule by relying on real coordinates when provided.
+    Distances come from the configured routing provider (straight-line
+    haversine by default, see `products.routing`), through its route cache.
     """
 
     if farm.latitude is None or farm.longitude is None:
@@ -307,16 +449,82 @@ def estimate_distance_and_fee(
     lat2 = float(address.latitude)
     lon2 = float(address.longitude)
 
-    distance_km = Decimal(str(round(_haversine_km(lat1, lon1, lat2, lon2), 2)))
+    # Imported here: routing depends on the RouteCache model defined above.
+    from .routing import get_router
+
+    route = get_router().route((lat1, lon1), (lat2, lon2))
+    duration = route.duration_minutes if route.duration_minutes is not None else float("nan")
+    return price_distances(
+        [route.distance_km],
+        base_fee=base_fee,
+        per_km_fee=per_km_fee,
+        durations_minutes=[duration],
+    )[0]
+
 
-    # Simple ETA: assume average speed of ~25 km/h including city traffic.
-    avg_speed_kmh = Decimal("25")
-    eta_hours = distance_km / avg_speed_kmh if distance_km > 0 else Decimal("0")
-    eta_minutes = int((eta_hours * Decimal("60")).quantize(Decimal("1")))
+class DailyActivity(models.Model):
+    """Marketplace activity counts for one day, farm and location.
 
-    base = base_fee if base_fee is not None else Decimal("50")
-    per_km = per_km_fee if per_km_fee is not None else Decimal("10")
-    quoted_fee = (base + (distance_km * per_km)).quantize(Decimal("1"))
+    Filled by the `rollup_activity` command (see `products.rollups`); a day's
+    rows are always replaced as a whole, so re-running it is harmless.
+    """
 
-    return distance_km, max(eta_minutes, 1), quoted_fee
+    day = models.DateField()
+    farm = models.ForeignKey(
+        Farm,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="daily_activity",
+    )
+    location = models.CharField(max_length=255, blank=True)
+    new_listings = models.PositiveIntegerField(default=0)
+    interests = models.PositiveIntegerField(default=0)
+    reservations = models.PositiveIntegerField(default=0)
+    delivery_quotes = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        ordering = ["day"]
+        indexes = [
+            models.Index(fields=["day", "farm"], name="activity_day_farm_idx"),
+            models.Index(fields=["farm", "day"], name="activity_farm_day_idx"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"Activity<{self.day} farm={self.farm_id} {self.location!r}>"
+
+
+class RollupWatermark(models.Model):
+    """Last day a rollup has fully processed; later days are recomputed."""
+
+    name = models.CharField(max_length=64, unique=True)
+    complete_through = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.name} through {self.complete_through}"
+
+
+class TableVersion(models.Model):
+    """Write counter per tracked table (`products.versions`), shared by every worker."""
+
+    table = models.CharField(max_length=32, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.table} v{self.version}"
+
+
+class MetricsSnapshot(models.Model):
+    """Precomputed dashboard counters (`products.metrics`), shared by every worker."""
+
+    name = models.CharField(max_length=32, primary_key=True)
+    data = models.JSONField()
+    versions = models.JSONField()
+    computed_at = models.DateTimeField()
+    # Set while one request rebuilds a stale snapshot; the others keep serving it.
+    refreshing_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return f"{self.name} @ {self.computed_at:%Y-%m-%d %H:%M}"
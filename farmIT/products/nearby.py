@@ -0,0 +1,105 @@
+"""Radius ("near me") queries over farms and their products."""
+
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Round, Sin, Sqrt
+
+from .geo import EARTH_RADIUS_KM, bounding_box, covering_cells, haversine_km
+from .models import Address, Farm
+
+RADIUS_CHOICES_KM = (5, 10, 25, 50, 100)
+
+
+def _candidate_farms(
+    lat: float, lon: float, radius_km: float, queryset: QuerySet
+) -> QuerySet:
+    """Farms inside the geohash cells and bounding box that cover the radius."""
+    bbox = bounding_box(lat, lon, radius_km)
+    min_lat, max_lat, min_lon, max_lon = bbox
+
+    cells = Q()
+    for prefix in covering_cells(bbox):
+        cells |= Q(geohash__startswith=prefix)
+
+    return (
+        queryset.exclude(geohash="")
+        .filter(cells)
+        .filter(
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lon,
+            longitude__lte=max_lon,
+        )
+    )
+
+
+def farms_within(
+    lat: float,
+    lon: float,
+    radius_km: float,
+    queryset: QuerySet | None = None,
+) -> list[tuple[int, float]]:
+    """Return `(farm_id, distance_km)` for farms within `radius_km`, nearest first.
+
+    Candidates are narrowed in the database with geohash prefix lookups plus a
+    latitude/longitude bounding box; haversine runs only on those survivors.
+    """
+    qs = Farm.objects.all() if queryset is None else queryset
+    candidates = _candidate_farms(lat, lon, radius_km, qs).values_list(
+        "pk", "latitude", "longitude"
+    )
+
+    results = []
+    for farm_id, farm_lat, farm_lon in candidates:
+        distance = haversine_km(lat, lon, float(farm_lat), float(farm_lon))
+        if distance <= radius_km:
+            results.append((farm_id, distance))
+    results.sort(key=lambda item: item[1])
+    return results
+
+
+def _distance_from(lat: float, lon: float, lat_field: str, lon_field: str):
+    """Haversine distance in km from a fixed point to a row's coordinates, in SQL."""
+    row_lat = Radians(Cast(F(lat_field), FloatField()))
+    row_lon = Radians(Cast(F(lon_field), FloatField()))
+    origin_lat = Radians(Value(lat, output_field=FloatField()))
+    origin_lon = Radians(Value(lon, output_field=FloatField()))
+    a = Power(Sin((row_lat - origin_lat) / 2), 2) + (
+        Cos(origin_lat) * Cos(row_lat) * Power(Sin((row_lon - origin_lon) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM, output_field=FloatField()) * ASin(Sqrt(a))
+
+
+def annotate_distance(
+    products: QuerySet, lat: float, lon: float, radius_km: float
+) -> QuerySet:
+    """Restrict `products` to farms within `radius_km` and order them nearest first.
+
+    Distance is computed in SQL from the joined farm's coordinates, so the
+    statement stays the same size however many farms fall inside the radius;
+    the candidate farms are the same geohash/bounding-box subquery that
+    `farms_within` uses.
+    """
+    candidates = _candidate_farms(lat, lon, radius_km, Farm.objects.all())
+    return (
+        products.filter(farm__in=candidates.values("pk"))
+        .alias(exact_km=_distance_from(lat, lon, "farm__latitude", "farm__longitude"))
+        .filter(exact_km__lte=radius_km)
+        .annotate(distance_km=Round(F("exact_km"), 2))
+        .order_by("distance_km", "-created_at", "-id")
+    )
+
+
+def default_origin(user) -> Address | None:
+    """The user's default address, if it has coordinates."""
+    if not user.is_authenticated:
+        return None
+    return (
+        Address.objects.filter(
+            user=user,
+            is_default=True,
+            latitude__isnull=False,
+            longitude__isnull=False,
+        )
+        .only("id", "latitude", "longitude")
+        .first()
+    )
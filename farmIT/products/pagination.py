@@ -0,0 +1,167 @@
+"""Keyset (cursor) pagination for listing pages.
+
+Unlike `django.core.paginator.Paginator`, a keyset page never runs `COUNT(*)`
+and never uses `OFFSET`: each page is a range scan that starts right after the
+last row of the previous page, so page 500 costs the same as page 1.
+
+Cursors are opaque URL-safe tokens encoding the ordering key of the boundary
+row plus the direction to walk in. A tampered or stale cursor simply falls
+back to the first page.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+@dataclass
+class KeysetPage:
+    """One page of results; iterates like a Django `Page`."""
+
+    object_list: list
+    paginator: "KeysetPaginator"
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate `queryset` by a unique, totally ordered key.
+
+    `ordering` must be concrete model fields ending in a unique one (the
+    default `("-created_at", "-id")` matches `Product.Meta.ordering`).
+
+    If `count_cache_key` is given, `count` returns an approximate total that
+    is computed at most once per `count_timeout` seconds for that key;
+    otherwise `count` is `None` and no counting query is ever issued.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        ordering: tuple[str, ...] = DEFAULT_ORDERING,
+        count_cache_key: str | None = None,
+        count_timeout: int = 300,
+    ):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout
+        opts = queryset.model._meta
+        self._fields = [opts.get_field(name.lstrip("-")) for name in self.ordering]
+
+    @property
+    def count(self) -> int | None:
+        if not self.count_cache_key:
+            return None
+        return cache.get_or_set(
+            f"keyset:count:{self.count_cache_key}",
+            self.queryset.order_by().count,
+            self.count_timeout,
+        )
+
+    def page(self, cursor: str | None) -> KeysetPage:
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self._page_forward(None)
+        key, backwards = decoded
+        if backwards:
+            return self._page_backward(key)
+        return self._page_forward(key)
+
+    # -- cursor tokens ---------------------------------------------------
+
+    def encode_cursor(self, obj, backwards: bool = False) -> str:
+        key = [f.value_to_string(obj) for f in self._fields]
+        payload = json.dumps({"k": key, "b": int(backwards)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple[list, bool] | None:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw_key = payload["k"]
+            if len(raw_key) != len(self._fields):
+                return None
+            key = [f.to_python(value) for f, value in zip(self._fields, raw_key)]
+            return key, bool(payload.get("b"))
+        except (ValueError, KeyError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    # -- query building --------------------------------------------------
+
+    def _after(self, key: list, backwards: bool) -> Q:
+        """Rows strictly after `key` in the walk direction."""
+        condition = Q()
+        equal_prefix = {}
+        for name, value in zip(self.ordering, key):
+            column = name.lstrip("-")
+            descending = name.startswith("-") != backwards
+            op = "lt" if descending else "gt"
+            condition |= Q(**equal_prefix, **{f"{column}__{op}": value})
+            equal_prefix[column] = value
+        return condition
+
+    def _reversed_ordering(self) -> list[str]:
+        return [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+
+    def _page_forward(self, key: list | None) -> KeysetPage:
+        qs = self.queryset.order_by(*self.ordering)
+        if key is not None:
+            qs = qs.filter(self._after(key, backwards=False))
+        rows = list(qs[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        return KeysetPage(
+            object_list=rows,
+            paginator=self,
+            next_cursor=self.encode_cursor(rows[-1]) if has_more and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], backwards=True) if key is not None and rows else None,
+        )
+
+    def _page_backward(self, key: list) -> KeysetPage:
+        qs = self.queryset.order_by(*self._reversed_ordering()).filter(self._after(key, backwards=True))
+        rows = list(qs[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page][::-1]
+        if not rows:
+            return self._page_forward(None)
+        return KeysetPage(
+            object_list=rows,
+            paginator=self,
+            next_cursor=self.encode_cursor(rows[-1]),
+            previous_cursor=self.encode_cursor(rows[0], backwards=True) if has_more else None,
+        )
+
+
+def filter_signature(*parts) -> str:
+    """Short stable digest of normalized filter values, for cache keys."""
+    raw = json.dumps([str(p) for p in parts], separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
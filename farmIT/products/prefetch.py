@@ -0,0 +1,55 @@
+"""Top-N-per-group query helpers.
+
+`top_n_per_group` ranks rows with `ROW_NUMBER() OVER (PARTITION BY ... ORDER BY
+...)` and keeps the first `n` of each partition, so "latest 4 products of each
+farm" loads at most 4 rows per farm no matter how many listings it has.
+"""
+
+from django.db.models import F, Prefetch, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+def _order_expressions(ordering):
+    return [F(name[1:]).desc() if name.startswith("-") else F(name).asc() for name in ordering]
+
+
+def top_n_per_group(
+    queryset: QuerySet,
+    partition_by: str,
+    n: int,
+    ordering: tuple[str, ...] = DEFAULT_ORDERING,
+) -> QuerySet:
+    """Keep the first `n` rows of `queryset` for each value of `partition_by`."""
+    return (
+        queryset.annotate(
+            group_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F(partition_by)],
+                order_by=_order_expressions(ordering),
+            )
+        )
+        .filter(group_rank__lte=n)
+        .order_by(*ordering)
+    )
+
+
+def prefetch_top_n(
+    lookup: str,
+    queryset: QuerySet,
+    partition_by: str,
+    n: int,
+    to_attr: str,
+    ordering: tuple[str, ...] = DEFAULT_ORDERING,
+) -> Prefetch:
+    """`Prefetch` that loads at most `n` related rows per parent object.
+
+    `partition_by` is the foreign key on the related model pointing back at
+    the parent (e.g. `"farm"` when prefetching `Farm.products`).
+    """
+    return Prefetch(
+        lookup,
+        queryset=top_n_per_group(queryset, partition_by, n, ordering),
+        to_attr=to_attr,
+    )
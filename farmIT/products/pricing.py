@@ -0,0 +1,46 @@
+"""Delivery pricing applied to whole arrays of route distances.
+
+ETAs are computed in float64 over the full batch. Fees are money, so they
+are computed exactly: `base + distance * per_km` in `Decimal` on each
+2-decimal distance, quantized to whole pesos, as quotes always have been.
+"""
+
+from decimal import Decimal
+
+import numpy as np
+
+# Simple ETA: assume average speed of ~25 km/h including city traffic.
+AVG_SPEED_KMH = 25.0
+DEFAULT_BASE_FEE = Decimal("50")
+DEFAULT_PER_KM_FEE = Decimal("10")
+WHOLE_PESO = Decimal("1")
+
+
+def price_distances(
+    distances_km,
+    base_fee: Decimal | None = None,
+    per_km_fee: Decimal | None = None,
+    durations_minutes=None,
+) -> list[tuple[Decimal, int, Decimal]]:
+    """Return `(distance_km, eta_minutes, quoted_fee)` for each distance.
+
+    `durations_minutes` (e.g. from a road router) overrides the speed-based
+    ETA where given; `NaN` entries fall back to it.
+    """
+    base = base_fee if base_fee is not None else DEFAULT_BASE_FEE
+    per_km = per_km_fee if per_km_fee is not None else DEFAULT_PER_KM_FEE
+
+    # Formatting rounds the exact binary value, as `round(x, 2)` does.
+    exact = [Decimal(f"{distance:.2f}") for distance in np.asarray(distances_km, dtype=np.float64).tolist()]
+    minutes = np.asarray([float(distance) for distance in exact], dtype=np.float64) / AVG_SPEED_KMH * 60.0
+    if durations_minutes is not None:
+        durations = np.asarray(durations_minutes, dtype=np.float64)
+        minutes = np.where(np.isnan(durations), minutes, durations)
+    # A 2-decimal distance never gives exactly half a minute at 25 km/h, so
+    # float rounding agrees with Decimal's here.
+    etas = np.maximum(np.rint(minutes), 1).astype(np.int64)
+
+    return [
+        (distance, int(eta), (base + distance * per_km).quantize(WHOLE_PESO))
+        for distance, eta in zip(exact, etas.tolist())
+    ]
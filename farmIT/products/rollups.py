@@ -0,0 +1,203 @@
+"""Daily marketplace activity rollups (`DailyActivity`).
+
+Each source table is aggregated with one indexed range scan and a
+`GROUP BY (day, farm, location)` per batch of days, and the batch's rollup
+rows are replaced as a whole. Re-running any range therefore gives the same
+result, so a backfill never double counts.
+
+`RollupWatermark` records the last day known to be complete. An incremental
+run only rescans days after it: normally yesterday's tail and today. A day
+counts as complete once `LATE_ROWS_GRACE` has passed after its end, so rows
+committed a little late are still picked up.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncDate
+from django.utils import timezone
+
+from chat.models import Message
+
+from .models import DailyActivity, DeliveryRequest, Product, RollupWatermark, Transaction
+
+WATERMARK_NAME = "daily_activity"
+CHUNK_DAYS = 31
+LATE_ROWS_GRACE = timedelta(hours=1)
+COUNTERS = ("new_listings", "interests", "reservations", "delivery_quotes", "messages")
+COUNTER_LABELS = {
+    "new_listings": "New listings",
+    "interests": "Interests",
+    "reservations": "Reservations",
+    "delivery_quotes": "Delivery quotes",
+    "messages": "Messages",
+}
+
+
+def _farm(product: str, farmer: str):
+    # Older listings may only be linked to the farmer, not the farm.
+    return Coalesce(f"{product}farm_id", f"{farmer}farm__id")
+
+
+def _location(*paths: str):
+    # The first non-blank of e.g. the listing's own location and its farm's.
+    return Coalesce(*(NullIf(f"{path}location", Value("")) for path in paths), Value(""))
+
+
+@dataclass(frozen=True)
+class Source:
+    counter: str
+    model: type
+    date_field: str
+    farm: object
+    location: object
+
+
+SOURCES = (
+    Source("new_listings", Product, "created_at", _farm("", "farmer__"), _location("", "farm__")),
+    Source(
+        "interests",
+        Transaction,
+        "created_at",
+        _farm("product__", "product__farmer__"),
+        _location("product__", "product__farm__"),
+    ),
+    Source(
+        "reservations",
+        Transaction,
+        "reserved_at",
+        _farm("product__", "product__farmer__"),
+        _location("product__", "product__farm__"),
+    ),
+    Source(
+        "delivery_quotes",
+        DeliveryRequest,
+        "created_at",
+        F("farm_id"),
+        _location("farm__"),
+    ),
+    Source(
+        "messages",
+        Message,
+        "created_at",
+        _farm("conversation__product__", "conversation__farmer__"),
+        _location("conversation__product__", "conversation__farmer__farm__"),
+    ),
+)
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def last_complete_day(now: datetime | None = None) -> date:
+    """The latest day whose rows can no longer change."""
+    now = timezone.localtime(now)
+    return (now - LATE_ROWS_GRACE).date() - timedelta(days=1)
+
+
+def rollup_days(first: date, last: date) -> int:
+    """Recompute `DailyActivity` for `first`..`last` (inclusive); returns rows written."""
+    start, end = _day_start(first), _day_start(last + timedelta(days=1))
+    totals: dict[tuple, dict[str, int]] = {}
+    for source in SOURCES:
+        rows = (
+            source.model._default_manager.filter(
+                **{f"{source.date_field}__gte": start, f"{source.date_field}__lt": end}
+            )
+            .annotate(day=TruncDate(source.date_field), farm_ref=source.farm, place=source.location)
+            .order_by()
+            .values("day", "farm_ref", "place")
+            .annotate(n=Count("pk"))
+        )
+        for row in rows:
+            key = (row["day"], row["farm_ref"], row["place"])
+            totals.setdefault(key, dict.fromkeys(COUNTERS, 0))[source.counter] += row["n"]
+
+    with transaction.atomic():
+        DailyActivity.objects.filter(day__gte=first, day__lte=last).delete()
+        DailyActivity.objects.bulk_create(
+            [
+                DailyActivity(day=day, farm_id=farm_id, location=place, **counts)
+                for (day, farm_id, place), counts in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def _earliest_day() -> date | None:
+    firsts = [
+        source.model._default_manager.aggregate(first=Min(source.date_field))["first"]
+        for source in SOURCES
+    ]
+    firsts = [timezone.localtime(value).date() for value in firsts if value is not None]
+    return min(firsts, default=None)
+
+
+def run_rollup(since: date | None = None, until: date | None = None, chunk_days: int = CHUNK_DAYS):
+    """Roll up new activity since the watermark (or from `since`, to backfill).
+
+    Returns `(first_day, last_day, rows_written)`, or `None` when there was
+    nothing to do.
+    """
+    today = timezone.localdate()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if since is None:
+        since = watermark.complete_through + timedelta(days=1) if watermark else _earliest_day()
+    until = min(until or today, today)
+    if since is None or since > until:
+        return None
+
+    complete = last_complete_day()
+    written = 0
+    first = since
+    while first <= until:
+        last = min(first + timedelta(days=chunk_days - 1), until)
+        with transaction.atomic():
+            written += rollup_days(first, last)
+            done = min(last, complete)
+            if watermark is None:
+                watermark = RollupWatermark.objects.create(name=WATERMARK_NAME, complete_through=done)
+            elif done > watermark.complete_through:
+                watermark.complete_through = done
+                watermark.save(update_fields=["complete_through", "updated_at"])
+        first = last + timedelta(days=1)
+    return since, until, written
+
+
+def last_rollup_at() -> datetime | None:
+    return (
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list("updated_at", flat=True).first()
+    )
+
+
+def activity_series(days: int = 30) -> list[dict]:
+    """Per-counter daily series for the last `days` days, zero-filled, for charts."""
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    qs = DailyActivity.objects.filter(day__gte=first, day__lte=today)
+    by_day = {
+        row["day"]: row
+        for row in qs.order_by().values("day").annotate(**{name: Sum(name) for name in COUNTERS})
+    }
+
+    dates = [first + timedelta(days=offset) for offset in range(days)]
+    series = []
+    for name in COUNTERS:
+        values = [(by_day.get(day) or {}).get(name) or 0 for day in dates]
+        peak = max(values) or 1
+        series.append(
+            {
+                "key": name,
+                "label": COUNTER_LABELS[name],
+                "total": sum(values),
+                "points": [
+                    {"day": day, "value": value, "height": round(value * 100 / peak)}
+                    for day, value in zip(dates, values)
+                ],
+            }
+        )
+    return series
@@ -0,0 +1,238 @@
+"""Road-routing providers behind delivery quoting, with a two-tier route cache.
+
+`get_router()` returns a process-wide `CachedRouter` wrapping the provider
+named by `settings.DELIVERY_ROUTING_PROVIDER`. Lookups go:
+
+1. in-process LRU (no I/O),
+2. the `RouteCache` table, keyed by coordinates snapped to a ~50 m grid,
+3. the provider itself.
+
+Concurrent requests for the same cell pair are coalesced so only one of them
+asks the provider; the others wait for its result.
+"""
+
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+from .geo import haversine_km
+from .models import RouteCache
+
+logger = logging.getLogger(__name__)
+
+# 0.00045 degrees of latitude is ~50 m; longitude cells are slightly narrower
+# away from the equator, which only makes the cache more precise.
+CELL_DEGREES = 0.00045
+
+
+@dataclass(frozen=True)
+class Route:
+    distance_km: float
+    duration_minutes: float | None = None
+    # A stand-in (e.g. after a provider outage); never cached, so the next
+    # lookup asks the provider again.
+    approximate: bool = False
+
+
+class RoutingProvider:
+    """Computes a route between two points. Subclasses set a unique `name`."""
+
+    name = "base"
+    straight_line = False
+
+    def route(self, origin: tuple[float, float], destination: tuple[float, float]) -> Route:
+        raise NotImplementedError
+
+
+class StraightLineProvider(RoutingProvider):
+    """Great-circle distance; the historical behaviour and the default."""
+
+    name = "haversine"
+    straight_line = True
+
+    def route(self, origin, destination) -> Route:
+        return Route(distance_km=haversine_km(*origin, *destination))
+
+
+class LocalRoadEstimateProvider(RoutingProvider):
+    """Offline stand-in for a road router (tests and local development).
+
+    Scales the straight-line distance by a fixed detour factor and assumes an
+    average urban speed, so results are deterministic and need no network.
+    """
+
+    name = "local-road"
+    detour_factor = 1.3
+    speed_kmh = 25.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def route(self, origin, destination) -> Route:
+        self.calls += 1
+        distance = haversine_km(*origin, *destination) * self.detour_factor
+        return Route(distance_km=distance, duration_minutes=distance / self.speed_kmh * 60)
+
+
+class OpenRouteServiceProvider(RoutingProvider):
+    """OpenRouteService Directions API (driving profile).
+
+    Falls back to straight-line distance if the key is missing or the call
+    fails, so a routing outage degrades quotes instead of breaking them.
+    Fallback routes are marked `approximate` and are not cached.
+    """
+
+    name = "ors-driving-car"
+    url = "https://api.openrouteservice.org/v2/directions/driving-car"
+    timeout_seconds = 5
+
+    def __init__(self, api_key: str | None = None):
+        self.api_key = api_key or os.getenv("OPENROUTESERVICE_API_KEY", "")
+        self.fallback = StraightLineProvider()
+
+    def route(self, origin, destination) -> Route:
+        if not self.api_key:
+            return self._approximate(origin, destination)
+        body = json.dumps(
+            {"coordinates": [[origin[1], origin[0]], [destination[1], destination[0]]]}
+        ).encode()
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Authorization": self.api_key, "Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout_seconds) as response:
+                summary = json.load(response)["routes"][0]["summary"]
+            return Route(
+                distance_km=summary["distance"] / 1000.0,
+                duration_minutes=summary["duration"] / 60.0,
+            )
+        except (urllib.error.URLError, TimeoutError, KeyError, IndexError, ValueError):
+            logger.warning("OpenRouteService request failed; using straight-line distance.")
+            return self._approximate(origin, destination)
+
+    def _approximate(self, origin, destination) -> Route:
+        return replace(self.fallback.route(origin, destination), approximate=True)
+
+
+def grid_cell(lat: float, lon: float) -> str:
+    """Snap a coordinate to its ~50 m cache cell."""
+    return f"{round(lat / CELL_DEGREES)}:{round(lon / CELL_DEGREES)}"
+
+
+class CachedRouter:
+    """Provider wrapper with an LRU, a database cache and request coalescing."""
+
+    def __init__(self, provider: RoutingProvider, lru_size: int = 2048):
+        self.provider = provider
+        self.lru_size = lru_size
+        self._lru: OrderedDict[tuple[str, str], Route] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple[str, str], Future] = {}
+
+    @property
+    def straight_line(self) -> bool:
+        return self.provider.straight_line
+
+    def route(self, origin: tuple[float, float], destination: tuple[float, float]) -> Route:
+        if self.provider.straight_line:
+            # Cheaper to compute than to look up.
+            return self.provider.route(origin, destination)
+
+        key = (grid_cell(*origin), grid_cell(*destination))
+        with self._lock:
+            cached = self._lru.get(key)
+            if cached is not None:
+                self._lru.move_to_end(key)
+                return cached
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            route = self._load_or_compute(key, origin, destination)
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_exception(exc)
+            raise
+        if not route.approximate:
+            self._remember(key, route)
+        with self._lock:
+            self._inflight.pop(key, None)
+        pending.set_result(route)
+        return route
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def _remember(self, key, route: Route) -> None:
+        with self._lock:
+            self._lru[key] = route
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _load_or_compute(self, key, origin, destination) -> Route:
+        origin_cell, destination_cell = key
+        row = (
+            RouteCache.objects.filter(
+                provider=self.provider.name,
+                origin_cell=origin_cell,
+                destination_cell=destination_cell,
+            )
+            .values_list("distance_km", "duration_minutes")
+            .first()
+        )
+        if row is not None:
+            return Route(distance_km=row[0], duration_minutes=row[1])
+
+        route = self.provider.route(origin, destination)
+        if route.approximate:
+            return route
+        try:
+            with transaction.atomic():
+                RouteCache.objects.create(
+                    provider=self.provider.name,
+                    origin_cell=origin_cell,
+                    destination_cell=destination_cell,
+                    distance_km=route.distance_km,
+                    duration_minutes=route.duration_minutes,
+                )
+        except IntegrityError:
+            # Another process stored the same route first; either result is fine.
+            pass
+        return route
+
+
+_router: CachedRouter | None = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> CachedRouter:
+    """Process-wide router for `settings.DELIVERY_ROUTING_PROVIDER`."""
+    global _router
+    path = getattr(settings, "DELIVERY_ROUTING_PROVIDER", "products.routing.StraightLineProvider")
+    with _router_lock:
+        if _router is None or _router.provider.__class__ is not import_string(path):
+            _router = CachedRouter(import_string(path)())
+        return _router
@@ -0,0 +1,217 @@
+"""Full-text search backends for marketplace product queries.
+
+The index itself lives outside of the Django model so the same `Product`
+schema works on every database:
+
+- PostgreSQL: a weighted `tsvector` column (`search_vector`) with a GIN index.
+- SQLite: an FTS5 virtual table keyed by the product id.
+
+Both are created by migration `0007_product_search_index` and kept in sync by
+the receivers in `products.signals`. Any other database (or a SQLite build
+without FTS5) falls back to the original `icontains` scan.
+"""
+
+import logging
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_TABLE = "products_product"
+FTS_TABLE = "products_product_fts"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class BasicSearchBackend:
+    """Unindexed `icontains` search, used when no full-text index is available."""
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        return queryset.filter(
+            Q(product_name__icontains=query) | Q(description__icontains=query)
+        )
+
+    def index_product(self, product) -> None:
+        pass
+
+    def index_products(self, product_ids) -> None:
+        """Index many rows at once (for `bulk_create`, which skips signals)."""
+        pass
+
+    def remove_product(self, product_id: int) -> None:
+        pass
+
+    def rebuild(self) -> int:
+        return 0
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """`tsvector` + GIN search with `ts_rank_cd` relevance ordering."""
+
+    # Product names weigh more than free-form descriptions.
+    VECTOR_SQL = (
+        "setweight(to_tsvector(%s::regconfig, coalesce(product_name, '')), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(description, '')), 'B')"
+    )
+
+    def __init__(self, config: str | None = None):
+        self.config = config or getattr(settings, "PRODUCT_SEARCH_CONFIG", "simple")
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        tsquery = "websearch_to_tsquery(%s::regconfig, %s)"
+        params = (self.config, query)
+        return (
+            queryset.filter(
+                RawSQL(
+                    f"{PRODUCT_TABLE}.search_vector @@ {tsquery}",
+                    params,
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"ts_rank_cd({PRODUCT_TABLE}.search_vector, {tsquery})",
+                    params,
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-created_at", "-id")
+        )
+
+    def index_product(self, product) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {PRODUCT_TABLE} SET search_vector = {self.VECTOR_SQL} WHERE id = %s",
+                [self.config, self.config, product.pk],
+            )
+
+    def index_products(self, product_ids) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {PRODUCT_TABLE} SET search_vector = {self.VECTOR_SQL} WHERE id = ANY(%s)",
+                [self.config, self.config, list(product_ids)],
+            )
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {PRODUCT_TABLE} SET search_vector = {self.VECTOR_SQL}",
+                [self.config, self.config],
+            )
+            return cursor.rowcount
+
+
+class SQLiteFTSSearchBackend(BasicSearchBackend):
+    """FTS5 search with `bm25` relevance ordering (local development)."""
+
+    @staticmethod
+    def build_match(query: str) -> str:
+        """Turn free text into an FTS5 expression of quoted prefix terms.
+
+        Quoting every token keeps user input from being parsed as FTS5 syntax
+        (`AND`, `NEAR`, column filters, unbalanced quotes...).
+        """
+        tokens = _TOKEN_RE.findall(query)
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        match = self.build_match(query)
+        if not match:
+            return super().search(queryset, query)
+        return (
+            queryset.filter(
+                RawSQL(
+                    f"{PRODUCT_TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                    (match,),
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                # bm25() is lower-is-better; negate so ordering matches Postgres.
+                search_rank=RawSQL(
+                    f"(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s AND rowid = {PRODUCT_TABLE}.id)",
+                    (match,),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-created_at", "-id")
+        )
+
+    def index_product(self, product) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)",
+                [product.pk, product.product_name or "", product.description or ""],
+            )
+
+    def index_products(self, product_ids) -> None:
+        ids = list(product_ids)
+        if not ids:
+            return
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", ids)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, product_name, description) "
+                f"SELECT id, product_name, coalesce(description, '') FROM {PRODUCT_TABLE} "
+                f"WHERE id IN ({placeholders})",
+                ids,
+            )
+
+    def remove_product(self, product_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, product_name, description) "
+                f"SELECT id, product_name, coalesce(description, '') FROM {PRODUCT_TABLE}"
+            )
+            return cursor.rowcount
+
+
+def _sqlite_fts_available() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor: str, override: str | None) -> BasicSearchBackend:
+    if override:
+        return import_string(override)()
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    if vendor == "sqlite" and _sqlite_fts_available():
+        return SQLiteFTSSearchBackend()
+    logger.info("No full-text index for %s; using icontains product search.", vendor)
+    return BasicSearchBackend()
+
+
+def get_search_backend() -> BasicSearchBackend:
+    """Return the search backend for the default database.
+
+    Set `PRODUCT_SEARCH_BACKEND` to a dotted path to force a specific backend.
+    """
+    return _backend_for(connection.vendor, getattr(settings, "PRODUCT_SEARCH_BACKEND", None))
+
+
+def search_products(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter `queryset` to products matching `query`, ordered by relevance."""
+    query = (query or "").strip()
+    if not query:
+        return queryset
+    return get_search_backend().search(queryset, query)
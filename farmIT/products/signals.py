@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import stats, suggest, versions
+from .conditional import touch_farms
+from .models import Farm, Product, Review, Transaction
+from .search import get_search_backend
+
+SEARCH_FIELDS = frozenset({"product_name", "description"})
+PRODUCT_STATS_FIELDS = frozenset({"farm", "is_approved"})
+REVIEW_STATS_FIELDS = frozenset({"farm", "rating"})
+PRODUCT_SUGGEST_FIELDS = frozenset({"product_name", "location", "is_approved"})
+FARM_SUGGEST_FIELDS = frozenset({"name", "slug", "location"})
+
+
+@receiver(post_save, sender=Product, dispatch_uid="products_index_product")
+def index_product(sender, instance: Product, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """Keep the full-text index in sync with the product row."""
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="products_unindex_product")
+def unindex_product(sender, instance: Product, **kwargs) -> None:
+    get_search_backend().remove_product(instance.pk)
+
+
+@receiver(post_init, sender=Product, dispatch_uid="products_snapshot_product_stats")
+def snapshot_product_stats(sender, instance: Product, **kwargs) -> None:
+    stats.snapshot(instance, stats.PRODUCT_STATE_FIELDS)
+
+
+@receiver(post_save, sender=Product, dispatch_uid="products_update_product_stats")
+def update_product_stats(sender, instance: Product, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """Apply approval/farm changes to the farm's product counter."""
+    if raw:
+        return
+    if update_fields is not None and not PRODUCT_STATS_FIELDS.intersection(update_fields):
+        return
+    stats.product_saved(instance)
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="products_remove_product_stats")
+def remove_product_stats(sender, instance: Product, **kwargs) -> None:
+    stats.product_deleted(instance)
+
+
+@receiver(post_init, sender=Review, dispatch_uid="products_snapshot_review_stats")
+def snapshot_review_stats(sender, instance: Review, **kwargs) -> None:
+    stats.snapshot(instance, stats.REVIEW_STATE_FIELDS)
+
+
+@receiver(post_save, sender=Review, dispatch_uid="products_update_review_stats")
+def update_review_stats(sender, instance: Review, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """Apply new or changed ratings to the farm's review counters."""
+    if raw:
+        return
+    if update_fields is not None and not REVIEW_STATS_FIELDS.intersection(update_fields):
+        return
+    stats.review_saved(instance)
+
+
+@receiver(post_delete, sender=Review, dispatch_uid="products_remove_review_stats")
+def remove_review_stats(sender, instance: Review, **kwargs) -> None:
+    stats.review_deleted(instance)
+
+
+@receiver(post_save, sender=Product, dispatch_uid="products_suggest_product")
+def suggest_product(sender, instance: Product, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """Patch the typeahead index in place once the save commits."""
+    if raw:
+        return
+    if update_fields is not None and not PRODUCT_SUGGEST_FIELDS.intersection(update_fields):
+        return
+    suggest.patch_index(lambda index: index.update_product(instance))
+
+
+@receiver(post_delete, sender=Product, dispatch_uid="products_unsuggest_product")
+def unsuggest_product(sender, instance: Product, **kwargs) -> None:
+    pk = instance.pk  # cleared by delete() before the transaction commits
+    suggest.patch_index(lambda index: index.remove(suggest.PRODUCT, pk))
+
+
+@receiver(post_save, sender=Farm, dispatch_uid="products_suggest_farm")
+def suggest_farm(sender, instance: Farm, raw: bool = False, update_fields=None, **kwargs) -> None:
+    if raw:
+        return
+    if update_fields is not None and not FARM_SUGGEST_FIELDS.intersection(update_fields):
+        return
+    suggest.patch_index(lambda index: index.update_farm(instance))
+
+
+@receiver(post_delete, sender=Farm, dispatch_uid="products_unsuggest_farm")
+def unsuggest_farm(sender, instance: Farm, **kwargs) -> None:
+    pk = instance.pk
+    suggest.patch_index(lambda index: index.remove(suggest.FARM, pk))
+
+
+@receiver(post_save, sender=Product, dispatch_uid="products_bump_product_version")
+@receiver(post_delete, sender=Product, dispatch_uid="products_bump_product_version_delete")
+def bump_product_version(sender, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        versions.bump(versions.PRODUCTS)
+
+
+@receiver(post_save, sender=Farm, dispatch_uid="products_bump_farm_version")
+@receiver(post_delete, sender=Farm, dispatch_uid="products_bump_farm_version_delete")
+def bump_farm_version(sender, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        versions.bump(versions.FARMS)
+
+
+@receiver(post_save, sender=Review, dispatch_uid="products_bump_review_version")
+@receiver(post_delete, sender=Review, dispatch_uid="products_bump_review_version_delete")
+def bump_review_version(sender, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        versions.bump(versions.REVIEWS)
+
+
+@receiver(post_save, sender=Transaction, dispatch_uid="products_bump_transaction_version")
+@receiver(post_delete, sender=Transaction, dispatch_uid="products_bump_transaction_version_delete")
+def bump_transaction_version(sender, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        versions.bump(versions.TRANSACTIONS)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid="products_bump_user_version")
+@receiver(post_delete, sender=get_user_model(), dispatch_uid="products_bump_user_version_delete")
+def bump_user_version(sender, raw: bool = False, created: bool = True, **kwargs) -> None:
+    # Only sign-ups and deletions change what the dashboard shows.
+    if not raw and created:
+        versions.bump(versions.USERS)
+
+
+@receiver(pre_save, sender=Product, dispatch_uid="products_touch_previous_farm")
+def touch_previous_farm(sender, instance: Product, raw: bool = False, **kwargs) -> None:
+    """A product moving to another farm also changes the farm it left."""
+    state = getattr(instance, stats.STATE_ATTR, None)
+    if not raw and isinstance(state, tuple) and state[0] != instance.farm_id:
+        touch_farms(state[0])
+
+
+@receiver(post_save, sender=Product, dispatch_uid="products_touch_farm_for_product")
+@receiver(post_delete, sender=Product, dispatch_uid="products_touch_farm_for_product_delete")
+def touch_farm_for_product(sender, instance: Product, raw: bool = False, **kwargs) -> None:
+    """Roll product changes up into the farm page's last-modified time."""
+    if not raw:
+        touch_farms(instance.farm_id)
+
+
+@receiver(post_save, sender=Review, dispatch_uid="products_touch_farm_for_review")
+@receiver(post_delete, sender=Review, dispatch_uid="products_touch_farm_for_review_delete")
+def touch_farm_for_review(sender, instance: Review, raw: bool = False, **kwargs) -> None:
+    if not raw:
+        touch_farms(instance.farm_id)
@@ -0,0 +1,141 @@
+"""Incremental maintenance of the denormalized `Farm` counters.
+
+Receivers in `products.signals` snapshot the counted state of each `Product`
+and `Review` when it is loaded, then apply only the difference on save or
+delete with a single `UPDATE ... SET col = col + n` on the farm row. Queryset
+`update()`/`bulk_create()` bypass signals; callers using them must call
+`rebuild_farm_stats()` for the affected farms.
+"""
+
+from collections import Counter
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+
+from . import versions
+from .models import Farm, Product, Review
+
+STATE_ATTR = "_farm_stats_state"
+PRODUCT_STATE_FIELDS = ("farm_id", "is_approved")
+REVIEW_STATE_FIELDS = ("farm_id", "rating")
+
+
+def snapshot(instance, fields: tuple[str, ...]) -> None:
+    """Remember the counted fields as loaded on `instance`.
+
+    The state is `None` for unsaved objects and `"unknown"` if any of the
+    fields were deferred.
+    """
+    values = instance.__dict__
+    # post_init runs before `_state.adding` is set for rows loaded from the
+    # database, so a missing primary key is the reliable "new object" test.
+    if values.get(instance._meta.pk.attname) is None:
+        state = None
+    elif all(name in values for name in fields):
+        state = tuple(values[name] for name in fields)
+    else:
+        state = "unknown"
+    setattr(instance, STATE_ATTR, state)
+
+
+def _apply(deltas: dict[int, Counter]) -> None:
+    for farm_id, counter in deltas.items():
+        changes = {
+            name: Greatest(F(name) + delta, 0)
+            for name, delta in counter.items()
+            if delta
+        }
+        if farm_id is not None and changes:
+            Farm.objects.filter(pk=farm_id).update(**changes)
+
+
+def _product_contribution(farm_id, is_approved) -> dict[int, Counter]:
+    if farm_id is None or not is_approved:
+        return {}
+    return {farm_id: Counter(active_product_count=1)}
+
+
+def _review_contribution(farm_id, rating) -> dict[int, Counter]:
+    if farm_id is None or rating is None:
+        return {}
+    counter = Counter(review_count=1, rating_sum=rating)
+    if 1 <= rating <= 5:
+        counter[f"rating_{rating}_count"] = 1
+    return {farm_id: counter}
+
+
+def _diff(old: dict[int, Counter], new: dict[int, Counter]) -> dict[int, Counter]:
+    deltas: dict[int, Counter] = {}
+    for farm_id in old.keys() | new.keys():
+        counter = Counter()
+        counter.update(new.get(farm_id, {}))
+        counter.subtract(old.get(farm_id, {}))
+        deltas[farm_id] = counter
+    return deltas
+
+
+def _record_change(instance, fields, contribution, deleted: bool) -> None:
+    old_state = getattr(instance, STATE_ATTR, None)
+    new_state = None if deleted else tuple(getattr(instance, name) for name in fields)
+    if old_state == "unknown":
+        # Loaded with deferred fields: we cannot diff, so recount the farm(s).
+        farm_ids = {instance.farm_id} - {None}
+        rebuild_farm_stats(Farm.objects.filter(pk__in=farm_ids))
+    else:
+        old = contribution(*old_state) if old_state else {}
+        new = contribution(*new_state) if new_state else {}
+        _apply(_diff(old, new))
+    setattr(instance, STATE_ATTR, new_state)
+
+
+def product_saved(product: Product) -> None:
+    _record_change(product, PRODUCT_STATE_FIELDS, _product_contribution, deleted=False)
+
+
+def product_deleted(product: Product) -> None:
+    _record_change(product, PRODUCT_STATE_FIELDS, _product_contribution, deleted=True)
+
+
+def review_saved(review: Review) -> None:
+    _record_change(review, REVIEW_STATE_FIELDS, _review_contribution, deleted=False)
+
+
+def review_deleted(review: Review) -> None:
+    _record_change(review, REVIEW_STATE_FIELDS, _review_contribution, deleted=True)
+
+
+def rebuild_farm_stats(farms=None) -> int:
+    """Recompute all counters from scratch for `farms` (default: every farm)."""
+    farms = Farm.objects.all() if farms is None else farms
+    farm_ids = list(farms.values_list("pk", flat=True))
+    if not farm_ids:
+        return 0
+
+    products = dict(
+        Product.objects.filter(farm_id__in=farm_ids, is_approved=True)
+        .values("farm_id")
+        .annotate(c=Count("id"))
+        .values_list("farm_id", "c")
+    )
+    reviews = {
+        row["farm_id"]: row
+        for row in Review.objects.filter(farm_id__in=farm_ids)
+        .values("farm_id")
+        .annotate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{
+                f"rating_{stars}_count": Count("id", filter=Q(rating=stars))
+                for stars in range(1, 6)
+            },
+        )
+    }
+
+    for farm_id in farm_ids:
+        row = reviews.get(farm_id, {})
+        Farm.objects.filter(pk=farm_id).update(
+            active_product_count=products.get(farm_id, 0),
+            **{name: row.get(name) or 0 for name in Farm.STATS_FIELDS if name != "active_product_count"},
+        )
+    versions.bump(versions.FARMS)
+    return len(farm_ids)
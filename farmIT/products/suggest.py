@@ -0,0 +1,210 @@
+"""In-process prefix index for marketplace typeahead suggestions.
+
+Approved product names, farm names and locations are stored as normalized
+keys in one sorted list; a prefix query is two `bisect` calls plus a short
+scan, so answering never touches the database. Every word start of a name is
+indexed too, so "kale" also finds "Curly kale".
+
+The index is built lazily on first use and then patched in place by model
+signals (see `products.signals`) once their transaction commits. Signals
+only reach the process that saved the row, so each process also rebuilds its
+copy after `MAX_AGE_SECONDS`.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, NamedTuple
+
+from django.db import transaction
+
+from .models import Farm, Product
+
+MAX_AGE_SECONDS = 300
+DEFAULT_LIMIT = 8
+
+PRODUCT = "product"
+FARM = "farm"
+LOCATION = "location"
+
+
+class Entry(NamedTuple):
+    # A plain tuple underneath, so bisect compares in C.
+    key: str
+    kind: str
+    label: str
+    ref: str  # product pk, farm slug, or location label
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def _keys(label: str) -> list[str]:
+    words = normalize(label).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: list[Entry] = []
+        self._owned: dict[tuple[str, object], list[Entry]] = {}
+        # Locations come from both products and farms; keep one set of
+        # entries per distinct spelling and drop it when nothing uses it.
+        self._location_refs: dict[str, int] = {}
+        self._owner_location: dict[tuple[str, object], str] = {}
+        self.built_at = 0.0
+
+    def build(self) -> None:
+        """(Re)load every approved product and farm in two queries."""
+        fresh = SuggestionIndex()
+        products = Product.objects.filter(is_approved=True).values_list(
+            "pk", "product_name", "location"
+        )
+        for pk, name, location in products.iterator(chunk_size=2000):
+            fresh._add(PRODUCT, pk, name, str(pk), location)
+        farms = Farm.objects.exclude(slug="").values_list(
+            "pk", "name", "slug", "location"
+        )
+        for pk, name, slug, location in farms.iterator(chunk_size=2000):
+            fresh._add(FARM, pk, name, slug, location)
+        fresh._entries.sort()
+        with self._lock:
+            self._entries = fresh._entries
+            self._owned = fresh._owned
+            self._location_refs = fresh._location_refs
+            self._owner_location = fresh._owner_location
+            self.built_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a rebuild on next use (e.g. after bulk writes)."""
+        self.built_at = 0.0
+
+    @property
+    def stale(self) -> bool:
+        return not self.built_at or time.monotonic() - self.built_at > MAX_AGE_SECONDS
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT) -> list[Entry]:
+        needle = normalize(prefix)
+        if not needle:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            entries = self._entries
+            for position in range(bisect_left(entries, (needle,)), len(entries)):
+                entry = entries[position]
+                if not entry.key.startswith(needle):
+                    break
+                ident = (entry.kind, entry.ref)
+                if ident in seen:
+                    continue
+                seen.add(ident)
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        # Whole-name matches first, then shorter labels.
+        results.sort(
+            key=lambda e: (
+                not normalize(e.label).startswith(needle),
+                len(e.label),
+                e.label,
+            )
+        )
+        return results
+
+    def update_product(self, product: Product) -> None:
+        with self._lock:
+            self._remove(PRODUCT, product.pk)
+            if product.is_approved:
+                self._add(
+                    PRODUCT,
+                    product.pk,
+                    product.product_name,
+                    str(product.pk),
+                    product.location,
+                    insert=True,
+                )
+
+    def update_farm(self, farm: Farm) -> None:
+        with self._lock:
+            self._remove(FARM, farm.pk)
+            if farm.slug:
+                self._add(
+                    FARM, farm.pk, farm.name, farm.slug, farm.location, insert=True
+                )
+
+    def remove(self, kind: str, pk) -> None:
+        with self._lock:
+            self._remove(kind, pk)
+
+    def _add(
+        self, kind: str, pk, label: str, ref: str, location: str, insert: bool = False
+    ) -> None:
+        place = insort if insert else list.append
+        owned = []
+        for key in _keys(label):
+            entry = Entry(key, kind, label, ref)
+            place(self._entries, entry)
+            owned.append(entry)
+        self._owned[(kind, pk)] = owned
+
+        location = " ".join((location or "").split())
+        if location:
+            self._owner_location[(kind, pk)] = location
+            refs = self._location_refs.get(location, 0)
+            self._location_refs[location] = refs + 1
+            if not refs:
+                for key in _keys(location):
+                    place(self._entries, Entry(key, LOCATION, location, location))
+
+    def _remove(self, kind: str, pk) -> None:
+        for entry in self._owned.pop((kind, pk), []):
+            self._discard(entry)
+        location = self._owner_location.pop((kind, pk), None)
+        if location:
+            refs = self._location_refs.get(location, 0) - 1
+            if refs > 0:
+                self._location_refs[location] = refs
+            else:
+                self._location_refs.pop(location, None)
+                for key in _keys(location):
+                    self._discard(Entry(key, LOCATION, location, location))
+
+    def _discard(self, entry: Entry) -> None:
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+
+_index = SuggestionIndex()
+_build_lock = threading.Lock()
+
+
+def get_index() -> SuggestionIndex:
+    """The process-wide index, built on first use and when stale."""
+    if _index.stale:
+        with _build_lock:
+            if _index.stale:
+                _index.build()
+    return _index
+
+
+def patch_index(change: Callable[[SuggestionIndex], None]) -> None:
+    """Apply `change` to the loaded index once the current transaction commits.
+
+    Rolled-back writes never reach the index, and an index this process has
+    not loaded is left alone: patching never triggers a (re)build.
+    """
+
+    def apply():
+        if _index.built_at:
+            change(_index)
+
+    transaction.on_commit(apply)
+
+
+def invalidate_index() -> None:
+    """Drop the loaded index (e.g. after bulk writes); rebuilt on next use."""
+    _index.invalidate()
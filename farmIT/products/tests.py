@@ -1,4 +1,68 @@
-from django.test import TestCase
+import csv
+import io
+import urllib.error
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from openpyxl import Workbook
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase as DjangoTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.models import Conversation, Message
+from ratelimit.backends import get_backend
+
+from .consolidation import cluster_points, propose_runs, split_fee
+from .delivery import quote_products
+from .dispatch import nearest_neighbour_tour, plan_farm_dispatch, two_opt
+from .exports import EXPORTS, astream_csv, stream_csv
+from .facets import cached_facets, compute_facets
+from .geo import bounding_box, covering_cells, encode_geohash, haversine_matrix
+from .importer import import_products
+from .metrics import compute_dashboard_metrics, get_dashboard_metrics
+from .models import (
+    Address,
+    ConsolidatedRun,
+    DailyActivity,
+    DeliveryRequest,
+    Farm,
+    MetricsSnapshot,
+    Product,
+    Review,
+    RollupWatermark,
+    RouteCache,
+    Transaction,
+    estimate_distance_and_fee,
+)
+from .nearby import annotate_distance, farms_within
+from .pagination import KeysetPaginator
+from .prefetch import prefetch_top_n
+from .pricing import price_distances
+from .rollups import COUNTERS as ROLLUP_COUNTERS, activity_series, last_complete_day, run_rollup
+from .routing import CachedRouter, OpenRouteServiceProvider, get_router
+from .search import SQLiteFTSSearchBackend, search_products
+from .suggest import SuggestionIndex, get_index
+from .stats import rebuild_farm_stats
+
+
+class TestCase(DjangoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The test client always calls from 127.0.0.1; without this the
+        # per-IP limit counts every request made in the module.
+        get_backend().clear()
 
 
 class DummyTest(TestCase):
@@ -6,3 +70,934 @@ class DummyTest(TestCase):
         self.assertTrue(True)
 
 
+def make_user(username: str, role: str = "farmer", **extra):
+    return get_user_model().objects.create_user(
+        username=username,
+        email=f"{username}@example.com",
+        password="pass12345",
+        role=role,
+        **extra,
+    )
+
+
+def make_product(farmer, name: str, **extra):
+    defaults = {"price": Decimal("10.00"), "quantity": 5, "description": ""}
+    defaults.update(extra)
+    return Product.objects.create(farmer=farmer, product_name=name, **defaults)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user("juan")
+
+    def test_results_are_ordered_by_relevance(self):
+        weak = make_product(self.farmer, "Mixed basket", description="has some mango slices")
+        strong = make_product(self.farmer, "Carabao mango", description="sweet mango from Guimaras")
+        make_product(self.farmer, "Rice", description="well-milled")
+
+        results = list(search_products(Product.objects.all(), "mango"))
+
+        self.assertEqual(results, [strong, weak])
+
+    def test_index_follows_updates_and_deletes(self):
+        product = make_product(self.farmer, "Eggplant")
+        product.product_name = "Talong"
+        product.save()
+
+        self.assertFalse(search_products(Product.objects.all(), "eggplant").exists())
+        self.assertEqual(list(search_products(Product.objects.all(), "talo")), [product])
+
+        product.delete()
+        self.assertFalse(search_products(Product.objects.all(), "talong").exists())
+
+    def test_fts_syntax_in_user_input_is_neutralised(self):
+        self.assertEqual(
+            SQLiteFTSSearchBackend.build_match('NEAR("okra" OR'),
+            '"NEAR"* "okra"* "OR"*',
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        farmer = make_user("maria")
+        self.products = [make_product(farmer, f"Item {i}") for i in range(7)]
+        # Newest first, matching Product.Meta.ordering; ids break created_at ties.
+        self.expected = sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3)
+
+        first = paginator.page(None)
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+
+        self.assertEqual(list(first) + list(second) + list(third), self.expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(list(paginator.page(third.previous_cursor)), list(second))
+        self.assertEqual(list(paginator.page(second.previous_cursor)), list(first))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3)
+        self.assertEqual(list(paginator.page("not-a-cursor")), self.expected[:3])
+
+    def test_count_is_only_computed_when_requested(self):
+        self.assertIsNone(KeysetPaginator(Product.objects.all(), 3).count)
+        self.assertEqual(KeysetPaginator(Product.objects.all(), 3, count_cache_key="all").count, 7)
+
+    def test_product_list_uses_keyset_pages(self):
+        response = self.client.get(reverse("product_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["keyset"])
+        self.assertContains(response, "~7 items available")
+
+
+class FarmStatsTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user("pedro")
+        self.farm = Farm.objects.create(farmer=self.farmer, name="Pedro Farm")
+
+    def assertStats(self, **expected):
+        self.farm.refresh_from_db()
+        actual = {name: getattr(self.farm, name) for name in expected}
+        self.assertEqual(actual, expected)
+
+    def test_product_counter_follows_approval_and_delete(self):
+        product = make_product(self.farmer, "Kangkong", farm=self.farm)
+        make_product(self.farmer, "Pechay", farm=self.farm, is_approved=False)
+        self.assertStats(active_product_count=1)
+
+        product = Product.objects.get(pk=product.pk)
+        product.is_approved = False
+        product.save()
+        self.assertStats(active_product_count=0)
+
+        product.is_approved = True
+        product.save()
+        product.delete()
+        self.assertStats(active_product_count=0)
+
+    def test_review_counters_and_histogram(self):
+        review = Review.objects.create(farm=self.farm, customer=make_user("ana", "customer"), rating=5)
+        Review.objects.create(farm=self.farm, customer=make_user("ben", "customer"), rating=3)
+        self.assertStats(review_count=2, rating_sum=8, rating_5_count=1, rating_3_count=1)
+        self.assertEqual(self.farm.avg_rating, 4)
+
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 4
+        review.save()
+        self.assertStats(review_count=2, rating_sum=7, rating_5_count=0, rating_4_count=1)
+
+        review.delete()
+        self.assertStats(review_count=1, rating_sum=3, rating_4_count=0)
+
+    def test_farm_form_save_does_not_clobber_counters(self):
+        stale = Farm.objects.get(pk=self.farm.pk)
+        make_product(self.farmer, "Sitaw", farm=self.farm)
+        stale.description = "Updated"
+        stale.save()
+        self.assertStats(active_product_count=1, description="Updated")
+
+    def test_rebuild_matches_incremental_counts(self):
+        make_product(self.farmer, "Okra", farm=self.farm)
+        Review.objects.create(farm=self.farm, customer=make_user("cora", "customer"), rating=2)
+        Farm.objects.filter(pk=self.farm.pk).update(active_product_count=9, review_count=0, rating_sum=0)
+
+        rebuild_farm_stats()
+        self.assertStats(active_product_count=1, review_count=1, rating_sum=2, rating_2_count=1)
+
+
+class TopNPrefetchTests(TestCase):
+    def test_prefetch_caps_rows_per_farm(self):
+        farms = []
+        for name, count in (("ana", 6), ("ben", 2)):
+            farmer = make_user(name)
+            farm = Farm.objects.create(farmer=farmer, name=f"{name} farm")
+            for i in range(count):
+                make_product(farmer, f"{name} {i}", farm=farm)
+            farms.append(farm)
+
+        with self.assertNumQueries(2):
+            loaded = list(
+                Farm.objects.filter(pk__in=[f.pk for f in farms])
+                .order_by("name")
+                .prefetch_related(
+                    prefetch_top_n("products", Product.objects.all(), "farm", 4, to_attr="latest")
+                )
+            )
+
+        self.assertEqual([len(f.latest) for f in loaded], [4, 2])
+        newest = Product.objects.filter(farm=farms[0]).order_by("-created_at", "-id")[:4]
+        self.assertEqual(loaded[0].latest, list(newest))
+
+
+class RadiusSearchTests(TestCase):
+    def make_farm(self, username, lat, lon):
+        farmer = make_user(username)
+        return Farm.objects.create(
+            farmer=farmer, name=f"{username} farm", latitude=Decimal(lat), longitude=Decimal(lon)
+        )
+
+    def test_geohash_matches_reference_encoding(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_covering_cells_contain_every_corner(self):
+        bbox = bounding_box(14.5995, 120.9842, 10)
+        cells = covering_cells(bbox)
+        min_lat, max_lat, min_lon, max_lon = bbox
+        for lat, lon in ((min_lat, min_lon), (min_lat, max_lon), (max_lat, min_lon), (max_lat, max_lon)):
+            self.assertTrue(any(encode_geohash(lat, lon).startswith(c) for c in cells))
+
+    def test_farms_within_filters_and_sorts_by_distance(self):
+        # Around Manila: Quezon City (~10 km), Makati (~6 km), Baguio (~200 km).
+        qc = self.make_farm("qc", "14.676041", "121.043700")
+        makati = self.make_farm("makati", "14.554729", "121.024445")
+        self.make_farm("baguio", "16.402333", "120.596007")
+        Farm.objects.create(farmer=make_user("nowhere"), name="No pin")
+
+        results = farms_within(14.5995, 120.9842, 15)
+
+        self.assertEqual([farm_id for farm_id, _ in results], [makati.pk, qc.pk])
+        self.assertLess(results[0][1], results[1][1])
+
+    def test_distance_is_computed_in_sql_with_a_fixed_size_statement(self):
+        qc = self.make_farm("qc", "14.676041", "121.043700")
+        makati = self.make_farm("makati", "14.554729", "121.024445")
+        for farm in (qc, makati):
+            make_product(farm.farmer, f"{farm.name} okra", farm=farm)
+        products = Product.objects.filter(is_approved=True)
+
+        before = str(annotate_distance(products, 14.5995, 120.9842, 15).query)
+        for i in range(20):
+            self.make_farm(f"extra{i}", "14.56", f"{121.0 + i / 1000:.6f}")
+        annotated = annotate_distance(products, 14.5995, 120.9842, 15)
+
+        self.assertEqual(len(str(annotated.query)), len(before))
+        expected = {farm_id: round(km, 2) for farm_id, km in farms_within(14.5995, 120.9842, 15)}
+        self.assertEqual(
+            [(p.farm_id, p.distance_km) for p in annotated],
+            [(makati.pk, expected[makati.pk]), (qc.pk, expected[qc.pk])],
+        )
+
+    def test_product_list_sorts_by_distance_from_default_address(self):
+        near = self.make_farm("near", "14.554729", "121.024445")
+        far = self.make_farm("far", "14.676041", "121.043700")
+        far_product = make_product(far.farmer, "Far okra", farm=far)
+        near_product = make_product(near.farmer, "Near okra", farm=near)
+        customer = make_user("buyer", "customer")
+        Address.objects.create(
+            user=customer, label="Home", line1="1 Rizal St", city="Manila", province="Metro Manila",
+            latitude=Decimal("14.5995"), longitude=Decimal("120.9842"), is_default=True,
+        )
+        self.client.force_login(customer)
+
+        response = self.client.get(reverse("product_list"), {"radius": "25"})
+
+        self.assertEqual(list(response.context["products"]), [near_product, far_product])
+        self.assertContains(response, "km away")
+
+    def test_staff_radius_facets_are_cached_per_origin(self):
+        cache.clear()
+        for slug, lat, lon in (("manila", "14.554729", "121.024445"), ("baguio", "16.402333", "120.596007")):
+            farm = self.make_farm(slug, lat, lon)
+            make_product(farm.farmer, f"{slug} okra", farm=farm, location=slug.title())
+        locations = []
+        for username, lat, lon in (("ana", "14.5995", "120.9842"), ("ben", "16.4023", "120.5960")):
+            staff = make_user(username, is_staff=True)
+            Address.objects.create(
+                user=staff, label="Office", line1="1 Main St", city="City", province="Province",
+                latitude=Decimal(lat), longitude=Decimal(lon), is_default=True,
+            )
+            self.client.force_login(staff)
+            # A distinct URL per request gets past the page cache to the facet cache.
+            response = self.client.get(reverse("product_list"), {"radius": "25", "as": username})
+            facets = response.context["facets"]
+            locations.append([b.label for b in facets.location])
+        self.assertEqual(locations, [["Manila"], ["Baguio"]])
+
+
+class PricingTests(TestCase):
+    @staticmethod
+    def decimal_quote(distance: float, per_km: Decimal):
+        """The original per-request formula, kept as the reference."""
+        distance_km = Decimal(str(round(distance, 2)))
+        eta_hours = distance_km / Decimal("25") if distance_km > 0 else Decimal("0")
+        eta_minutes = int((eta_hours * Decimal("60")).quantize(Decimal("1")))
+        return distance_km, max(eta_minutes, 1), (Decimal("50") + distance_km * per_km).quantize(Decimal("1"))
+
+    def test_batch_pricing_matches_the_decimal_formula(self):
+        distances = [i / 100 for i in range(0, 20001, 7)] + np.random.default_rng(6).uniform(0, 200, 2000).tolist()
+        for per_km in (Decimal("12.5"), Decimal("15"), Decimal("7.5"), Decimal("10")):
+            priced = price_distances(distances, per_km_fee=per_km)
+            self.assertEqual(priced, [self.decimal_quote(distance, per_km) for distance in distances], per_km)
+
+
+class BatchDeliveryQuoteTests(TestCase):
+    def setUp(self):
+        self.customer = make_user("carla", "customer")
+        self.address = Address.objects.create(
+            user=self.customer, label="Home", line1="1 Rizal St", city="Manila", province="Metro Manila",
+            latitude=Decimal("14.5995"), longitude=Decimal("120.9842"), is_default=True,
+        )
+        self.farms = []
+        self.products = []
+        for i, (lat, lon) in enumerate((("14.554729", "121.024445"), ("14.676041", "121.043700"), ("15.1", "120.6"))):
+            farmer = make_user(f"farmer{i}")
+            farm = Farm.objects.create(
+                farmer=farmer, name=f"Farm {i}", latitude=Decimal(lat), longitude=Decimal(lon)
+            )
+            self.farms.append(farm)
+            self.products += [make_product(farmer, f"Item {i}-{j}", farm=farm) for j in range(2)]
+        self.unlocated = make_product(make_user("nopin"), "Mystery crate")
+
+    def test_cart_quote_matches_single_quotes_in_one_query(self):
+        with self.assertNumQueries(1):
+            cart = quote_products(self.address, [p.pk for p in self.products] + [self.unlocated.pk])
+
+        self.assertEqual(len(cart.quotes), 3)
+        self.assertEqual(cart.unquotable, [self.unlocated])
+        for quote in cart.quotes:
+            self.assertEqual(
+                (quote.distance_km, quote.eta_minutes, quote.quoted_fee),
+                estimate_distance_and_fee(quote.farm, self.address),
+            )
+            self.assertEqual(len(cart.products_by_farm[quote.farm.pk]), 2)
+        self.assertEqual(cart.total_fee, sum(q.quoted_fee for q in cart.quotes))
+
+    def test_cart_quote_view(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(
+            reverse("delivery_cart_quote"), {"product": [self.products[0].pk, self.products[2].pk]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cart"].quotes), 2)
+
+
+@override_settings(DELIVERY_ROUTING_PROVIDER="products.routing.LocalRoadEstimateProvider")
+class RouteCacheTests(TestCase):
+    def setUp(self):
+        self.router = get_router()
+        self.router.clear()
+        self.router.provider.calls = 0
+        self.farm = Farm.objects.create(
+            farmer=make_user("rosa"), name="Rosa Farm",
+            latitude=Decimal("14.554729"), longitude=Decimal("121.024445"),
+        )
+        self.address = Address.objects.create(
+            user=make_user("carlo", "customer"), label="Home", line1="1 Rizal St", city="Manila",
+            province="Metro Manila", latitude=Decimal("14.5995"), longitude=Decimal("120.9842"),
+        )
+
+    def test_repeat_and_nearby_quotes_reuse_cached_route(self):
+        first = estimate_distance_and_fee(self.farm, self.address)
+        with self.assertNumQueries(0):
+            self.assertEqual(estimate_distance_and_fee(self.farm, self.address), first)
+
+        # ~10 m away falls in the same cache cell.
+        self.address.latitude = Decimal("14.5994")
+        self.assertEqual(estimate_distance_and_fee(self.farm, self.address), first)
+        self.assertEqual(self.router.provider.calls, 1)
+        self.assertEqual(RouteCache.objects.count(), 1)
+
+    def test_database_cache_survives_lru_eviction(self):
+        first = estimate_distance_and_fee(self.farm, self.address)
+        self.router.clear()
+        self.assertEqual(estimate_distance_and_fee(self.farm, self.address), first)
+        self.assertEqual(self.router.provider.calls, 1)
+
+    def test_cart_quotes_use_the_same_road_routes(self):
+        product = make_product(self.farm.farmer, "Kale", farm=self.farm)
+        single = estimate_distance_and_fee(self.farm, self.address)
+        quote = quote_products(self.address, [product.pk]).quotes[0]
+        self.assertEqual((quote.distance_km, quote.eta_minutes, quote.quoted_fee), single)
+        self.assertEqual(self.router.provider.calls, 1)
+
+    def test_fallback_routes_are_not_cached(self):
+        router = CachedRouter(OpenRouteServiceProvider(api_key="key"))
+        origin, destination = (14.554729, 121.024445), (14.5995, 120.9842)
+        with mock.patch("urllib.request.urlopen", side_effect=urllib.error.URLError("down")) as urlopen:
+            self.assertTrue(router.route(origin, destination).approximate)
+            self.assertTrue(router.route(origin, destination).approximate)
+        self.assertEqual(urlopen.call_count, 2)
+        self.assertFalse(RouteCache.objects.exists())
+
+
+class DeliveryFixtureMixin:
+    def setUp(self):
+        self.farmer = make_user("dante")
+        self.farm = Farm.objects.create(
+            farmer=self.farmer, name="Dante Farm", latitude=Decimal("14.5"), longitude=Decimal("121.0")
+        )
+        self.customer = make_user("ella", "customer")
+
+    def deliver(self, lat, lon, status=DeliveryRequest.Status.QUOTED):
+        address = Address.objects.create(
+            user=self.customer, label="Stop", line1="1 Main St", city="Manila", province="Metro Manila",
+            latitude=None if lat is None else Decimal(lat), longitude=None if lon is None else Decimal(lon),
+        )
+        return DeliveryRequest.objects.create(
+            customer=self.customer, farm=self.farm, pickup_address_text="Farm", dropoff_address=address,
+            distance_km=Decimal("1"), eta_minutes=1, quoted_fee=Decimal("60"), status=status,
+        )
+
+
+class DispatchRouteTests(DeliveryFixtureMixin, TestCase):
+    def test_stops_along_a_road_are_visited_in_order(self):
+        far = self.deliver("14.5", "121.3")
+        near = self.deliver("14.5", "121.1", status=DeliveryRequest.Status.ACCEPTED)
+        middle = self.deliver("14.5", "121.2")
+        self.deliver("14.5", "121.05", status=DeliveryRequest.Status.CANCELLED)
+        unpinned = self.deliver(None, None)
+
+        with self.assertNumQueries(1):
+            route = plan_farm_dispatch(self.farm)
+
+        self.assertEqual([s.delivery for s in route.stops], [near, middle, far])
+        self.assertEqual(route.unroutable, [unpinned])
+        self.assertEqual(route.total_km, sum((s.leg_km for s in route.stops), Decimal("0")))
+        etas = [s.eta_minutes for s in route.stops]
+        self.assertEqual(etas, sorted(etas))
+
+    def test_two_opt_never_worsens_nearest_neighbour(self):
+        rng = np.random.default_rng(7)
+        matrix = haversine_matrix(14.5 + rng.random(250) * 0.3, 121.0 + rng.random(250) * 0.3)
+        greedy = nearest_neighbour_tour(matrix)
+        improved = two_opt(greedy, matrix)
+
+        def cost(tour):
+            return matrix[tour[:-1], tour[1:]].sum()
+
+        self.assertEqual(improved[0], 0)
+        self.assertEqual(sorted(improved), list(range(250)))
+        self.assertLessEqual(cost(improved), cost(greedy))
+
+    def test_dispatch_view_is_farmer_only(self):
+        self.deliver("14.5", "121.1")
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse("delivery_dispatch")).status_code, 403)
+
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse("delivery_dispatch"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["route"].stops), 1)
+
+
+class ConsolidationTests(DeliveryFixtureMixin, TestCase):
+    def test_cluster_points_chains_neighbours_only(self):
+        lats = [14.60, 14.601, 14.602, 14.70, 14.90]
+        lons = [121.00, 121.00, 121.00, 121.00, 121.00]
+        self.assertEqual(
+            sorted(sorted(c) for c in cluster_points(lats, lons, radius_km=0.5)),
+            [[0, 1, 2]],
+        )
+
+    def test_split_fee_never_exceeds_standalone_quote(self):
+        shares = split_fee(Decimal("90"), [Decimal("100"), Decimal("60"), Decimal("20")])
+        self.assertEqual(shares, [Decimal("50"), Decimal("30"), Decimal("10")])
+
+    def test_split_fee_shares_add_up_to_the_total(self):
+        shares = split_fee(Decimal("100"), [Decimal("60"), Decimal("60"), Decimal("60")])
+        self.assertEqual(shares, [Decimal("34"), Decimal("33"), Decimal("33")])
+        shares = split_fee(Decimal("97"), [Decimal("45"), Decimal("35"), Decimal("25"), Decimal("15")])
+        self.assertEqual(sum(shares), Decimal("97"))
+
+    def test_split_fee_moves_capped_pesos_to_other_stops(self):
+        # The rounding peso would push the first stop past its 10.90 quote.
+        shares = split_fee(Decimal("40"), [Decimal("10.90"), Decimal("30")])
+        self.assertEqual(shares, [Decimal("10"), Decimal("30")])
+        # Only when every stop is capped do the shares fall short of the total.
+        shares = split_fee(Decimal("50"), [Decimal("20"), Decimal("10")])
+        self.assertEqual(shares, [Decimal("20"), Decimal("10")])
+
+    def test_nearby_requests_share_one_run(self):
+        neighbours = [self.deliver("14.6", lon) for lon in ("121.000", "121.002", "121.004")]
+        for delivery in neighbours:
+            delivery.distance_km, _eta, delivery.quoted_fee = estimate_distance_and_fee(
+                self.farm, delivery.dropoff_address
+            )
+            delivery.save()
+        loner = self.deliver("14.9", "121.4")
+        self.deliver("14.6", "121.001", status=DeliveryRequest.Status.CANCELLED)
+
+        runs = propose_runs(farms=[self.farm])
+
+        self.assertEqual(len(runs), 1)
+        run = ConsolidatedRun.objects.get()
+        self.assertEqual(set(run.deliveries.all()), set(neighbours))
+        self.assertLess(run.total_fee, run.standalone_fee)
+        for delivery in run.deliveries.all():
+            self.assertLessEqual(delivery.shared_fee, delivery.quoted_fee)
+        loner.refresh_from_db()
+        self.assertIsNone(loner.consolidated_run)
+
+        # Re-running leaves already consolidated requests alone.
+        self.assertEqual(propose_runs(farms=[self.farm]), [])
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        farmer = make_user("gina")
+        for name, location, price, payment in (
+            ("Kale", "Baguio", "20", "cash"),
+            ("Lettuce", "baguio ", "60", "gcash"),
+            ("Honey", "Cebu", "600", "bank"),
+            ("Kamote", "Cebu", "49.99", "cash"),
+            ("Hidden", "Cebu", "10", "cash"),
+        ):
+            make_product(
+                farmer, name, location=location, price=Decimal(price), mode_of_payment=payment,
+                is_approved=name != "Hidden",
+            )
+
+    def test_all_facets_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = compute_facets(Product.objects.filter(is_approved=True))
+
+        self.assertEqual([(b.label, b.count) for b in facets.location], [("Baguio", 2), ("Cebu", 2)])
+        self.assertEqual(
+            [(b.value, b.count) for b in facets.price], [("0-50", 2), ("50-100", 1), ("500-", 1)]
+        )
+        self.assertEqual(
+            {b.value: b.count for b in facets.payment}, {"cash": 2, "gcash": 1, "bank": 1}
+        )
+
+    def test_facets_are_cached_per_normalized_signature(self):
+        products = Product.objects.filter(is_approved=True)
+        first = cached_facets(products, "anon", "Kale ", "Baguio")
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_facets(products, "anon", "kale", " baguio"), first)
+
+    def test_payment_filter_narrows_listing_and_facets(self):
+        response = self.client.get(reverse("product_list"), {"payment": "cash"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([b.value for b in response.context["facets"].payment], ["cash"])
+        self.assertEqual(
+            sorted(p.product_name for p in response.context["products"]), ["Kale", "Kamote"]
+        )
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        get_index().invalidate()
+        self.farmer = make_user("hugo")
+        self.farm = Farm.objects.create(farmer=self.farmer, name="Sunny Acres", location="La Trinidad")
+        self.kale = make_product(self.farmer, "Curly Kale", location="Baguio", farm=self.farm)
+        make_product(self.farmer, "Kalamansi", location="Baguio", is_approved=False)
+
+    def labels(self, query):
+        return [(e.kind, e.label) for e in get_index().suggest(query)]
+
+    def test_prefix_matches_any_word_without_queries(self):
+        get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("kal"), [("product", "Curly Kale")])
+            self.assertEqual(self.labels("sun"), [("farm", "Sunny Acres")])
+            self.assertEqual(self.labels("trin"), [("location", "La Trinidad")])
+
+    def test_signals_patch_loaded_index_on_commit(self):
+        get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_product(self.farmer, "Kale Chips", location="Sagada")
+            self.kale.is_approved = False
+            self.kale.save()
+            self.assertEqual(self.labels("kale"), [("product", "Curly Kale")])
+        self.assertEqual(self.labels("kale"), [("product", "Kale Chips")])
+        self.assertEqual(self.labels("baguio"), [])
+        self.assertEqual(self.labels("sagada"), [("location", "Sagada")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.farm.delete()
+        self.assertEqual(self.labels("sunny"), [])
+
+    def test_signals_never_build_the_index(self):
+        with mock.patch.object(SuggestionIndex, "build") as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                make_product(self.farmer, "Kale Chips", location="Sagada")
+                self.farm.delete()
+        build.assert_not_called()
+
+    def test_suggest_endpoint(self):
+        response = self.client.get(reverse("product_suggest"), {"q": "curly"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["suggestions"],
+            [{"type": "product", "label": "Curly Kale", "url": reverse("product_detail", args=[self.kale.pk])}],
+        )
+
+
+class CatalogueApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user("ines")
+        self.farm = Farm.objects.create(farmer=self.farmer, name="Ines Farm", location="Tagaytay")
+        self.products = [make_product(self.farmer, f"Pineapple {i}", farm=self.farm) for i in range(3)]
+        make_product(self.farmer, "Pending", farm=self.farm, is_approved=False)
+
+    def test_sparse_fields_and_cursor_pages(self):
+        url = reverse("api_product_list")
+        first = self.client.get(url, {"fields": "id,name,farm", "limit": 2}).json()
+        self.assertEqual(
+            first["data"][0], {"id": self.products[2].pk, "name": "Pineapple 2", "farm": self.farm.slug}
+        )
+        self.assertIsNotNone(first["next"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([row["id"] for row in second["data"]], [self.products[0].pk])
+        self.assertIsNone(second["next"])
+
+        bad = self.client.get(url, {"fields": "id,secret"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_unchanged_catalogue_revalidates_from_the_version_row(self):
+        url = reverse("api_farm_detail", args=[self.farm.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["data"]["active_product_count"], 3)
+        etag = response["ETag"]
+
+        cache.clear()  # another worker: no shared cache state
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Review.objects.create(farm=self.farm, customer=make_user("kiko", "customer"), rating=1)
+            raise RuntimeError
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Review.objects.create(farm=self.farm, customer=make_user("jose", "customer"), rating=4)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        self.assertEqual(changed.json()["data"]["avg_rating"], 4.0)
+
+    def test_hidden_and_missing_objects_are_404(self):
+        hidden = Product.objects.get(product_name="Pending")
+        self.assertEqual(self.client.get(reverse("api_product_detail", args=[hidden.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api_farm_reviews", args=["nope"])).status_code, 404)
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user("karla")
+        self.farm = Farm.objects.create(farmer=self.farmer, name="Karla Farm")
+        self.product = make_product(self.farmer, "Ube", farm=self.farm)
+
+    def revalidate(self, url, response, **extra):
+        return self.client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_IF_MODIFIED_SINCE=response.get("Last-Modified", ""),
+            **extra,
+        )
+
+    def test_product_page_revalidates_until_product_changes(self):
+        url = reverse("product_detail", args=[self.product.pk])
+        first = self.client.get(url)
+        self.assertIn("Last-Modified", first)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        self.product.price = Decimal("12.00")
+        self.product.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_farm_page_rolls_up_reviews_and_products(self):
+        url = reverse("farm_detail", args=[self.farm.slug])
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        Review.objects.create(farm=self.farm, customer=make_user("lito", "customer"), rating=5)
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(self.revalidate(url, second).status_code, 304)
+
+        self.product.delete()
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_farm_page_shows_the_exact_product_count(self):
+        url = reverse("farm_detail", args=[self.farm.slug])
+        self.assertContains(self.client.get(url), ">1 item</span>")
+        make_product(self.farmer, "Gabi", farm=self.farm)
+        make_product(self.farmer, "Pending", farm=self.farm, is_approved=False)
+        self.assertContains(self.client.get(url), ">2 items</span>")
+
+    def test_etag_is_per_viewer_and_owner_is_never_conditional(self):
+        url = reverse("product_detail", args=[self.product.pk])
+        anonymous = self.client.get(url)
+
+        self.client.force_login(make_user("mina", "customer"))
+        self.assertEqual(self.revalidate(url, anonymous).status_code, 200)
+
+        self.client.force_login(self.farmer)
+        owner = self.client.get(url)
+        self.assertNotIn("ETag", owner)
+
+    def test_rotated_csrf_cookie_gets_a_fresh_page(self):
+        url = reverse("product_detail", args=[self.product.pk])
+        self.client.force_login(make_user("mina", "customer"))
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "a" * 32
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "b" * 32
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+
+class ProductImportTests(TestCase):
+    HEADER = "Name,Price,Qty,Location,Payment\n"
+
+    def setUp(self):
+        self.farmer = make_user("carmen")
+        self.farm = Farm.objects.create(farmer=self.farmer, name="Carmen Farm")
+
+    def upload(self, body: str, name: str = "listings.csv"):
+        return SimpleUploadedFile(name, (self.HEADER + body).encode(), content_type="text/csv")
+
+    def test_rows_are_created_in_batches_and_indexed(self):
+        rows = "".join(f"Squash {i},25.00,{i + 1},Benguet,Cash\n" for i in range(7))
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_products(self.farmer, self.upload(rows), "listings.csv", batch_size=3)
+
+        self.assertTrue(result.committed)
+        self.assertEqual(result.created, 7)
+        products = Product.objects.filter(farmer=self.farmer)
+        self.assertEqual(products.count(), 7)
+        self.assertEqual(set(products.values_list("farm_id", flat=True)), {self.farm.pk})
+        self.assertEqual(search_products(Product.objects.all(), "squash").count(), 7)
+        self.farm.refresh_from_db()
+        self.assertEqual(self.farm.active_product_count, 7)
+
+    def test_invalid_row_rolls_back_the_whole_file(self):
+        rows = "Squash,25.00,3,Benguet,Cash\n,abc,2,,\nOkra,10,1,,\n"
+        result = import_products(self.farmer, self.upload(rows), "listings.csv")
+
+        self.assertFalse(result.committed)
+        self.assertEqual(result.error_count, 1)
+        self.assertEqual(result.errors[0].line, 3)
+        self.assertTrue(any(m.startswith("price:") for m in result.errors[0].messages))
+        self.assertFalse(Product.objects.exists())
+
+    def test_partial_import_keeps_valid_rows(self):
+        rows = "Squash,25.00,3,Benguet,Cash\n,abc,2,,\nOkra,10,1,,\n"
+        result = import_products(self.farmer, self.upload(rows), "listings.csv", partial=True)
+
+        self.assertTrue(result.committed)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.error_count, 1)
+        self.assertEqual(
+            sorted(Product.objects.values_list("product_name", flat=True)), ["Okra", "Squash"]
+        )
+
+    def test_xlsx_rows_are_imported_with_numeric_cells_and_blank_rows(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["Name", "Price", "Qty", "Location", "Payment"])
+        sheet.append(["Squash", 25.5, 3, "Benguet", "GCash"])
+        sheet.append([None, None, None, None, None])
+        sheet.append(["Okra", 10, 1, None, None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile(
+            "listings.xlsx", buffer.getvalue(),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+        result = import_products(self.farmer, upload, "listings.xlsx")
+
+        self.assertTrue(result.committed)
+        self.assertEqual((result.rows, result.created), (2, 2))
+        squash = Product.objects.get(product_name="Squash")
+        self.assertEqual((squash.price, squash.quantity, squash.mode_of_payment), (Decimal("25.50"), 3, "gcash"))
+
+    def test_view_is_farmer_only_and_reports_results(self):
+        url = reverse("product_import")
+        self.client.force_login(make_user("dina", "customer"))
+        self.assertEqual(self.client.post(url, {"file": self.upload("Okra,10,1,,\n")}).status_code, 403)
+
+        self.client.force_login(self.farmer)
+        response = self.client.post(url, {"file": self.upload("Okra,10,1,,\n")})
+        self.assertContains(response, "Imported 1 of 1 row.")
+        self.assertTrue(Product.objects.filter(farmer=self.farmer, product_name="Okra").exists())
+
+        response = self.client.post(url, {"file": self.upload("Okra,10,1,,\n", "listings.pdf")})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Unsupported file type")
+
+
+class CsvExportTests(DeliveryFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(make_user("admin", is_staff=True))
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse("admin_export", args=[dataset]), params)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        return response, rows
+
+    def test_products_export_streams_every_row_with_admin_filters(self):
+        make_product(self.farmer, "Kale", is_approved=True)
+        make_product(self.farmer, "=HYPERLINK(1)", is_approved=True)
+        make_product(self.farmer, "Pending Corn", is_approved=False)
+
+        response, rows = self.export("products", is_approved__exact="1")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        self.assertEqual(rows[0], EXPORTS["products"].headers)
+        self.assertEqual([row[1] for row in rows[1:]], ["Kale", "'=HYPERLINK(1)"])
+
+    def test_deliveries_filter_by_status_farm_and_date(self):
+        self.deliver("14.6", "121.0", DeliveryRequest.Status.ACCEPTED)
+        self.deliver("14.6", "121.0", DeliveryRequest.Status.CANCELLED)
+
+        _, rows = self.export("deliveries", status__exact="accepted", farm__id__exact=self.farm.pk)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][-2], "accepted")
+        _, rows = self.export("deliveries", created_at__lt="2000-01-01")
+        self.assertEqual(len(rows), 1)
+
+    def test_rows_are_yielded_in_chunks(self):
+        for i in range(5):
+            make_product(self.farmer, f"Bean {i}")
+        spec = EXPORTS["products"]
+        chunks = list(stream_csv(spec, Product.objects.order_by("pk"), chunk_size=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sum(chunk.count("\n") for chunk in chunks), 6)
+
+    async def test_async_stream_matches_sync_stream(self):
+        for i in range(5):
+            await sync_to_async(make_product)(self.farmer, f"Bean {i}")
+        spec = EXPORTS["products"]
+        queryset = Product.objects.order_by("pk")
+        chunks = [chunk async for chunk in astream_csv(spec, queryset, chunk_size=2)]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks, await sync_to_async(list)(stream_csv(spec, queryset, chunk_size=2)))
+
+    def test_rejects_bad_filters_and_non_staff(self):
+        url = reverse("admin_export", args=["transactions"])
+        self.assertEqual(self.client.get(url, {"status__exact": "lost"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"q": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("admin_export", args=["users"])).status_code, 404)
+
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse("admin_export", args=["products"])).status_code, 302)
+
+
+class DashboardMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.farmer = make_user("rosa")
+        make_product(self.farmer, "Kale", location="Benguet")
+        make_product(self.farmer, "Okra", location="Benguet", is_approved=False)
+        reserved = make_product(self.farmer, "Corn", location="Iloilo", is_reserved=True)
+        Transaction.objects.create(product=reserved, buyer=make_user("lea", "customer"))
+
+    def test_counters_take_one_query_per_table(self):
+        with self.assertNumQueries(5):  # four tables plus the version stamps
+            metrics = compute_dashboard_metrics()
+        self.assertEqual(
+            [metrics[key] for key in ("total_products", "approved_products", "pending_products", "reserved_products")],
+            [3, 2, 1, 1],
+        )
+        self.assertEqual((metrics["total_users"], metrics["total_interests"]), (2, 1))
+        self.assertEqual(metrics["top_locations"][0], {"location": "Benguet", "c": 2})
+
+    def age_snapshot(self, **changes):
+        MetricsSnapshot.objects.update(computed_at=F("computed_at") - timedelta(minutes=2), **changes)
+
+    def test_snapshot_is_reused_until_stale_and_changed(self):
+        first = get_dashboard_metrics()
+        with self.assertNumQueries(1):  # the snapshot row
+            self.assertEqual(get_dashboard_metrics(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_product(self.farmer, "Squash")
+        # Too recent to rebuild, even though products changed.
+        self.assertEqual(get_dashboard_metrics()["total_products"], 3)
+
+        self.age_snapshot()
+        self.assertEqual(get_dashboard_metrics()["total_products"], 4)
+
+    def test_scheduled_refresh_is_what_requests_read(self):
+        call_command("refresh_dashboard_metrics", stdout=io.StringIO())
+        with self.assertNumQueries(1):
+            self.assertEqual(get_dashboard_metrics()["approved_products"], 2)
+
+    def test_stale_snapshot_is_rebuilt_by_one_request(self):
+        get_dashboard_metrics()
+        make_product(self.farmer, "Squash")
+        self.age_snapshot(refreshing_until=timezone.now() + timedelta(seconds=30))
+        # Another request holds the rebuild: keep serving the old numbers.
+        self.assertEqual(get_dashboard_metrics()["total_products"], 3)
+        self.assertIsNotNone(MetricsSnapshot.objects.get().refreshing_until)
+
+        MetricsSnapshot.objects.update(refreshing_until=None)
+        self.assertEqual(get_dashboard_metrics()["total_products"], 4)
+        self.assertIsNone(MetricsSnapshot.objects.get().refreshing_until)
+
+    def test_dashboard_shows_snapshot_age(self):
+        self.client.force_login(make_user("admin", is_staff=True))
+        response = self.client.get(reverse("admin_dashboard"))
+        self.assertContains(response, "Figures as of")
+        self.assertEqual(response.context["approved_products"], 2)
+
+
+class ActivityRollupTests(DeliveryFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.farm.location = "Benguet"
+        self.farm.save()
+        self.today = timezone.localdate()
+
+    def days_ago(self, obj, days, field="created_at"):
+        type(obj).objects.filter(pk=obj.pk).update(**{field: timezone.now() - timedelta(days=days)})
+
+    def counts(self, **filters):
+        rows = DailyActivity.objects.filter(**filters)
+        return {name: sum(getattr(row, name) for row in rows) for name in ROLLUP_COUNTERS}
+
+    def test_rollup_counts_every_source_per_farm_and_is_idempotent(self):
+        kale = make_product(self.farmer, "Kale", farm=self.farm, location="La Trinidad")
+        unlinked = make_product(self.farmer, "Okra")  # farm only reachable via the farmer
+        tx = Transaction.objects.create(product=kale, buyer=self.customer)
+        Transaction.objects.create(product=unlinked, buyer=self.customer, status="reserved", reserved_at=timezone.now())
+        self.deliver("14.6", "121.0")
+        conversation = Conversation.objects.create(farmer=self.farmer, customer=self.customer, product=kale)
+        Message.objects.create(conversation=conversation, sender=self.customer, body="Still available?")
+        self.days_ago(tx, 2)
+
+        run_rollup()
+        expected = {"new_listings": 2, "interests": 2, "reservations": 1, "delivery_quotes": 1, "messages": 1}
+        self.assertEqual(self.counts(farm=self.farm), expected)
+        self.assertEqual(self.counts(location="La Trinidad")["interests"], 1)
+        self.assertEqual(self.counts(day=self.today - timedelta(days=2))["interests"], 1)
+
+        run_rollup(since=self.today - timedelta(days=2))
+        self.assertEqual(self.counts(farm=self.farm), expected)
+        self.assertEqual(RollupWatermark.objects.get().complete_through, last_complete_day())
+
+    def test_incremental_run_skips_closed_days_until_backfilled(self):
+        old = make_product(self.farmer, "Kale", farm=self.farm)
+        self.days_ago(old, 5)
+        run_rollup()
+        self.assertEqual(self.counts()["new_listings"], 1)
+
+        late = make_product(self.farmer, "Corn", farm=self.farm)
+        self.days_ago(late, 4)
+        run_rollup()
+        self.assertEqual(self.counts()["new_listings"], 1)
+
+        run_rollup(since=self.today - timedelta(days=10))
+        self.assertEqual(self.counts()["new_listings"], 2)
+
+    def test_series_feeds_dashboard_charts(self):
+        make_product(self.farmer, "Kale", farm=self.farm)
+        run_rollup()
+        series = {entry["key"]: entry for entry in activity_series(7)}
+        self.assertEqual(len(series["new_listings"]["points"]), 7)
+        self.assertEqual(series["new_listings"]["points"][-1]["height"], 100)
+        self.assertEqual(series["messages"]["total"], 0)
+
+        self.client.force_login(make_user("admin", is_staff=True))
+        self.assertContains(self.client.get(reverse("admin_dashboard")), "New listings")
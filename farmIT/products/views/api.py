@@ -0,0 +1,212 @@
+"""Read-only JSON catalogue API (v1).
+
+Responses support `?fields=a,b` sparse fieldsets (only the needed columns are
+selected) and cursor pagination for lists (`?cursor=`, `?limit=`). Every
+response carries a strong ETag derived from the per-table version stamps in
+`products.versions` and the query string, so `If-None-Match` revalidation of
+an unchanged catalogue returns 304 after one lookup of the `TableVersion`
+rows, without running the listing queries.
+"""
+
+import hashlib
+import json
+
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from .. import versions
+from ..models import Farm, Product, Review
+from ..pagination import KeysetPaginator
+
+API_VERSION = "v1"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _field(*columns, get=None, related=None):
+    """Field spec: the columns to load, how to read the value, joins needed."""
+    return {"columns": columns, "get": get or (lambda obj: getattr(obj, columns[0])), "related": related}
+
+
+PRODUCT_FIELDS = {
+    "id": _field("id"),
+    "name": _field("product_name"),
+    "description": _field("description"),
+    "price": _field("price"),
+    "quantity": _field("quantity"),
+    "location": _field("location"),
+    "mode_of_payment": _field("mode_of_payment"),
+    "photo_url": _field("photo_url"),
+    "is_reserved": _field("is_reserved"),
+    "created_at": _field("created_at"),
+    "farm": _field(
+        "farm__slug",
+        get=lambda p: p.farm.slug if p.farm_id else None,
+        related="farm",
+    ),
+}
+
+FARM_FIELDS = {
+    "slug": _field("slug"),
+    "name": _field("name"),
+    "description": _field("description"),
+    "location": _field("location"),
+    "latitude": _field("latitude"),
+    "longitude": _field("longitude"),
+    "active_product_count": _field("active_product_count"),
+    "review_count": _field("review_count"),
+    "avg_rating": _field(
+        "rating_sum",
+        "review_count",
+        get=lambda f: round(f.avg_rating, 2) if f.avg_rating is not None else None,
+    ),
+    "created_at": _field("created_at"),
+}
+
+REVIEW_FIELDS = {
+    "id": _field("id"),
+    "rating": _field("rating"),
+    "comment": _field("comment"),
+    "customer": _field("customer__username", get=lambda r: r.customer.username, related="customer"),
+    "created_at": _field("created_at"),
+}
+
+# Versions each resource's representation depends on. Farms embed counters
+# that change with products and reviews.
+PRODUCT_TABLES = (versions.PRODUCTS, versions.FARMS)
+FARM_TABLES = (versions.FARMS, versions.PRODUCTS, versions.REVIEWS)
+REVIEW_TABLES = (versions.REVIEWS,)
+
+
+def _selected(request: HttpRequest, spec: dict) -> list[str]:
+    raw = request.GET.get("fields", "")
+    if not raw:
+        return list(spec)
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise FieldError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(spec)}.")
+    return names
+
+
+def _project(queryset, spec: dict, names: list[str], always=("id", "created_at")):
+    """Restrict `queryset` to the columns behind `names` (plus the cursor key)."""
+    columns = set(always)
+    related = set()
+    for name in names:
+        columns.update(spec[name]["columns"])
+        if spec[name]["related"]:
+            related.add(spec[name]["related"])
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def _serialize(obj, spec: dict, names: list[str]) -> dict:
+    return {name: spec[name]["get"](obj) for name in names}
+
+
+def _not_found() -> JsonResponse:
+    return JsonResponse({"error": "Not found."}, status=404)
+
+
+def _limit(request: HttpRequest) -> int:
+    try:
+        return min(max(int(request.GET.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+def _page_link(request: HttpRequest, cursor: str | None) -> str | None:
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+def _list_response(request: HttpRequest, queryset, spec: dict) -> JsonResponse:
+    try:
+        names = _selected(request, spec)
+    except FieldError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    page = KeysetPaginator(_project(queryset, spec, names), _limit(request)).page(request.GET.get("cursor"))
+    return JsonResponse(
+        {
+            "data": [_serialize(obj, spec, names) for obj in page],
+            "next": _page_link(request, page.next_cursor),
+            "previous": _page_link(request, page.previous_cursor),
+        }
+    )
+
+
+def _detail_response(request: HttpRequest, queryset, spec: dict, **lookup) -> JsonResponse:
+    try:
+        names = _selected(request, spec)
+    except FieldError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    obj = _project(queryset, spec, names).filter(**lookup).first()
+    if obj is None:
+        return _not_found()
+    return JsonResponse({"data": _serialize(obj, spec, names)})
+
+
+def _etag(*tables: str):
+    """ETag function over the table stamps, the path and the query string."""
+
+    def etag_func(request: HttpRequest, *args, **kwargs) -> str:
+        payload = json.dumps(
+            [API_VERSION, request.path, sorted(request.GET.lists()), versions.get_versions(*tables)],
+            separators=(",", ":"),
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    return etag_func
+
+
+def _api(tables):
+    """GET-only, ETag-conditional JSON view."""
+
+    def decorator(view):
+        return require_GET(condition(etag_func=_etag(*tables))(view))
+
+    return decorator
+
+
+@_api(PRODUCT_TABLES)
+def api_product_list(request: HttpRequest) -> JsonResponse:
+    products = Product.objects.filter(is_approved=True)
+    farm = request.GET.get("farm")
+    if farm:
+        products = products.filter(farm__slug=farm)
+    location = request.GET.get("location", "").strip()
+    if location:
+        products = products.filter(location__icontains=location)
+    return _list_response(request, products, PRODUCT_FIELDS)
+
+
+@_api(PRODUCT_TABLES)
+def api_product_detail(request: HttpRequest, pk: int) -> JsonResponse:
+    return _detail_response(request, Product.objects.filter(is_approved=True), PRODUCT_FIELDS, pk=pk)
+
+
+@_api(FARM_TABLES)
+def api_farm_list(request: HttpRequest) -> JsonResponse:
+    return _list_response(request, Farm.objects.exclude(slug=""), FARM_FIELDS)
+
+
+@_api(FARM_TABLES)
+def api_farm_detail(request: HttpRequest, slug: str) -> JsonResponse:
+    return _detail_response(request, Farm.objects.all(), FARM_FIELDS, slug=slug)
+
+
+@_api(REVIEW_TABLES)
+def api_farm_reviews(request: HttpRequest, slug: str) -> JsonResponse:
+    farm_id = Farm.objects.filter(slug=slug).values_list("pk", flat=True).first()
+    if farm_id is None:
+        return _not_found()
+    return _list_response(request, Review.objects.filter(farm_id=farm_id), REVIEW_FIELDS)
@@ -1,10 +1,15 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.http import condition
 
+from ..conditional import farm_etag, farm_last_modified, touch_farms
 from ..forms import FarmForm, ReviewForm
 from ..models import Farm, Product, Review
+from ..pagination import KeysetPaginator
+from ..stats import rebuild_farm_stats
+from ..versions import PRODUCTS, bump
 
 
 @login_required
@@ -21,7 +26,12 @@ def my_farm(request: HttpRequest) -> HttpResponse:
         },
     )
 
-    Product.objects.filter(farmer=request.user, farm__isnull=True).update(farm=farm)
+    orphans = Product.objects.filter(farmer=request.user, farm__isnull=True)
+    if orphans.update(farm=farm, updated_at=timezone.now()):
+        # Bulk update bypasses the per-product signals; recount this farm.
+        rebuild_farm_stats(Farm.objects.filter(pk=farm.pk))
+        touch_farms(farm.pk)
+        bump(PRODUCTS)
 
     if request.method == "POST":
         form = FarmForm(request.POST, instance=farm)
@@ -31,7 +41,8 @@ def my_farm(request: HttpRequest) -> HttpResponse:
     else:
         form = FarmForm(instance=farm)
 
-    products = Product.objects.filter(farmer=request.user).order_by("-created_at")
+    paginator = KeysetPaginator(Product.objects.filter(farmer=request.user), 12)
+    products = paginator.page(request.GET.get("cursor"))
 
     return render(
         request,
@@ -44,6 +55,7 @@ def my_farm(request: HttpRequest) -> HttpResponse:
     )
 
 
+@condition(etag_func=farm_etag, last_modified_func=farm_last_modified)
 def farm_detail(request: HttpRequest, slug: str) -> HttpResponse:
     """Public-facing farm page with its approved products and reviews."""
     farm = get_object_or_404(Farm, slug=slug)
@@ -56,12 +68,10 @@ def farm_detail(request: HttpRequest, slug: str) -> HttpResponse:
         "photo_url",
         "created_at",
     )
+    # The total shown is `farm.active_product_count`, kept exact by signals.
+    products = KeysetPaginator(products, 12).page(request.GET.get("cursor"))
 
     reviews_qs = Review.objects.filter(farm=farm).select_related("customer")
-    aggregates = reviews_qs.aggregate(
-        avg_rating=Avg("rating"),
-        review_count=Count("id"),
-    )
 
     review_form = None
     if request.user.is_authenticated and getattr(request.user, "is_customer", False):
@@ -75,8 +85,8 @@ def farm_detail(request: HttpRequest, slug: str) -> HttpResponse:
             "farm": farm,
             "products": products,
             "reviews": reviews_qs,
-            "avg_rating": aggregates["avg_rating"],
-            "review_count": aggregates["review_count"],
+            "avg_rating": farm.avg_rating,
+            "review_count": farm.review_count,
             "review_form": review_form,
         },
     )
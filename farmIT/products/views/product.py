@@ -2,13 +2,31 @@ from django.contrib.admin.views.decorators import staff_member_required  # noqa:
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.views.decorators.cache import cache_page
-from django.db.models import Avg, Count, Prefetch, Q
-from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import condition
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
 
-from ..forms import ProductForm
+from ..conditional import product_etag, product_last_modified
+from ..facets import cached_facets
+from ..forms import ProductForm, ProductImportUploadForm
+from ..importer import ImportFormatError, import_products
 from ..models import Farm, Product, Transaction
+from ..nearby import RADIUS_CHOICES_KM, annotate_distance, default_origin
+from ..pagination import KeysetPaginator, filter_signature
+from ..prefetch import prefetch_top_n
+from ..search import search_products
 from ..storage import upload_product_image
+from ..suggest import FARM, PRODUCT, get_index
+
+HIGHLIGHT_PRODUCTS_PER_FARM = 4
+MAX_SUGGESTIONS = 10
+MAX_IMPORT_ROWS = 20_000
+MAX_IMPORT_BYTES = 10 * 1024 * 1024
 
 
 @cache_page(30)
@@ -17,6 +35,8 @@ def product_list(request: HttpRequest) -> HttpResponse:
     location = request.GET.get('location', '').strip()
     min_price = request.GET.get('min_price', '').strip()
     max_price = request.GET.get('max_price', '').strip()
+    radius = request.GET.get('radius', '').strip()
+    payment = request.GET.get('payment', '').strip()
     page_number = request.GET.get('page', 1)
 
     # Start from all products, then apply visibility rules.
@@ -29,9 +49,8 @@ def product_list(request: HttpRequest) -> HttpResponse:
     # Staff users see all
 
     if query:
-        products = products.filter(
-            Q(product_name__icontains=query) | Q(description__icontains=query)
-        )
+        # Indexed full-text search, ordered by relevance.
+        products = search_products(products, query)
     if location:
         products = products.filter(location__icontains=location)
     if min_price:
@@ -44,28 +63,71 @@ def product_list(request: HttpRequest) -> HttpResponse:
             products = products.filter(price__lte=float(max_price))
         except ValueError:
             pass
+    if payment in dict(Product.MODE_OF_PAYMENT_CHOICES):
+        products = products.filter(mode_of_payment=payment)
+    else:
+        payment = ''
 
-    paginator = Paginator(products, 12)
-    try:
-        products_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        products_page = paginator.page(1)
-    except EmptyPage:
-        products_page = paginator.page(paginator.num_pages)
+    near_error = None
+    by_distance = False
+    near = ""
+    if radius:
+        origin = default_origin(request.user)
+        try:
+            radius_km = min(float(radius), float(max(RADIUS_CHOICES_KM)))
+        except ValueError:
+            radius_km = None
+        if origin is None:
+            near_error = "Set a default address with map coordinates to search near you."
+        elif radius_km and radius_km > 0:
+            products = annotate_distance(
+                products, float(origin.latitude), float(origin.longitude), radius_km
+            )
+            by_distance = True
+            near = f"{origin.latitude},{origin.longitude}"
 
+    if not request.user.is_authenticated:
+        scope = "anon"
+    elif getattr(request.user, "is_staff", False):
+        scope = "staff"
+    else:
+        scope = f"user:{request.user.pk}"
+    # Every facet bucket comes from one grouped query over the filtered set.
+    # Staff share a scope, so a radius search also keys on its origin.
+    facets = cached_facets(products, scope, query, location, min_price, max_price, payment, radius, near)
+
+    if query or by_distance:
+        # Relevance- or distance-ranked results are bounded by the match set,
+        # so numbered pages stay cheap and keep their ranking order.
+        paginator = Paginator(products, 12)
+        try:
+            products_page = paginator.page(page_number)
+        except PageNotAnInteger:
+            products_page = paginator.page(1)
+        except EmptyPage:
+            products_page = paginator.page(paginator.num_pages)
+    else:
+        # Browsing uses keyset pagination: no COUNT(*) per view and no OFFSET
+        # scans on deep pages. The total shown is a cached approximation.
+        paginator = KeysetPaginator(
+            products,
+            12,
+            count_cache_key=f"products:{filter_signature(scope, location, min_price, max_price, payment)}",
+        )
+        products_page = paginator.page(request.GET.get('cursor'))
+
+    # Ranking reads the maintained counters on Farm instead of aggregating joins.
     highlight_farms = (
-        Farm.objects.filter(products__is_approved=True)
+        Farm.objects.filter(active_product_count__gt=0)
         .exclude(slug="")
-        .annotate(
-            active_products=Count("products", distinct=True),
-            review_count=Count("reviews", distinct=True),
-            avg_rating=Avg("reviews__rating"),
-        )
-        .order_by("-active_products", "name")
+        .order_by("-active_product_count", "name")
         .prefetch_related(
-            Prefetch(
+            # The carousel shows a handful of names per farm; cap the rows loaded.
+            prefetch_top_n(
                 "products",
-                queryset=Product.objects.filter(is_approved=True).order_by("-created_at"),
+                Product.objects.filter(is_approved=True).only("id", "farm_id", "product_name", "created_at"),
+                partition_by="farm",
+                n=HIGHLIGHT_PRODUCTS_PER_FARM,
                 to_attr="top_products",
             )
         )[:8]
@@ -76,15 +138,45 @@ def product_list(request: HttpRequest) -> HttpResponse:
         'products/product_list.html',
         {
             'products': products_page,
+            'keyset': not (query or by_distance),
             'query': query,
             'location': location,
             'min_price': min_price,
             'max_price': max_price,
+            'radius': radius,
+            'payment': payment,
+            'facets': facets,
+            'radius_choices': RADIUS_CHOICES_KM,
+            'near_error': near_error,
             'highlight_farms': highlight_farms,
         },
     )
 
 
+def product_suggest(request: HttpRequest) -> JsonResponse:
+    """Typeahead for the marketplace search box, served from the in-process index."""
+    query = request.GET.get('q', '')[:100]
+    try:
+        limit = min(max(int(request.GET.get('limit', MAX_SUGGESTIONS)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        limit = MAX_SUGGESTIONS
+
+    suggestions = []
+    for entry in get_index().suggest(query, limit=limit):
+        if entry.kind == PRODUCT:
+            url = reverse('product_detail', kwargs={'pk': int(entry.ref)})
+        elif entry.kind == FARM:
+            url = reverse('farm_detail', kwargs={'slug': entry.ref})
+        else:
+            url = f"{reverse('product_list')}?{urlencode({'location': entry.ref})}"
+        suggestions.append({'type': entry.kind, 'label': entry.label, 'url': url})
+
+    response = JsonResponse({'query': query, 'suggestions': suggestions})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@condition(etag_func=product_etag, last_modified_func=product_last_modified)
 def product_detail(request: HttpRequest, pk: int) -> HttpResponse:
     product = get_object_or_404(
         Product.objects.select_related("farmer", "farm"),
@@ -137,6 +229,36 @@ def product_create(request: HttpRequest) -> HttpResponse:
     return render(request, 'products/product_form.html', {'form': form})
 
 
+@login_required
+def product_import(request: HttpRequest) -> HttpResponse:
+    """Create many listings at once from a CSV or Excel upload."""
+    if not getattr(request.user, "is_farmer", False):
+        return HttpResponseForbidden("Only farmer accounts can import product listings.")
+
+    result = None
+    if request.method == 'POST':
+        form = ProductImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            if upload.size > MAX_IMPORT_BYTES:
+                form.add_error("file", "Files are limited to 10 MB.")
+            else:
+                try:
+                    result = import_products(
+                        request.user,
+                        upload,
+                        upload.name,
+                        partial=form.cleaned_data["partial"],
+                        max_rows=MAX_IMPORT_ROWS,
+                    )
+                except ImportFormatError as exc:
+                    form.add_error("file", str(exc))
+    else:
+        form = ProductImportUploadForm()
+
+    return render(request, 'products/product_import.html', {'form': form, 'result': result})
+
+
 @login_required
 def product_update(request: HttpRequest, pk: int) -> HttpResponse:
     if not getattr(request.user, "is_farmer", False):
@@ -198,7 +320,8 @@ def reserve_transaction(request: HttpRequest, tx_id: int) -> HttpResponse:
     product.reserved_by = tx.buyer
     product.save(update_fields=['is_reserved', 'reserved_by'])
     tx.status = 'reserved'
-    tx.save(update_fields=['status'])
+    tx.reserved_at = timezone.now()
+    tx.save(update_fields=['status', 'reserved_at'])
     return redirect('product_detail', pk=product.pk)
 
 
@@ -0,0 +1,269 @@
+"""Where rate-limit state lives (`settings.RATE_LIMIT_BACKEND`, a dotted path).
+
+Every backend applies a whole batch of limits atomically:
+
+* `LocMemBackend` — a process-local dict behind one lock. The default; per
+  process, like the `LocMemCache` the old fixed-window throttle relied on.
+* `DatabaseBackend` — `RateLimitState` rows, locked with `SELECT ... FOR
+  UPDATE` and written back with one upsert. Missing rows are inserted
+  (expired, so they read as empty) first, since only existing rows lock.
+  Shared by every worker without extra infrastructure. Purge old rows with
+  `purge_ratelimit_state`.
+* `RedisBackend` — one Lua script call per batch (`EVALSHA`), so the check
+  is atomic on the server and costs a single round trip. Needs the `redis`
+  package and `RATE_LIMIT_REDIS_URL`; without a URL it runs against
+  `LocalRedis`, an in-process stand-in for development and tests that
+  executes the Python algorithms in place of the script.
+"""
+
+import math
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .engine import Decision, Limit, evaluate
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover - optional dependency guard
+    redis = None  # type: ignore
+
+
+class Backend:
+    def apply(self, limits: list[Limit], now: float) -> list[Decision]:
+        raise NotImplementedError
+
+
+class LocMemBackend(Backend):
+    sweep_every = 1000  # calls between removals of expired keys
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, object]] = {}
+        self._calls = 0
+
+    def apply(self, limits, now):
+        with self._lock:
+            states = [self._state(limit.key, now) for limit in limits]
+            decisions, new_states = evaluate(limits, states, now)
+            if new_states is not None:
+                for limit, state in zip(limits, new_states):
+                    self._entries[limit.key] = (now + limit.ttl, state)
+            self._calls += 1
+            if self._calls % self.sweep_every == 0:
+                self._entries = {
+                    key: entry for key, entry in self._entries.items() if entry[0] > now
+                }
+        return decisions
+
+    def _state(self, key: str, now: float):
+        entry = self._entries.get(key)
+        return entry[1] if entry and entry[0] > now else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DatabaseBackend(Backend):
+    def apply(self, limits, now):
+        from .models import RateLimitState
+
+        moment = datetime.fromtimestamp(now, tz=dt_timezone.utc)
+        keys = [limit.key for limit in limits]
+        with transaction.atomic():
+            # FOR UPDATE cannot lock a row that does not exist yet: without
+            # these, two first requests for a key would both read it as empty.
+            RateLimitState.objects.bulk_create(
+                [RateLimitState(key=key, state=[], expires_at=moment) for key in keys],
+                ignore_conflicts=True,
+            )
+            locked = RateLimitState.objects.select_for_update().filter(key__in=keys)
+            rows = {row.key: row for row in locked}
+            states = [
+                row.state if row is not None and row.expires_at > moment else None
+                for row in map(rows.get, keys)
+            ]
+            decisions, new_states = evaluate(limits, states, now)
+            if new_states is not None:
+                RateLimitState.objects.bulk_create(
+                    [
+                        RateLimitState(
+                            key=limit.key,
+                            state=state,
+                            expires_at=moment + timedelta(seconds=limit.ttl),
+                        )
+                        for limit, state in zip(limits, new_states)
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["key"],
+                    update_fields=["state", "expires_at"],
+                )
+        return decisions
+
+    def purge_expired(self) -> int:
+        from .models import RateLimitState
+
+        expired = RateLimitState.objects.filter(expires_at__lte=timezone.now())
+        deleted, _ = expired.delete()
+        return deleted
+
+
+# KEYS: one per limit. ARGV: now, then (algorithm, limit, window, capacity) per
+# limit. Returns (allowed, remaining, reset_ms, retry_ms) per limit. Mirrors
+# `engine.evaluate`, including writing nothing unless every limit allows.
+CHECK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local results, writes = {}, {}
+local all_allowed = true
+for i, key in ipairs(KEYS) do
+  local base = 2 + (i - 1) * 4
+  local algorithm = ARGV[base]
+  local limit = tonumber(ARGV[base + 1])
+  local window = tonumber(ARGV[base + 2])
+  local capacity = tonumber(ARGV[base + 3])
+  local allowed, remaining, reset, retry
+  if algorithm == 'token_bucket' then
+    local rate = limit / window
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    allowed = tokens >= 1
+    if allowed then tokens = tokens - 1 end
+    remaining = math.floor(tokens)
+    reset = (capacity - tokens) / rate
+    if allowed then retry = 0 else retry = (1 - tokens) / rate end
+    writes[i] = {'bucket', tokens, capacity / rate}
+  else
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    local newest
+    allowed = count < limit
+    if allowed then
+      count = count + 1
+      newest = now
+      retry = 0
+      writes[i] = {'log', count, window}
+    else
+      local oldest = count - limit
+      local freeing = redis.call('ZRANGE', key, oldest, oldest, 'WITHSCORES')
+      retry = tonumber(freeing[2]) + window - now
+      newest = tonumber(redis.call('ZRANGE', key, -1, -1, 'WITHSCORES')[2])
+    end
+    remaining = math.max(0, limit - count)
+    reset = newest + window - now
+  end
+  all_allowed = all_allowed and allowed
+  results[i] = {allowed, limit, remaining, reset, retry}
+end
+if all_allowed then
+  for i, key in ipairs(KEYS) do
+    local w = writes[i]
+    if w[1] == 'bucket' then
+      redis.call('HSET', key, 'tokens', w[2], 'updated', now)
+      redis.call('PEXPIRE', key, math.ceil(w[3] * 1000))
+    else
+      redis.call('ZADD', key, now, now .. ':' .. w[2])
+      redis.call('PEXPIRE', key, math.ceil(w[3] * 1000))
+    end
+  end
+end
+local out = {}
+for _, r in ipairs(results) do
+  local remaining = r[3]
+  if r[1] and not all_allowed then remaining = math.min(r[2], remaining + 1) end
+  table.insert(out, r[1] and 1 or 0)
+  table.insert(out, remaining)
+  table.insert(out, math.ceil(r[4] * 1000))
+  table.insert(out, math.ceil(r[5] * 1000))
+end
+return out
+"""
+
+
+class _LocalScript:
+    def __init__(self, backend: LocMemBackend):
+        self.backend = backend
+
+    def __call__(self, keys=(), args=(), client=None):
+        now = float(args[0])
+        specs = [args[1 + 4 * i : 5 + 4 * i] for i in range(len(keys))]
+        limits = [
+            Limit(key, int(limit), float(window), algorithm, int(capacity))
+            for key, (algorithm, limit, window, capacity) in zip(keys, specs)
+        ]
+        encoded = []
+        for decision in self.backend.apply(limits, now):
+            encoded += [
+                int(decision.allowed),
+                decision.remaining,
+                math.ceil(decision.reset_seconds * 1000),
+                math.ceil(decision.retry_after * 1000),
+            ]
+        return encoded
+
+
+class LocalRedis:
+    """The slice of the redis-py client `RedisBackend` uses, kept in process."""
+
+    def __init__(self):
+        self.backend = LocMemBackend()
+
+    def register_script(self, source: str) -> _LocalScript:
+        return _LocalScript(self.backend)
+
+
+class RedisBackend(Backend):
+    prefix = "ratelimit:"
+
+    def __init__(self, client=None):
+        if client is None:
+            url = getattr(settings, "RATE_LIMIT_REDIS_URL", "")
+            if not url:
+                client = LocalRedis()
+            elif redis is None:
+                raise ImproperlyConfigured(
+                    "RedisBackend needs the redis package (pip install redis)."
+                )
+            else:
+                client = redis.Redis.from_url(url)
+        self.client = client
+        self._script = client.register_script(CHECK_SCRIPT)
+
+    def apply(self, limits, now):
+        args = [repr(now)]
+        for limit in limits:
+            args += [limit.algorithm, limit.limit, limit.window_seconds, limit.capacity]
+        keys = [self.prefix + limit.key for limit in limits]
+        raw = self._script(keys=keys, args=args)
+        return [
+            Decision(
+                allowed=bool(raw[4 * i]),
+                limit=limit.limit,
+                remaining=int(raw[4 * i + 1]),
+                reset_seconds=int(raw[4 * i + 2]) / 1000,
+                retry_after=int(raw[4 * i + 3]) / 1000,
+            )
+            for i, limit in enumerate(limits)
+        ]
+
+
+_backend: Backend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Backend:
+    """Process-wide backend for `settings.RATE_LIMIT_BACKEND`."""
+    global _backend
+    path = getattr(settings, "RATE_LIMIT_BACKEND", "")
+    path = path or "ratelimit.backends.LocMemBackend"
+    with _backend_lock:
+        if _backend is None or _backend.__class__ is not import_string(path):
+            _backend = import_string(path)()
+        return _backend
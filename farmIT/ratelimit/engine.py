@@ -0,0 +1,125 @@
+"""Rate-limit algorithms and the public checking API.
+
+A `Limit` names a key, how many requests it allows per `window_seconds`,
+and the algorithm:
+
+* `SLIDING_WINDOW` — a log of request times over the trailing window. Exact:
+  never more than `limit` requests in any `window_seconds`, so there is no
+  double burst at fixed-window edges. Stores up to `limit` timestamps.
+* `TOKEN_BUCKET` — refills at `limit / window_seconds` per second up to
+  `burst` (default `limit`). Constant-size state; lets short bursts through
+  while holding the sustained rate.
+
+`check_many()` evaluates several limits in one backend call (one lock, one
+transaction or one Redis round trip) and is all-or-nothing: a request is
+only counted against its limits if every one of them allows it.
+
+Algorithms are pure functions over a small JSON-able state so every backend
+(`ratelimit.backends`) applies exactly the same rules.
+"""
+
+import math
+import time
+from dataclasses import dataclass, replace
+
+SLIDING_WINDOW = "sliding_window"
+TOKEN_BUCKET = "token_bucket"
+
+
+@dataclass(frozen=True)
+class Limit:
+    key: str
+    limit: int
+    window_seconds: float
+    algorithm: str = SLIDING_WINDOW
+    burst: int | None = None
+
+    @property
+    def capacity(self) -> int:
+        return self.burst or self.limit
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window_seconds
+
+    @property
+    def ttl(self) -> float:
+        """How long state must be kept before it no longer matters."""
+        if self.algorithm == TOKEN_BUCKET:
+            return self.capacity / self.rate
+        return self.window_seconds
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: float  # until the limit is fully available again
+    retry_after: float = 0.0  # until the next request would be allowed
+
+    @property
+    def reset(self) -> int:
+        return math.ceil(self.reset_seconds)
+
+
+def _sliding_window(limit: Limit, state, now: float):
+    start = now - limit.window_seconds
+    log = [t for t in (state or ()) if t > start]
+    allowed = len(log) < limit.limit
+    if allowed:
+        log.append(now)
+        retry_after = 0.0
+    else:
+        # The entry whose expiry frees a slot.
+        retry_after = log[len(log) - limit.limit] + limit.window_seconds - now
+    reset = log[-1] + limit.window_seconds - now if log else 0.0
+    return log, Decision(allowed, limit.limit, max(0, limit.limit - len(log)), reset, retry_after)
+
+
+def _token_bucket(limit: Limit, state, now: float):
+    tokens, updated = state if state else (limit.capacity, now)
+    tokens = min(limit.capacity, tokens + max(0.0, now - updated) * limit.rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    retry_after = 0.0 if allowed else (1 - tokens) / limit.rate
+    reset = (limit.capacity - tokens) / limit.rate
+    return [tokens, now], Decision(allowed, limit.limit, math.floor(tokens), reset, retry_after)
+
+
+ALGORITHMS = {
+    SLIDING_WINDOW: _sliding_window,
+    TOKEN_BUCKET: _token_bucket,
+}
+
+
+def evaluate(limits, states, now: float):
+    """Apply `limits` to their current `states`.
+
+    Returns `(decisions, new_states)`; `new_states` is `None` when any limit
+    denies, meaning nothing should be written.
+    """
+    results = [ALGORITHMS[limit.algorithm](limit, state, now) for limit, state in zip(limits, states)]
+    decisions = [decision for _state, decision in results]
+    if all(decision.allowed for decision in decisions):
+        return decisions, [state for state, _decision in results]
+    # Denied as a whole: the limits that passed were not charged either.
+    return [
+        replace(decision, remaining=min(decision.limit, decision.remaining + 1)) if decision.allowed else decision
+        for decision in decisions
+    ], None
+
+
+def check_many(limits) -> list[Decision]:
+    """Count one request against every limit, or against none if any denies."""
+    from .backends import get_backend
+
+    limits = list(limits)
+    if not limits:
+        return []
+    return get_backend().apply(limits, time.time())
+
+
+def check(limit: Limit) -> Decision:
+    return check_many([limit])[0]
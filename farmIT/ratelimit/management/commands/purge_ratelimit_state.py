@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ratelimit.backends import DatabaseBackend
+
+
+class Command(BaseCommand):
+    help = "Delete expired rows left by the database rate-limit backend (run from cron)."
+
+    def handle(self, *args, **options):
+        deleted = DatabaseBackend().purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired rate-limit entries."))
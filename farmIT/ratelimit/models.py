@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class RateLimitState(models.Model):
+    """Algorithm state for one rate-limit key (`ratelimit.backends.DatabaseBackend`)."""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    state = models.JSONField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:  # pragma: no cover - simple representation
+        return self.key
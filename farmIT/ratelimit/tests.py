@@ -0,0 +1,323 @@
+import os
+import tempfile
+import threading
+import uuid
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils.functional import SimpleLazyObject
+
+from farmIT.middleware import RateLimitMiddleware, StaticFilesMiddleware
+
+from .backends import DatabaseBackend, LocMemBackend, RedisBackend, get_backend, redis
+from .engine import SLIDING_WINDOW, TOKEN_BUCKET, Limit, check_many
+from .models import RateLimitState
+from .policies import IP, Policy, PolicyRegistry
+
+try:
+    import fakeredis  # type: ignore
+except Exception:  # pragma: no cover - optional dependency guard
+    fakeredis = None  # type: ignore
+
+
+def lua_redis():
+    """A client that runs Lua: `RATE_LIMIT_REDIS_URL`, else fakeredis with lupa."""
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if url and redis is not None:
+        client = redis.Redis.from_url(url)
+    elif fakeredis is not None:
+        client = fakeredis.FakeRedis()
+    else:
+        return None
+    try:
+        client.eval("return 1", 0)
+    except Exception:
+        return None
+    return client
+
+
+class AlgorithmTests(TestCase):
+    def setUp(self):
+        self.backend = LocMemBackend()
+
+    def allowed(self, limit, now):
+        return self.backend.apply([limit], now)[0].allowed
+
+    def test_sliding_window_has_no_burst_at_window_edges(self):
+        limit = Limit("ip", 3, 60, SLIDING_WINDOW)
+        self.assertEqual([self.allowed(limit, t) for t in (50, 55, 59)], [True] * 3)
+        # A fixed window would reset at t=60 and allow three more here.
+        self.assertFalse(self.allowed(limit, 61))
+        decision = self.backend.apply([limit], 62)[0]
+        self.assertEqual((decision.remaining, decision.retry_after), (0, 48))
+        self.assertTrue(self.allowed(limit, 110.5))
+
+    def test_token_bucket_bursts_then_holds_the_rate(self):
+        limit = Limit("ip", 60, 60, TOKEN_BUCKET, burst=5)
+        self.assertEqual([self.allowed(limit, 0) for _ in range(6)], [True] * 5 + [False])
+        self.assertFalse(self.allowed(limit, 0.5))
+        self.assertTrue(self.allowed(limit, 1.0))
+        decision = self.backend.apply([limit], 1.0)[0]
+        self.assertFalse(decision.allowed)
+        self.assertAlmostEqual(decision.retry_after, 1.0)
+
+    def test_batch_is_all_or_nothing(self):
+        user = Limit("user", 5, 60)
+        route = Limit("route", 1, 60)
+        self.assertTrue(all(d.allowed for d in self.backend.apply([user, route], 0)))
+
+        user_decision, route_decision = self.backend.apply([user, route], 1)
+        self.assertTrue(user_decision.allowed)
+        self.assertFalse(route_decision.allowed)
+        # The denied batch was not charged to the user limit.
+        self.assertEqual(self.backend.apply([user], 2)[0].remaining, 3)
+
+    def test_concurrent_checks_never_exceed_the_limit(self):
+        limit = Limit("hot", 50, 60)
+        results = []
+
+        def hammer():
+            for _ in range(20):
+                results.append(self.allowed(limit, 0))
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 50)
+
+
+class BackendParityTests(TestCase):
+    SCRIPT = [0, 1, 2, 3, 30, 61, 62, 121]
+
+    def run_script(self, backend):
+        limits = [Limit("a", 3, 60, SLIDING_WINDOW), Limit("b", 4, 60, TOKEN_BUCKET, burst=3)]
+        return [
+            [(d.allowed, d.remaining, round(d.reset_seconds, 3), round(d.retry_after, 3)) for d in backend.apply(limits, now)]
+            for now in self.SCRIPT
+        ]
+
+    def test_backends_agree(self):
+        expected = self.run_script(LocMemBackend())
+        self.assertEqual(self.run_script(DatabaseBackend()), expected)
+        # LocalRedis runs the Python algorithms: this covers the encoding only.
+        self.assertEqual(self.run_script(RedisBackend()), expected)
+
+    def test_lua_script_matches_the_python_algorithms(self):
+        client = lua_redis()
+        if client is None:
+            self.skipTest("needs RATE_LIMIT_REDIS_URL or fakeredis[lua]")
+        backend = RedisBackend(client)
+        backend.prefix = f"ratelimit-test-{uuid.uuid4().hex}:"
+        try:
+            self.assertEqual(self.run_script(backend), self.run_script(LocMemBackend()))
+            # A denied batch charges none of its limits.
+            user, route = Limit("user", 5, 60), Limit("route", 1, 60)
+            backend.apply([user, route], 200)
+            self.assertFalse(backend.apply([user, route], 201)[1].allowed)
+            self.assertEqual(backend.apply([user], 202)[0].remaining, 3)
+        finally:
+            for key in client.scan_iter(f"{backend.prefix}*"):
+                client.delete(key)
+
+    def test_database_backend_writes_one_row_per_key_and_purges(self):
+        backend = DatabaseBackend()
+        with self.assertNumQueries(5):  # savepoint, insert missing, select for update, upsert, release
+            backend.apply([Limit("x", 2, 60), Limit("y", 2, 60)], 0)
+        backend.apply([Limit("x", 2, 60), Limit("y", 2, 60)], 1)
+        self.assertEqual(RateLimitState.objects.count(), 2)
+        self.assertEqual(RateLimitState.objects.get(key="x").state, [0, 1])
+        self.assertEqual(backend.purge_expired(), 2)
+
+
+class MiddlewareTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+
+    def test_anonymous_clients_are_limited_per_ip(self):
+        middleware = RateLimitMiddleware(lambda request: HttpResponse("ok"))
+        factory = RequestFactory()
+
+        def get(ip):
+            request = factory.get("/", REMOTE_ADDR=ip)
+            request.user = type("Anonymous", (), {"is_authenticated": False})()
+            return middleware(request).status_code
+
+        statuses = [get("10.0.0.1") for _ in range(RateLimitMiddleware.MAX_REQUESTS_ANON + 1)]
+        self.assertEqual(statuses[-2:], [200, 429])
+        self.assertEqual(get("10.0.0.2"), 200)
+
+    async def test_runs_natively_under_asgi(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        middleware = RateLimitMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/", REMOTE_ADDR="10.0.0.3"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["RateLimit-Remaining"], str(RateLimitMiddleware.MAX_REQUESTS_ANON - 1))
+
+    @override_settings(DEBUG=True)  # the handler only logs adaptations in debug
+    def test_asgi_stack_is_async_end_to_end(self):
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    async def test_static_files_stream_without_a_thread_per_request(self):
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, "site.css"), "w") as handle:
+                handle.write("body{}" * 5000)
+
+            async def view(request):
+                return HttpResponse("view")
+
+            with override_settings(STATIC_ROOT=root):
+                middleware = StaticFilesMiddleware(view)
+            self.assertTrue(iscoroutinefunction(middleware))
+            response = await middleware(RequestFactory().get(f"{settings.STATIC_URL}site.css"))
+            self.assertTrue(response.is_async)
+            body = b"".join([block async for block in response])
+            response.close()
+            self.assertEqual(body, b"body{}" * 5000)
+            self.assertEqual((await middleware(RequestFactory().get("/"))).content, b"view")
+
+    def test_check_many_uses_the_configured_backend(self):
+        decisions = check_many([Limit("k", 1, 60), Limit("k2", 1, 60)])
+        self.assertTrue(all(d.allowed for d in decisions))
+        self.assertFalse(check_many([Limit("k", 1, 60)])[0].allowed)
+
+
+class RoutePolicyTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, request, registry=None):
+        """Call the middleware the way the handler does, including `process_view`."""
+        request.resolver_match = resolve(request.path_info)
+
+        def view(req):
+            return middleware.process_view(req, None, (), req.resolver_match.kwargs) or HttpResponse("ok")
+
+        middleware = RateLimitMiddleware(view)
+        if registry is None:
+            return middleware(request)
+        with mock.patch("farmIT.middleware.policies", registry):
+            return middleware(request)
+
+    def lazy_user(self, loaded):
+        return SimpleLazyObject(lambda: loaded.append(True) or AnonymousUser())
+
+    def test_unmatched_routes_never_load_the_user(self):
+        loaded = []
+        request = self.factory.get(reverse("product_list"))
+        request.user = self.lazy_user(loaded)
+        response = self.run_middleware(request)
+        self.assertEqual(loaded, [])
+        self.assertEqual(response["RateLimit-Limit"], str(RateLimitMiddleware.MAX_REQUESTS_ANON))
+        self.assertEqual(response["RateLimit-Remaining"], str(RateLimitMiddleware.MAX_REQUESTS_ANON - 1))
+
+        request = self.factory.get(reverse("product_list"))
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "anything"
+        request.user = self.lazy_user(loaded)
+        response = self.run_middleware(request)
+        self.assertEqual(response["RateLimit-Limit"], str(RateLimitMiddleware.MAX_REQUESTS_ANON))
+        self.assertNotIn(RateLimitMiddleware.SIGNED_IN_COOKIE, response.cookies)
+        self.assertEqual(loaded, [])
+
+    def test_signed_in_cap_needs_the_signed_cookie(self):
+        user = get_user_model().objects.create_user(username="vera", password="x")
+        request = self.factory.get(reverse("product_list"), REMOTE_ADDR="10.0.0.9")
+        request.user = user  # loaded by the view
+        cookie = self.run_middleware(request).cookies[RateLimitMiddleware.SIGNED_IN_COOKIE]
+
+        request = self.factory.get(reverse("product_list"), REMOTE_ADDR="10.0.0.9")
+        request.COOKIES[RateLimitMiddleware.SIGNED_IN_COOKIE] = cookie.value
+        request.user = self.lazy_user([])
+        self.assertEqual(self.run_middleware(request)["RateLimit-Limit"], str(RateLimitMiddleware.MAX_REQUESTS_AUTH))
+
+        request = self.factory.get(reverse("product_list"), REMOTE_ADDR="10.0.0.9")
+        request.COOKIES[RateLimitMiddleware.SIGNED_IN_COOKIE] = cookie.value.replace(str(user.pk), "999", 1)
+        request.user = AnonymousUser()
+        response = self.run_middleware(request)
+        self.assertEqual(response["RateLimit-Limit"], str(RateLimitMiddleware.MAX_REQUESTS_ANON))
+
+    def test_logging_out_drops_the_signed_in_cookie(self):
+        user = get_user_model().objects.create_user(username="wren", password="x")
+        self.client.force_login(user)
+        self.client.get(reverse("profile"))
+        self.assertIn(RateLimitMiddleware.SIGNED_IN_COOKIE, self.client.cookies)
+
+        response = self.client.get(reverse("logout"))
+
+        cookie = response.cookies[RateLimitMiddleware.SIGNED_IN_COOKIE]
+        self.assertEqual((cookie.value, cookie["max-age"]), ("", 0))
+        response = self.client.get(reverse("product_list"))
+        self.assertEqual(response["RateLimit-Limit"], str(RateLimitMiddleware.MAX_REQUESTS_ANON))
+
+    def test_logout_signal_drops_the_cookie_without_loading_the_user(self):
+        user = get_user_model().objects.create_user(username="xia", password="x")
+        request = self.factory.get(reverse("product_list"), REMOTE_ADDR="10.0.0.9")
+        request.user = user
+        cookie = self.run_middleware(request).cookies[RateLimitMiddleware.SIGNED_IN_COOKIE]
+
+        loaded = []
+        request = self.factory.get(reverse("product_list"), REMOTE_ADDR="10.0.0.9")
+        request.COOKIES[RateLimitMiddleware.SIGNED_IN_COOKIE] = cookie.value
+        request.user = self.lazy_user(loaded)
+        user_logged_out.send(sender=type(user), request=request, user=user)
+        response = self.run_middleware(request)
+
+        self.assertEqual(response.cookies[RateLimitMiddleware.SIGNED_IN_COOKIE]["max-age"], 0)
+        self.assertEqual(loaded, [])
+
+    def test_exempt_paths_are_not_counted(self):
+        middleware = RateLimitMiddleware(lambda request: HttpResponse("ok"))
+        response = middleware(self.factory.get("/static/css/site.css"))
+        self.assertNotIn("RateLimit-Limit", response)
+
+    def test_policies_match_by_url_name_prefix_and_method(self):
+        registry = PolicyRegistry()
+        registry.route("product_list", Policy("list", 2, 60, per=IP))
+        registry.prefix("/api/", Policy("api", 1, 60, per=IP))
+        registry.route("product_import", Policy("import", 1, 60, methods=("POST",)))
+
+        statuses = [self.run_middleware(self.factory.get(reverse("product_list")), registry) for _ in range(3)]
+        self.assertEqual([r.status_code for r in statuses], [200, 200, 429])
+        self.assertEqual(statuses[-1]["RateLimit-Limit"], "2")
+        self.assertEqual(statuses[-1]["Retry-After"], "60")
+
+        self.assertEqual(self.run_middleware(self.factory.get("/api/v1/farms/"), registry).status_code, 200)
+        self.assertEqual(self.run_middleware(self.factory.get("/api/v1/farms/"), registry).status_code, 429)
+
+        loaded = []
+        request = self.factory.get(reverse("product_import"))
+        request.user = self.lazy_user(loaded)
+        self.assertEqual(self.run_middleware(request, registry).status_code, 200)
+        self.assertEqual(loaded, [])  # GET: the POST-only, per-user policy did not apply
+
+    def test_registered_limits_apply_per_user(self):
+        farmer = get_user_model().objects.create_user(
+            username="ivo", email="ivo@example.com", password="pass12345", role="farmer"
+        )
+        self.client.force_login(farmer)
+        url = reverse("product_import")
+        statuses = [self.client.post(url).status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+
+        other = get_user_model().objects.create_user(
+            username="jun", email="jun@example.com", password="pass12345", role="farmer"
+        )
+        self.client.force_login(other)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["RateLimit-Limit"], "5")
+        self.assertEqual(response["RateLimit-Remaining"], "4")